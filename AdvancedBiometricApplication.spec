@@ -6,7 +6,7 @@ block_cipher = pyi_crypto.PyiBlockCipher(key='QWERTYUIOP12345678')
 
 a = Analysis(
     ['src\\main.py'],
-    pathex=['src', 'src/core', 'src/utils', 'src/biometric'],
+    pathex=['.', 'src', 'src/core', 'src/utils', 'src/biometric'],
     binaries=[],
     datas=[('config', 'config'), ('data', 'data'), ('scripts', 'scripts')],
     hiddenimports=['sqlite3', 'requests', 'urllib3', 'logging.handlers'],
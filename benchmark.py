@@ -0,0 +1,363 @@
+# benchmark.py
+import sys
+import os
+import gc
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import logging
+import subprocess
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_lib import const
+from src.biometric.zk_lib.base import ZK
+from src.core.database import DatabaseManager
+from src.core.attendance_service import AttendanceService
+from zk_session import download
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+BENCHMARKS = []
+
+
+def benchmark(name, unit='op'):
+    """Register a setup function returning (callable, ops per call, cleanup or None)"""
+    def register(setup):
+        BENCHMARKS.append((name, unit, setup))
+        return setup
+    return register
+
+
+def _sample_device(**options):
+    """Dumps in every layout, built by the simulator's encoders"""
+    return SimulatedDevice(seed=1, **options)
+
+
+def _zk():
+    # never connected: only the pure encode/decode paths are exercised
+    return ZK('127.0.0.1', ommit_ping=True)
+
+
+# -- protocol -------------------------------------------------------------
+
+def _header(size):
+    def setup(quick):
+        zk = _zk()
+        payload = os.urandom(size)
+        create_header = zk._ZK__create_header
+        return (lambda: create_header(const.CMD_DATA, payload, 1234, 5)), 1, None
+    return setup
+
+
+benchmark('header.build_64b')(_header(64))
+benchmark('header.build_16kb')(_header(16384))
+
+
+def _decode_users(packet_size):
+    def setup(quick):
+        count = 2000 if quick else 10000
+        device = _sample_device(users=count, fingers_per_user=0, records=0, user_packet_size=packet_size)
+        data = memoryview(device._dump_users())[4:]
+        decode = _zk()._ZK__decode_users
+        return (lambda: decode(data, packet_size)), count, None
+    return setup
+
+
+benchmark('decode.users_28b', 'user')(_decode_users(28))
+benchmark('decode.users_72b', 'user')(_decode_users(72))
+
+
+def _decode_attendance(record_size):
+    def setup(quick):
+        count = 10000 if quick else 50000
+        device = _sample_device(users=500, fingers_per_user=0, records=count, record_size=record_size)
+        data = memoryview(device._dump_attendance())[4:]
+        zk = _zk()
+        users = zk._ZK__decode_users(memoryview(device._dump_users())[4:], 72)
+        decode = zk._ZK__iter_attendance
+        return (lambda: list(decode(data, record_size, users))), count, None
+    return setup
+
+
+benchmark('decode.attendance_8b', 'record')(_decode_attendance(8))
+benchmark('decode.attendance_16b', 'record')(_decode_attendance(16))
+benchmark('decode.attendance_40b', 'record')(_decode_attendance(40))
+
+
+@benchmark('decode.templates', 'template')
+def _decode_templates(quick):
+    count = 1000 if quick else 5000
+    device = _sample_device(users=count, fingers_per_user=1, records=0)
+    data = device._dump_templates()
+    zk = _zk()
+    # hand iter_templates the dump instead of reading it from a device
+    zk.fingers = count
+    zk.read_sizes = lambda: True
+    zk.read_with_buffer = lambda command, fct=0, ext=0, offset=0: (data, len(data))
+    return (lambda: list(zk.iter_templates())), count, None
+
+
+# -- database ---------------------------------------------------------------
+
+def _attendance_rows(start, count):
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            'user_id': i % 5000 + 1,
+            'punch_time': (base + timedelta(seconds=i)).isoformat(),
+            'device_ip': '10.0.0.%i' % (i % 50 + 1),
+            'device_sn': 'SN%03d' % (i % 50)
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def _database(rows, pending_every=10):
+    """A database with rows attendance records, one in pending_every still pending"""
+    workdir = tempfile.mkdtemp(prefix='biometric-bench-')
+    db = DatabaseManager(os.path.join(workdir, 'att.db'))
+    for start in range(0, rows, 10000):
+        db.insert_attendance_batch(_attendance_rows(start, min(10000, rows - start)))
+    if rows:
+        db.execute_query("UPDATE attendance SET status = 'synced' WHERE id % ? != 0", (pending_every,), commit=True)
+    return db, lambda: shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _insert_batch(rows):
+    def setup(quick):
+        db, cleanup = _database(rows)
+        state = {'next': rows}
+
+        def run():
+            batch = _attendance_rows(state['next'], 500)
+            state['next'] += 500
+            db.insert_attendance_batch(batch)
+        return run, 500, cleanup
+    return setup
+
+
+def _insert_one(rows):
+    def setup(quick):
+        db, cleanup = _database(rows)
+        state = {'next': rows}
+
+        def run():
+            row = _attendance_rows(state['next'], 1)[0]
+            state['next'] += 1
+            db.insert_attendance(**row)
+        return run, 1, cleanup
+    return setup
+
+
+def _pending_scan(rows):
+    def setup(quick):
+        db, cleanup = _database(rows)
+        return (lambda: db.get_unsynced_attendance(limit=100)), 1, cleanup
+    return setup
+
+
+for _rows in (1000, 10000, 100000):
+    benchmark('db.insert_batch_%ik' % (_rows // 1000), 'row')(_insert_batch(_rows))
+    benchmark('db.insert_one_%ik' % (_rows // 1000), 'row')(_insert_one(_rows))
+    benchmark('db.pending_scan_%ik' % (_rows // 1000), 'scan')(_pending_scan(_rows))
+
+
+# -- sync -------------------------------------------------------------------
+
+@benchmark('sync.payload_build', 'record')
+def _sync_payload(quick):
+    records = [dict(row, id=i, status='pending') for i, row in enumerate(_attendance_rows(0, 100))]
+
+    def run():
+        for record in records:
+            json.dumps(AttendanceService._sync_payload(record))
+    return run, len(records), None
+
+
+# -- replay -----------------------------------------------------------------
+
+def _replay(path=None, **options):
+    """Replay a recorded download through the whole ZK read path, no sockets"""
+    def setup(quick):
+        workdir = None
+        log = path
+        if log is None:
+            workdir = tempfile.mkdtemp(prefix='biometric-bench-')
+            log = os.path.join(workdir, 'session.zklog')
+            records = 5000 if quick else 20000
+            with _sample_device(users=1000, records=records) as device:
+                ZK._protocols.pop(device.address, None)
+                download(ZK(device.host, port=device.port, timeout=10, ommit_ping=True, read_window=4, record=log))
+        state = {}
+
+        def run():
+            state['result'] = download(ZK.replay(log, **options))
+        run()
+        ops = len(state['result']['attendance']) or 1
+        return run, ops, (lambda: shutil.rmtree(workdir, ignore_errors=True)) if workdir else None
+    return setup
+
+
+benchmark('replay.download', 'record')(_replay(read_window=4))
+
+
+# -- runner -------------------------------------------------------------------
+
+def measure(func, ops, min_time=0.2, repeat=5):
+    """Best seconds per op over repeat rounds of at least min_time each"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed * 4 >= min_time else 10
+
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    rounds.sort()
+    return rounds[0] / ops, rounds[len(rounds) // 2] / ops, number
+
+
+def run_benchmarks(selected=None, quick=False, sessions=()):
+    results = {}
+    benchmarks = BENCHMARKS + [
+        ('replay.' + Path(path).stem, 'record', _replay(path)) for path in sessions or ()
+    ]
+    for name, unit, setup in benchmarks:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        if quick and name.startswith('db.') and name.endswith('_100k'):
+            continue
+        func, ops, cleanup = setup(quick)
+        try:
+            best, median, number = measure(func, ops, min_time=0.05 if quick else 0.2)
+        finally:
+            if cleanup:
+                cleanup()
+        results[name] = {
+            'seconds_per_unit': best,
+            'median_seconds_per_unit': median,
+            'units_per_sec': 1.0 / best if best else None,
+            'unit': unit,
+            'calls_per_round': number
+        }
+        print(f"{name:<26} {_format_time(best):>10}/{unit:<8} {1.0 / best if best else 0:>14,.0f} {unit}/s")
+    return results
+
+
+def _format_time(seconds):
+    for scale, suffix in ((1, 's'), (1e-3, 'ms'), (1e-6, 'us')):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {suffix}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def _meta(quick):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'quick': quick
+    }
+
+
+def compare(baseline, current, threshold, selected=None):
+    """Print both runs side by side; returns the names that got slower than threshold allows"""
+    regressions = []
+    names = set(baseline['results']) | set(current['results'])
+    if selected:
+        names = {name for name in names if any(pattern in name for pattern in selected)}
+    print(f"{'benchmark':<26} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(names):
+        before = baseline['results'].get(name)
+        after = current['results'].get(name)
+        if not before or not after:
+            print(f"{name:<26} {'-' if not before else _format_time(before['seconds_per_unit']):>12} "
+                  f"{'-' if not after else _format_time(after['seconds_per_unit']):>12}")
+            continue
+        change = after['seconds_per_unit'] / before['seconds_per_unit'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:<26} {_format_time(before['seconds_per_unit']):>12} "
+              f"{_format_time(after['seconds_per_unit']):>12} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the protocol, storage and sync hot paths')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument('--save', nargs='?', const=DEFAULT_BASELINE, help='Save results as a baseline JSON file')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare against a baseline, exit 1 on regressions')
+    compare_parser.add_argument('baseline', nargs='?', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    compare_parser.add_argument('current', nargs='?', help='Results JSON to compare (default: run now)')
+    compare_parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown, 0.2 = 20%%')
+
+    for subparser in (run_parser, compare_parser):
+        subparser.add_argument('-k', dest='selected', action='append', help='Only benchmarks whose name contains this')
+        subparser.add_argument('--quick', action='store_true', help='Smaller inputs and shorter rounds')
+        subparser.add_argument('--session', dest='sessions', action='append',
+                               help='Also replay this recorded session log (see zk_session.py)')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.command == 'run':
+        result = {'meta': _meta(args.quick), 'results': run_benchmarks(args.selected, args.quick, args.sessions)}
+        if args.save:
+            with open(args.save, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2)
+            print(f"Saved baseline to {args.save}")
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        current = {'meta': _meta(args.quick), 'results': run_benchmarks(args.selected, args.quick, args.sessions)}
+        print()
+    if baseline['meta'].get('quick') != current['meta'].get('quick'):
+        print("Warning: baseline and current run used different --quick settings")
+
+    regressions = compare(baseline, current, args.threshold, args.selected)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        return 1
+    print("\nNo regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
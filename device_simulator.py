@@ -0,0 +1,137 @@
+# device_simulator.py
+import sys
+import os
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice, SimulatedFleet
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.user import User
+from src.biometric.zk_lib.finger import Finger
+
+
+def add_device_options(parser):
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--users', type=int, default=100, help='Users per device')
+    parser.add_argument('--fingers', type=int, default=1, help='Templates per user')
+    parser.add_argument('--records', type=int, default=1000, help='Attendance records per device')
+    parser.add_argument('--record-size', type=int, default=40, choices=(8, 16, 40), help='Attendance record layout')
+    parser.add_argument('--user-size', type=int, default=72, choices=(28, 72), help='User record layout')
+    parser.add_argument('--password', type=int, default=0, help='Comm key the devices require')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every reply')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds per reply')
+    parser.add_argument('--loss', type=float, default=0.0, help='Share of replies dropped (0-1)')
+    parser.add_argument('--max-read-chunk', type=int, help='Largest buffer chunk served per read')
+    parser.add_argument('--max-upload-chunk', type=int, help='Largest upload chunk accepted')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible data and faults')
+
+
+def device_options(args):
+    return {
+        'host': args.host,
+        'users': args.users,
+        'fingers_per_user': args.fingers,
+        'records': args.records,
+        'record_size': args.record_size,
+        'user_packet_size': args.user_size,
+        'password': args.password,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'loss': args.loss,
+        'max_read_chunk': args.max_read_chunk,
+        'max_upload_chunk': args.max_upload_chunk,
+        'seed': args.seed
+    }
+
+
+def serve(args):
+    """Run a fleet of simulated devices until interrupted"""
+    options = device_options(args)
+    options['event_interval'] = args.event_interval
+    fleet = SimulatedFleet(args.devices, base_port=args.base_port, **options).start()
+
+    config = fleet.devices_config()
+    if args.write_config:
+        with open(args.write_config, 'w', encoding='utf-8') as f:
+            json.dump({'devices': config}, f, indent=2)
+        print(f"Wrote devices config to {args.write_config}")
+    ports = ', '.join(str(device['port']) for device in config[:5]) + (', ...' if len(config) > 5 else '')
+    print(f"Simulating {len(config)} devices on {args.host} ports {ports}. Press Ctrl+C to stop.")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.stop()
+        totals = {}
+        for device in fleet.devices:
+            for key, value in device.stats.items():
+                totals[key] = totals.get(key, 0) + value
+        print(f"Stopped: {totals}")
+
+
+def bench_upload(args):
+    """Time set_users_bulk against one simulated device for each chunk size and window"""
+    options = device_options(args)
+    options.update(users=0, records=0)
+    users = [
+        (User(uid, 'User %i' % uid, 0, '', '1', str(uid)),
+         [Finger(uid, fid, 1, os.urandom(args.template_size)) for fid in range(args.fingers)])
+        for uid in range(1, args.upload_users + 1)
+    ]
+
+    print(f"{'chunk':>7} {'window':>6} {'seconds':>8} {'users/s':>9}")
+    for chunk_size in args.chunk_sizes:
+        for window in args.windows:
+            with SimulatedDevice(**options) as device:
+                zk = ZK(device.host, port=device.port, timeout=10, password=args.password,
+                        ommit_ping=True, upload_chunk_size=chunk_size, upload_window=window)
+                zk.connect()
+                try:
+                    started = time.perf_counter()
+                    zk.set_users_bulk(users)
+                    seconds = time.perf_counter() - started
+                finally:
+                    zk.disconnect()
+                if len(device.users) != len(users):
+                    print(f"{chunk_size:>7} {window:>6} upload incomplete: {len(device.users)} of {len(users)} users")
+                    continue
+            print(f"{chunk_size:>7} {window:>6} {seconds:>8.3f} {len(users) / seconds:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulated ZKTeco devices for load and regression testing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Run simulated devices')
+    add_device_options(serve_parser)
+    serve_parser.add_argument('--devices', type=int, default=1, help='Number of devices')
+    serve_parser.add_argument('--base-port', type=int, default=4370, help='Port of the first device (0 for ephemeral ports)')
+    serve_parser.add_argument('--event-interval', type=float, help='Mean seconds between live punches per device')
+    serve_parser.add_argument('--write-config', help='Write a devices config for the fleet to this file')
+    serve_parser.set_defaults(func=serve)
+
+    bench_parser = subparsers.add_parser('bench-upload', help='Benchmark buffered user uploads')
+    add_device_options(bench_parser)
+    bench_parser.add_argument('--upload-users', type=int, default=1000, help='Users to upload')
+    bench_parser.add_argument('--template-size', type=int, default=512, help='Bytes per template')
+    bench_parser.add_argument('--chunk-sizes', type=int, nargs='+', default=[1024, 4096, 16384, 65472])
+    bench_parser.add_argument('--windows', type=int, nargs='+', default=[1, 4])
+    bench_parser.set_defaults(func=bench_upload)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# load_test.py
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import psutil
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedFleet
+from src.core.database import DatabaseManager
+from src.core.device_manager import DeviceManager
+from src.core.attendance_service import AttendanceService
+
+
+class PunchSink(ThreadingHTTPServer):
+    """Stand-in for the attendance server: accepts POST /biometric and
+    notes when each punch arrived"""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, SinkHandler)
+        self.received = {}
+        self.duplicates = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/"
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        arrived = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            punch = json.loads(body)
+            key = (punch['serial_number'], str(punch['user_id']), punch['t'])
+        except (ValueError, KeyError):
+            self.send_response(400)
+            self.end_headers()
+            return
+        with self.server.lock:
+            if key in self.server.received:
+                self.server.duplicates += 1
+            else:
+                self.server.received[key] = arrived
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(share * (len(values) - 1))))]
+
+
+class LoadTest:
+    """Drive simulated devices through the whole capture, store and sync path"""
+
+    def __init__(self, args):
+        self.args = args
+        self.sent = {}
+        self.samples = []
+        self.workdir = tempfile.mkdtemp(prefix='biometric-load-')
+        self.stop_sampling = threading.Event()
+
+    def run(self) -> dict:
+        args = self.args
+        sink = PunchSink()
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        fleet = SimulatedFleet(args.devices, users=args.users, records=0,
+                               latency=args.latency, jitter=args.jitter, seed=args.seed).start()
+
+        db = DatabaseManager(os.path.join(self.workdir, 'att.db'))
+        db.set_config_value('site_url', sink.url)
+        devices_config = fleet.devices_config()
+        for device_config in devices_config:
+            device_config['sync_time'] = False
+        config = {
+            'devices': devices_config,
+            'sync': {'interval_seconds': args.sync_interval}
+        }
+        device_manager = DeviceManager(db, config)
+        service = AttendanceService(db, device_manager, config)
+
+        try:
+            started = time.perf_counter()
+            device_manager.initialize_devices()
+            device_manager.start_live_capture()
+            ready = self.wait_for_capture(device_manager, timeout=30)
+            print(f"{ready} of {args.devices} devices capturing after {time.perf_counter() - started:.1f}s")
+            service.start()
+
+            self.process = psutil.Process()
+            self.process.cpu_percent()
+            sampler = threading.Thread(target=self.sample, args=(device_manager, db, sink), daemon=True)
+            sampler.start()
+
+            load_started = time.perf_counter()
+            self.generate(fleet)
+            load_ended = time.perf_counter()
+
+            deadline = load_ended + args.drain
+            while time.perf_counter() < deadline and len(sink.received) < len(self.sent):
+                time.sleep(0.2)
+            self.stop_sampling.set()
+            sampler.join()
+
+            return self.report(sink, load_started, load_ended)
+        finally:
+            service.stop()
+            device_manager.disconnect_all()
+            fleet.stop()
+            sink.shutdown()
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def wait_for_capture(self, device_manager, timeout):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            ready = sum(1 for device in device_manager.devices.values()
+                        if device.actor is not None and device.actor.capture_started.is_set())
+            if ready == len(device_manager.devices):
+                return ready
+            time.sleep(0.1)
+        return ready
+
+    def generate(self, fleet):
+        """Punch round-robin across the fleet at the requested total rate"""
+        args = self.args
+        devices = fleet.devices
+        # unique punch times per device, so the store never merges two punches
+        base = datetime.now().replace(microsecond=0) - timedelta(days=1)
+        counts = [0] * len(devices)
+        interval = 1.0 / args.rate
+        next_punch = time.perf_counter()
+        end = next_punch + args.duration
+        i = 0
+
+        while next_punch < end:
+            now = time.perf_counter()
+            if now < next_punch:
+                time.sleep(next_punch - now)
+            index = i % len(devices)
+            device = devices[index]
+            count = counts[index]
+            counts[index] += 1
+            user_id = str(count % args.users + 1)
+            timestamp = base + timedelta(seconds=count)
+            self.sent[(device.options['~SerialNumber'], user_id, timestamp.isoformat())] = time.perf_counter()
+            device.punch(user_id=user_id, timestamp=timestamp)
+            i += 1
+            next_punch += interval
+
+    def sample(self, device_manager, db, sink):
+        started = time.perf_counter()
+        while not self.stop_sampling.wait(self.args.sample_interval):
+            cursor = db.execute_query("SELECT COUNT(*) FROM attendance WHERE status = 'pending'")
+            self.samples.append({
+                't': round(time.perf_counter() - started, 1),
+                'queue': device_manager.attendance_queue.qsize(),
+                'pending': cursor.fetchone()[0] if cursor else None,
+                'delivered': len(sink.received),
+                'cpu_percent': self.process.cpu_percent(),
+                'rss_mb': round(self.process.memory_info().rss / 2 ** 20, 1)
+            })
+
+    def report(self, sink, load_started, load_ended) -> dict:
+        latencies = [
+            sink.received[key] - sent
+            for key, sent in self.sent.items() if key in sink.received
+        ]
+        last_arrival = max(sink.received.values(), default=load_ended)
+        seconds = max(last_arrival - load_started, 1e-9)
+        cpu = [s['cpu_percent'] for s in self.samples]
+        return {
+            'devices': self.args.devices,
+            'target_rate': self.args.rate,
+            'duration': round(load_ended - load_started, 2),
+            'sent': len(self.sent),
+            'delivered': len(latencies),
+            'lost': len(self.sent) - len(latencies),
+            'duplicates': sink.duplicates,
+            'punches_per_sec': round(len(latencies) / seconds, 1),
+            'latency_ms': {
+                name: round(percentile(latencies, share) * 1000, 1) if latencies else None
+                for name, share in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+            },
+            'max_queue_depth': max((s['queue'] for s in self.samples), default=0),
+            'max_pending_rows': max((s['pending'] or 0 for s in self.samples), default=0),
+            'cpu_percent_avg': round(sum(cpu) / len(cpu), 1) if cpu else None,
+            'rss_mb_max': max((s['rss_mb'] for s in self.samples), default=None),
+            'samples': self.samples
+        }
+
+
+def print_report(result):
+    print()
+    print(f"Devices: {result['devices']}  target {result['target_rate']}/s for {result['duration']}s")
+    print(f"Punches: sent {result['sent']}, delivered {result['delivered']}, lost {result['lost']}, "
+          f"duplicates {result['duplicates']}")
+    print(f"Sustained: {result['punches_per_sec']} punches/s")
+    latency = result['latency_ms']
+    print(f"Latency ms: p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}")
+    print(f"Max queue depth {result['max_queue_depth']}, max pending rows {result['max_pending_rows']}")
+    print(f"CPU avg {result['cpu_percent_avg']}%, RSS max {result['rss_mb_max']} MB")
+    print()
+    print(f"{'t':>6} {'queue':>6} {'pending':>8} {'delivered':>10} {'cpu%':>6} {'rss MB':>7}")
+    for sample in result['samples']:
+        print(f"{sample['t']:>6} {sample['queue']:>6} {sample['pending']:>8} {sample['delivered']:>10} "
+              f"{sample['cpu_percent']:>6} {sample['rss_mb']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test: simulated devices to a local HTTP sink')
+    parser.add_argument('--devices', type=int, default=10, help='Simulated devices')
+    parser.add_argument('--rate', type=float, default=50, help='Total punches per second across all devices')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to generate punches for')
+    parser.add_argument('--drain', type=float, default=60, help='Seconds to wait for delivery after the load stops')
+    parser.add_argument('--users', type=int, default=500, help='Users per device')
+    parser.add_argument('--sync-interval', type=int, default=1, help='Attendance service sync interval (seconds)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated device reply latency (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Simulated device reply jitter (seconds)')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='Seconds between queue/CPU samples')
+    parser.add_argument('--seed', type=int, help='Random seed for the simulated devices')
+    parser.add_argument('--json', help='Also write the full result to this file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = LoadTest(args).run()
+    print_report(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
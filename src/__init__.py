@@ -6,21 +6,36 @@ This package contains the core functionality for biometric device management and
 __version__ = "1.0.0"
 __author__ = "Advanced Biometric Application Team"
 
-# Import key modules for easier access
-from src.core import device_manager, attendance_service, database
-from src.utils import config_manager, logger, windows_utils
-from src.biometric import zk_device
+import logging
+
+from src.utils.lazy import lazy_exports
+
+# Key modules for easier access, imported on first attribute access so
+# that importing any one submodule does not load the whole application
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'device_manager': ('src.core.device_manager', None),
+    'attendance_service': ('src.core.attendance_service', None),
+    'database': ('src.core.database', None),
+    'config_manager': ('src.utils.config_manager', None),
+    'logger': ('src.utils.logger', None),
+    'windows_utils': ('src.utils.windows_utils', None),
+    'zk_device': ('src.biometric.zk_device', None),
+})
+
 
 # Package-level initialization
 def initialize_application():
     """
     Initialize the application components
     """
+    from src.utils import config_manager, logger
+
     # Initialize configuration
     config = config_manager.ConfigManager()
 
     # Initialize logger
-    app_logger = logger.setup_logger()
+    logger.setup_logging()
+    app_logger = logging.getLogger(__name__)
 
     app_logger.info("Application package initialized")
     return config
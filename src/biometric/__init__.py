@@ -3,15 +3,11 @@ Biometric Device Integration Package
 This package provides interfaces for ZKTeco biometric device communication and management.
 """
 
-from .zk_device import ZKDevice
-from .zk_lib import (
-    attendance as zk_attendance,
-    base as zk_base,
-    const as zk_const,
-    exception as zk_exception,
-    finger as zk_finger,
-    user as zk_user
-)
+import logging
+
+from src.utils.lazy import lazy_exports
+
+logger = logging.getLogger(__name__)
 
 # Version information
 __version__ = "1.0.0"
@@ -28,18 +24,30 @@ __all__ = [
     'zk_user'
 ]
 
+# name -> (module, attribute or None for the module itself), imported on
+# first access so that importing one submodule does not load zk_lib whole
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'ZKDevice': ('.zk_device', 'ZKDevice'),
+    'zk_attendance': ('.zk_lib.attendance', None),
+    'zk_base': ('.zk_lib.base', None),
+    'zk_const': ('.zk_lib.const', None),
+    'zk_exception': ('.zk_lib.exception', None),
+    'zk_finger': ('.zk_lib.finger', None),
+    'zk_user': ('.zk_lib.user', None),
+    # aliases for common imports
+    'ZKAttendance': ('.zk_lib.attendance', None),
+    'ZKBase': ('.zk_lib.base', None),
+    'ZKConstants': ('.zk_lib.const', None),
+    'ZKException': ('.zk_lib.exception', None),
+    'ZKFinger': ('.zk_lib.finger', None),
+    'ZKUser': ('.zk_lib.user', None),
+})
+
+
 # Package initialization
 def initialize_biometric_module():
     """
     Initialize the biometric module components
     """
-    print("Biometric module initialized")
+    logger.debug("Biometric module initialized")
     # Additional initialization code can be added here
-
-# Create aliases for common imports
-ZKAttendance = zk_attendance
-ZKBase = zk_base
-ZKConstants = zk_const
-ZKException = zk_exception
-ZKFinger = zk_finger
-ZKUser = zk_user
\ No newline at end of file
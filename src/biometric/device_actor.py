@@ -0,0 +1,173 @@
+# src/biometric/device_actor.py
+import itertools
+import threading
+import logging
+import time
+from concurrent.futures import Future
+from queue import PriorityQueue, Queue, Empty
+from typing import Any, Callable
+
+from src.biometric.zk_lib.exception import ZKErrorConnection
+
+logger = logging.getLogger(__name__)
+
+# Command lanes, lower runs first
+PRIORITY_CONTROL = 0    # door unlock, time sync
+PRIORITY_NORMAL = 5     # status and small reads
+PRIORITY_BULK = 10      # user/template/attendance transfers
+
+
+class DeviceActor:
+    """Single thread that owns a device's socket
+
+    Every command is queued with a priority and executed on the actor
+    thread, so nothing else touches the socket. While live capture is
+    running the actor polls for events with a short timeout and, whenever
+    commands are waiting, pauses event delivery, runs them in priority
+    order and resumes the capture stream.
+    """
+
+    def __init__(self, device, poll_interval: float = 0.5, linger: float = 0.05):
+        self.device = device
+        self.poll_interval = poll_interval
+        self.linger = linger
+        self.events = Queue()
+        self._commands = PriorityQueue()
+        self._sequence = itertools.count()
+        self._capture_requested = threading.Event()
+        # set once the device has accepted the event registration
+        self.capture_started = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the actor thread"""
+        if self.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            daemon=True,
+            name=f"DeviceActor-{self.device.serial_number or self.device.ip}"
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0, deadline: float = 60.0) -> bool:
+        """Stop capture and the actor thread, failing any queued commands
+
+        Waits for the command in flight to return, so the caller can close
+        the socket without pulling it from under a bulk transfer; every
+        timeout seconds of waiting is logged. After deadline seconds it
+        gives up and returns False, leaving the command to fail once the
+        caller closes the socket.
+        """
+        self._stopping.set()
+        self._capture_requested.clear()
+        stopped = True
+        if self._thread and not self.in_actor_thread():
+            give_up = time.monotonic() + deadline
+            self._thread.join(timeout=min(timeout, deadline))
+            while self._thread.is_alive():
+                remaining = give_up - time.monotonic()
+                if remaining <= 0:
+                    logger.error(f"Device actor {self._thread.name} still running a command after "
+                                 f"{deadline:.0f}s, closing the connection under it")
+                    stopped = False
+                    break
+                logger.warning(f"Device actor {self._thread.name} still running a command, waiting for it to return")
+                self._thread.join(timeout=min(timeout, remaining))
+        self._fail_pending(ZKErrorConnection("device actor stopped"))
+        return stopped
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_actor_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, func: Callable, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Future:
+        """Queue a call to run on the actor thread"""
+        future = Future()
+        if self._stopping.is_set():
+            future.set_exception(ZKErrorConnection("device actor stopped"))
+            return future
+        self._commands.put((priority, next(self._sequence), func, args, kwargs, future))
+        return future
+
+    def call(self, func: Callable, *args, priority: int = PRIORITY_NORMAL, **kwargs) -> Any:
+        """Run a call on the actor thread and wait for its result"""
+        return self.submit(func, *args, priority=priority, **kwargs).result()
+
+    def start_capture(self):
+        """Begin streaming live events into the events queue"""
+        self._capture_requested.set()
+
+    def stop_capture(self):
+        """End live capture; the actor keeps serving commands"""
+        self._capture_requested.clear()
+        self.capture_started.clear()
+
+    @property
+    def capturing(self) -> bool:
+        return self._capture_requested.is_set() and not self._stopping.is_set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if self.capturing and self.device.zk_client:
+                self._capture()
+                continue
+            try:
+                item = self._commands.get(timeout=self.poll_interval)
+            except Empty:
+                continue
+            self._execute(item)
+
+    def _capture(self):
+        zk = self.device.zk_client
+        self.capture_started.clear()
+        try:
+            for attendance in zk.live_capture(new_timeout=self.poll_interval):
+                self.capture_started.set()
+                if attendance is not None:
+                    self.events.put(attendance)
+                if not self._commands.empty():
+                    zk.pause_live_capture()
+                    try:
+                        self._drain_commands()
+                    finally:
+                        zk.resume_live_capture()
+                if not self.capturing:
+                    zk.end_live_capture = True
+        except Exception as e:
+            logger.error(f"Live capture stopped on device {self.device.serial_number}: {e}")
+            self._capture_requested.clear()
+            self.capture_started.clear()
+            self.events.put(e)
+
+    def _drain_commands(self):
+        # linger briefly so back-to-back calls don't each cost a pause/resume
+        while not self._stopping.is_set():
+            try:
+                item = self._commands.get(timeout=self.linger)
+            except Empty:
+                return
+            self._execute(item)
+
+    def _execute(self, item):
+        _priority, _sequence, func, args, kwargs, future = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def _fail_pending(self, error: Exception):
+        while True:
+            try:
+                item = self._commands.get_nowait()
+            except Empty:
+                return
+            future = item[-1]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
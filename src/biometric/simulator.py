@@ -0,0 +1,607 @@
+# src/biometric/simulator.py
+import random
+import selectors
+import socket
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from struct import pack, unpack, iter_unpack
+from typing import Dict, List, Tuple
+
+from src.biometric.zk_lib import const
+from src.biometric.zk_lib.base import make_commkey
+from src.biometric.zk_lib.framing import TCPFrameBuffer
+from src.biometric.zk_lib.probe import _checksum
+from src.biometric.zk_lib.user import User
+from src.biometric.zk_lib.finger import Finger
+
+logger = logging.getLogger(__name__)
+
+# largest CMD_DATA payload a terminal puts in one UDP datagram
+UDP_DATA_SIZE = 1024
+
+
+def encode_time(t: datetime) -> int:
+    """Pack a datetime the way the terminal stores it (see ZK.__encode_time)"""
+    return ((t.year % 100 * 12 * 31 + (t.month - 1) * 31 + t.day - 1) * 86400
+            + (t.hour * 60 + t.minute) * 60 + t.second)
+
+
+def decode_time(t: int) -> datetime:
+    """Inverse of encode_time"""
+    second = t % 60
+    t //= 60
+    minute = t % 60
+    t //= 60
+    hour = t % 24
+    t //= 24
+    day = t % 31 + 1
+    t //= 31
+    month = t % 12 + 1
+    year = t // 12 + 2000
+    return datetime(year, month, day, hour, minute, second)
+
+
+def _text(raw: bytes) -> str:
+    return raw.split(b'\x00')[0].decode(errors='ignore')
+
+
+class _Session:
+    """One client session: its id, auth state, event registration and buffers"""
+
+    def __init__(self, session_id: int, send, authenticated: bool):
+        self.session_id = session_id
+        self.send = send
+        self.authenticated = authenticated
+        self.event_flags = 0
+        self.buffer = b''
+        self.upload = bytearray()
+        self.closed = False
+        # whole replies and live events never interleave on the wire
+        self.send_lock = threading.Lock()
+
+
+class SimulatedDevice:
+    """A ZKTeco terminal in a thread, speaking the same TCP and UDP protocol
+    the ZK client does
+
+    Holds users, fingerprint templates and an attendance log, serves them
+    through CMD_PREPARE_BUFFER/CMD_READ_BUFFER dumps, accepts buffered and
+    per-user uploads and pushes CMD_REG_EVENT live events to registered
+    sessions. latency and jitter delay every reply, loss drops that share of
+    replies outright so clients have to time out and retry.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, users: int = 100,
+                 fingers_per_user: int = 1, records: int = 1000, record_size: int = 40,
+                 user_packet_size: int = 72, template_size: int = 512, password: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0,
+                 event_interval: float = None, serial_number: str = None,
+                 firmware_version: str = 'Ver 6.60 Apr 28 2020', platform: str = 'ZMM220_TFT',
+                 max_read_chunk: int = None, max_upload_chunk: int = None,
+                 inline_limit: int = 0, tcp: bool = True, udp: bool = True, seed: int = None):
+        if record_size not in (8, 16, 40):
+            raise ValueError("record_size must be 8, 16 or 40")
+        if user_packet_size not in (28, 72):
+            raise ValueError("user_packet_size must be 28 or 72")
+
+        self.host = host
+        self.port = port
+        self.record_size = record_size
+        self.user_packet_size = user_packet_size
+        self.template_size = template_size
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.event_interval = event_interval
+        self.max_read_chunk = max_read_chunk
+        self.max_upload_chunk = max_upload_chunk
+        # buffered dumps up to this size are answered inline with CMD_DATA
+        self.inline_limit = inline_limit
+        self.tcp = tcp
+        self.udp = udp
+        self.random = random.Random(seed)
+        self.firmware_version = firmware_version
+        self.options = {
+            '~SerialNumber': serial_number or 'SIM%08d' % self.random.randrange(10 ** 8),
+            '~Platform': platform,
+            'MAC': '00:17:61:%02x:%02x:%02x' % tuple(self.random.randrange(256) for _ in range(3)),
+            '~DeviceName': 'Simulated ZK',
+            '~ZKFPVersion': '10',
+            'ZKFaceVersion': '0',
+            '~ExtendFmt': '0',
+            '~UserExtFmt': '0',
+            'FaceFunOn': '0',
+            'CompatOldFirmware': '0',
+            '~PIN2Width': '9',
+            'IPAddress': host,
+            'NetMask': '255.255.255.0',
+            'GATEIPAddress': '0.0.0.0',
+        }
+
+        self.lock = threading.RLock()
+        self.users: Dict[int, User] = {}
+        self.templates: Dict[Tuple[int, int], Finger] = {}
+        # (uid, user_id, status, punch, timestamp)
+        self.attendance: List[Tuple[int, str, int, int, datetime]] = []
+        self.clock_offset = timedelta()
+        self.stats = {'connections': 0, 'commands': 0, 'dropped': 0, 'events': 0}
+
+        self._sessions: Dict[object, _Session] = {}
+        self._next_session = 1
+        self._stopping = threading.Event()
+        self._selector = None
+        self._threads: List[threading.Thread] = []
+
+        self._populate(users, fingers_per_user, records)
+
+    def _populate(self, users: int, fingers_per_user: int, records: int):
+        for uid in range(1, users + 1):
+            self.users[uid] = User(uid, 'User %i' % uid, const.USER_DEFAULT, '', '1', str(uid), 0)
+            for fid in range(fingers_per_user):
+                template = bytes(self.random.getrandbits(8) for _ in range(self.template_size))
+                self.templates[(uid, fid)] = Finger(uid, fid, 1, template)
+
+        start = datetime.now().replace(microsecond=0) - timedelta(minutes=records)
+        uids = sorted(self.users) or [1]
+        for i in range(records):
+            uid = uids[i % len(uids)]
+            self.attendance.append((uid, str(uid), 1, i % 2, start + timedelta(minutes=i)))
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return (self.host, self.port)
+
+    def start(self) -> 'SimulatedDevice':
+        """Bind the TCP and UDP ports and start serving"""
+        self._stopping.clear()
+        self._selector = selectors.DefaultSelector()
+        if self.tcp:
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self.host, self.port))
+            self.port = listener.getsockname()[1]
+            listener.listen(16)
+            listener.setblocking(False)
+            self._selector.register(listener, selectors.EVENT_READ, 'tcp')
+        if self.udp:
+            datagram = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            datagram.bind((self.host, self.port))
+            self.port = datagram.getsockname()[1]
+            datagram.setblocking(False)
+            self._selector.register(datagram, selectors.EVENT_READ, 'udp')
+
+        self._spawn(self._serve, "SimDevice-%i" % self.port)
+        if self.event_interval:
+            self._spawn(self._generate_events, "SimEvents-%i" % self.port)
+        logger.info(f"Simulated device {self.options['~SerialNumber']} listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        """Close every session and stop serving"""
+        self._stopping.set()
+        with self.lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.closed = True
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _spawn(self, target, name, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True, name=name)
+        self._threads.append(thread)
+        thread.start()
+
+    # -- state -------------------------------------------------------------
+
+    def now(self) -> datetime:
+        return datetime.now().replace(microsecond=0) + self.clock_offset
+
+    def punch(self, user_id: str = None, status: int = 1, punch: int = 0,
+              timestamp: datetime = None) -> Tuple[int, str, int, int, datetime]:
+        """Log an attendance record and push it to sessions registered for events"""
+        with self.lock:
+            if user_id is None:
+                uid = self.random.choice(sorted(self.users)) if self.users else 1
+                user_id = self.users[uid].user_id if self.users else '1'
+            else:
+                user_id = str(user_id)
+                uid = next((u.uid for u in self.users.values() if u.user_id == user_id), 0)
+            record = (uid, user_id, status, punch, timestamp or self.now())
+            self.attendance.append(record)
+            sessions = [s for s in self._sessions.values() if s.event_flags & const.EF_ATTLOG]
+
+        timestamp = record[4]
+        payload = pack('<24sBB6s20s', user_id.encode(), status, punch,
+                       bytes([timestamp.year % 100, timestamp.month, timestamp.day,
+                              timestamp.hour, timestamp.minute, timestamp.second]), b'')
+        for session in sessions:
+            self._send(session, [(const.CMD_REG_EVENT, 0, payload)], reply=False)
+            self.stats['events'] += 1
+        return record
+
+    def _generate_events(self):
+        while not self._stopping.wait(self.random.expovariate(1.0 / self.event_interval)):
+            self.punch()
+
+    def _free_sizes(self) -> bytes:
+        with self.lock:
+            users, fingers, records = len(self.users), len(self.templates), len(self.attendance)
+        fields = [0] * 20
+        fields[4] = users
+        fields[6] = fingers
+        fields[8] = records
+        fields[14], fields[15], fields[16] = 3000, 3000, 100000
+        fields[17], fields[18], fields[19] = 3000 - fingers, 3000 - users, 100000 - records
+        return pack('20i', *fields) + pack('3i', 0, 0, 0)
+
+    def _dump_users(self) -> bytes:
+        with self.lock:
+            users = sorted(self.users.values(), key=lambda u: u.uid)
+        records = []
+        for user in users:
+            # the upload layout minus its leading 0x02 is the dump layout
+            records.append(user.repack73()[1:] if self.user_packet_size == 72 else user.repack29()[1:])
+        data = b''.join(records)
+        return pack('I', len(data)) + data
+
+    def _dump_templates(self) -> bytes:
+        with self.lock:
+            fingers = [self.templates[key] for key in sorted(self.templates)]
+        data = b''.join(finger.repack() for finger in fingers)
+        return pack('i', len(data)) + data
+
+    def _dump_attendance(self) -> bytes:
+        with self.lock:
+            log = list(self.attendance)
+        records = []
+        for uid, user_id, status, punch, timestamp in log:
+            when = encode_time(timestamp)
+            if self.record_size == 8:
+                records.append(pack('<HB4sB', uid, status, pack('<I', when), punch))
+            elif self.record_size == 16:
+                records.append(pack('<I4sBB2sI', int(user_id) if user_id.isdigit() else 0,
+                                    pack('<I', when), status, punch, b'', 0))
+            else:
+                records.append(pack('<H24sB4sB8s', uid, user_id.encode(), status, pack('<I', when), punch, b''))
+        data = b''.join(records)
+        return pack('I', len(data)) + data
+
+    def _store_user(self, user: User):
+        with self.lock:
+            self.users[user.uid] = user
+
+    def _delete_user(self, uid: int) -> bool:
+        with self.lock:
+            if self.users.pop(uid, None) is None:
+                return False
+            for key in [key for key in self.templates if key[0] == uid]:
+                del self.templates[key]
+            return True
+
+    def _save_upload(self, data: bytes) -> bool:
+        """Apply a CMD_PREPARE_DATA/CMD_DATA upload committed with command 110"""
+        if len(data) < 12:
+            return False
+        user_size, table_size, finger_size = unpack('III', data[:12])
+        users = data[12:12 + user_size]
+        table = data[12 + user_size:12 + user_size + table_size]
+        fingers = data[12 + user_size + table_size:12 + user_size + table_size + finger_size]
+        if len(fingers) != finger_size:
+            return False
+
+        if user_size % 73 == 0:
+            for _tag, uid, privilege, password, name, card, _one, group_id, user_id in iter_unpack('<BHB8s24sIB7sx24s', users):
+                self._store_user(User(uid, _text(name), privilege, _text(password), _text(group_id), _text(user_id), card))
+        elif user_size % 29 == 0:
+            for _tag, uid, privilege, password, name, card, group_id, _tz, user_id in iter_unpack('<BHB5s8sIxBhI', users):
+                self._store_user(User(uid, _text(name), privilege, _text(password), str(group_id), str(user_id), card))
+        else:
+            return False
+
+        for _kind, uid, fnum, start in iter_unpack('<bHbI', table[:len(table) - len(table) % 8]):
+            size = unpack('H', fingers[start:start + 2])[0]
+            with self.lock:
+                self.templates[(uid, fnum - 16)] = Finger(uid, fnum - 16, 1, bytes(fingers[start + 2:start + 2 + size]))
+        return True
+
+    def _user_wrq(self, data: bytes) -> bool:
+        if len(data) >= 72:
+            uid, privilege, password, name, card, group_id, user_id = unpack('<HB8s24sIx7sx24s', data[:72])
+            self._store_user(User(uid, _text(name), privilege, _text(password), _text(group_id), _text(user_id), card))
+        elif len(data) >= 28:
+            uid, privilege, password, name, card, group_id, _tz, user_id = unpack('<HB5s8sIxBHI', data[:28])
+            self._store_user(User(uid, _text(name), privilege, _text(password), str(group_id), str(user_id), card))
+        else:
+            return False
+        return True
+
+    # -- protocol ------------------------------------------------------------
+
+    def handle(self, session: _Session, command: int, data: bytes) -> List[Tuple[int, int, bytes]]:
+        """Answer one request
+
+        :return: list of (command, session_id, data) frames to send back,
+            empty when the request gets no reply
+        """
+        ok = [(const.CMD_ACK_OK, session.session_id, b'')]
+        error = [(const.CMD_ACK_ERROR, session.session_id, b'')]
+        self.stats['commands'] += 1
+
+        if command == const.CMD_ACK_OK:
+            # clients ack live events; answering would desync them
+            return []
+        if command == const.CMD_CONNECT:
+            return [(const.CMD_ACK_OK if session.authenticated else const.CMD_ACK_UNAUTH, session.session_id, b'')]
+        if command == const.CMD_AUTH:
+            session.authenticated = data[:4] == make_commkey(self.password, session.session_id)
+            return ok if session.authenticated else [(const.CMD_ACK_UNAUTH, session.session_id, b'')]
+        if not session.authenticated:
+            return [(const.CMD_ACK_UNAUTH, session.session_id, b'')]
+
+        if command == const.CMD_EXIT:
+            session.closed = True
+            return ok
+        if command == const.CMD_GET_FREE_SIZES:
+            return [(const.CMD_ACK_OK, session.session_id, self._free_sizes())]
+        if command == const.CMD_GET_VERSION:
+            return [(const.CMD_ACK_OK, session.session_id, self.firmware_version.encode() + b'\x00')]
+        if command == const.CMD_OPTIONS_RRQ:
+            key = _text(data)
+            value = self.options.get(key, '')
+            return [(const.CMD_ACK_OK, session.session_id, ('%s=%s' % (key, value)).encode() + b'\x00')]
+        if command == const.CMD_OPTIONS_WRQ:
+            key, _sep, value = _text(data).partition('=')
+            self.options[key] = value
+            return ok
+        if command == const.CMD_GET_TIME:
+            return [(const.CMD_ACK_OK, session.session_id, pack('<I', encode_time(self.now())))]
+        if command == const.CMD_SET_TIME:
+            self.clock_offset = decode_time(unpack('<I', data[:4])[0]) - datetime.now().replace(microsecond=0)
+            return ok
+        if command == const.CMD_REG_EVENT:
+            session.event_flags = unpack('<I', data[:4])[0] if len(data) >= 4 else 0
+            return ok
+        if command == const.CMD_PREPARE_BUFFER:
+            return self._prepare_buffer(session, data)
+        if command == const.CMD_READ_BUFFER:
+            start, size = unpack('<ii', data[:8])
+            if self.max_read_chunk:
+                size = min(size, self.max_read_chunk)
+            return self._data_reply(session, session.buffer[start:start + size])
+        if command == const.CMD_FREE_DATA:
+            session.buffer = b''
+            return ok
+        if command == const.CMD_PREPARE_DATA:
+            session.upload = bytearray()
+            return ok
+        if command == const.CMD_DATA:
+            if self.max_upload_chunk and len(data) > self.max_upload_chunk:
+                return error
+            session.upload += data
+            return ok
+        if command == 110:
+            saved = self._save_upload(bytes(session.upload))
+            session.upload = bytearray()
+            return ok if saved else error
+        if command == const.CMD_USER_WRQ:
+            return ok if self._user_wrq(data) else error
+        if command == 88:
+            uid, temp_id = unpack('hb', data[:3])
+            with self.lock:
+                finger = self.templates.get((uid, temp_id))
+            if finger is None:
+                return error
+            return self._data_reply(session, finger.template + b'\x00')
+        if command == const.CMD_DELETE_USER:
+            self._delete_user(unpack('h', data[:2])[0])
+            return ok
+        if command == const.CMD_DELETE_USERTEMP:
+            uid, temp_id = unpack('hb', data[:3])
+            with self.lock:
+                return ok if self.templates.pop((uid, temp_id), None) else error
+        if command == 134:
+            user_id, temp_id = unpack('<24sB', data[:25])
+            user_id = _text(user_id)
+            with self.lock:
+                uid = next((u.uid for u in self.users.values() if u.user_id == user_id), None)
+                return ok if uid is not None and self.templates.pop((uid, temp_id), None) else error
+        if command == const.CMD_CLEAR_ATTLOG:
+            with self.lock:
+                self.attendance = []
+            return ok
+        if command == const.CMD_CLEAR_DATA:
+            with self.lock:
+                self.users.clear()
+                self.templates.clear()
+                self.attendance = []
+            return ok
+        if command in (const.CMD_ENABLEDEVICE, const.CMD_DISABLEDEVICE, const.CMD_REFRESHDATA,
+                       const.CMD_CANCELCAPTURE, const.CMD_STARTVERIFY, const.CMD_UNLOCK,
+                       const.CMD_TESTVOICE, const.CMD_RESTART, const.CMD_POWEROFF):
+            return ok
+        # enrolment and everything else needs a real terminal
+        return [(const.CMD_ACK_UNKNOWN, session.session_id, b'')]
+
+    def _prepare_buffer(self, session: _Session, data: bytes) -> List[Tuple[int, int, bytes]]:
+        _flag, command, fct, _ext = unpack('<bhii', data[:11])
+        if command == const.CMD_USERTEMP_RRQ and fct == const.FCT_USER:
+            session.buffer = self._dump_users()
+        elif command == const.CMD_DB_RRQ and fct == const.FCT_FINGERTMP:
+            session.buffer = self._dump_templates()
+        elif command == const.CMD_ATTLOG_RRQ:
+            session.buffer = self._dump_attendance()
+        else:
+            return [(const.CMD_ACK_ERROR, session.session_id, b'')]
+
+        if len(session.buffer) <= self.inline_limit:
+            return [(const.CMD_DATA, session.session_id, session.buffer)]
+        return [(const.CMD_ACK_OK, session.session_id, pack('<BI', 0, len(session.buffer)) + b'\x00' * 3)]
+
+    def _data_reply(self, session: _Session, data: bytes) -> List[Tuple[int, int, bytes]]:
+        """CMD_PREPARE_DATA, the data as CMD_DATA (1 KiB datagrams over UDP), then CMD_ACK_OK"""
+        frames = [(const.CMD_PREPARE_DATA, session.session_id, pack('<II', len(data), 0))]
+        if session.send.tcp:
+            frames.append((const.CMD_DATA, session.session_id, data))
+        else:
+            for offset in range(0, len(data), UDP_DATA_SIZE):
+                frames.append((const.CMD_DATA, session.session_id, data[offset:offset + UDP_DATA_SIZE]))
+        frames.append((const.CMD_ACK_OK, session.session_id, b''))
+        return frames
+
+    # -- transport -------------------------------------------------------------
+
+    def _new_session(self, send) -> _Session:
+        with self.lock:
+            session_id = self._next_session
+            self._next_session = self._next_session % (const.USHRT_MAX - 1) + 1
+            self.stats['connections'] += 1
+        return _Session(session_id, send, authenticated=not self.password)
+
+    def _send(self, session: _Session, frames: List[Tuple[int, int, bytes]], reply_id: int = 0, reply: bool = True):
+        if reply:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay > 0:
+                time.sleep(delay)
+            if self.loss and self.random.random() < self.loss:
+                self.stats['dropped'] += 1
+                return
+        packets = []
+        for command, session_id, data in frames:
+            header = pack('<4H', command, 0, session_id, reply_id)
+            packets.append(pack('<4H', command, _checksum(header), session_id, reply_id) + data)
+        with session.send_lock:
+            try:
+                session.send(packets)
+            except OSError:
+                session.closed = True
+
+    def _serve(self):
+        try:
+            while not self._stopping.is_set():
+                for key, _events in self._selector.select(0.2):
+                    if key.data == 'tcp':
+                        try:
+                            client, _address = key.fileobj.accept()
+                        except OSError:
+                            continue
+                        client.setblocking(True)
+                        self._spawn(self._serve_tcp, "SimSession-%i" % self.port, client)
+                    else:
+                        self._serve_udp(key.fileobj)
+        finally:
+            for key in list(self._selector.get_map().values()):
+                key.fileobj.close()
+            self._selector.close()
+
+    def _serve_tcp(self, client: socket.socket):
+        def send(packets):
+            client.sendall(b''.join(
+                pack('<HHI', const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2, len(packet)) + packet
+                for packet in packets))
+        send.tcp = True
+
+        session = self._new_session(send)
+        frames = TCPFrameBuffer()
+        client.settimeout(0.2)
+        with self.lock:
+            self._sessions[client] = session
+        try:
+            while not session.closed and not self._stopping.is_set():
+                try:
+                    data = client.recv(1 << 16)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    break
+                if not data:
+                    break
+                frames.feed(data)
+                for packet in frames.frames():
+                    command, _sum, _session_id, reply_id = unpack('<4H', packet[:8])
+                    replies = self.handle(session, command, packet[8:])
+                    if replies:
+                        self._send(session, replies, reply_id)
+        finally:
+            with self.lock:
+                self._sessions.pop(client, None)
+            client.close()
+
+    def _serve_udp(self, sock: socket.socket):
+        try:
+            packet, address = sock.recvfrom(65535)
+        except OSError:
+            return
+        if len(packet) < 8:
+            return
+        command, _sum, _session_id, reply_id = unpack('<4H', packet[:8])
+
+        with self.lock:
+            session = self._sessions.get(address)
+        if session is None or command == const.CMD_CONNECT:
+            def send(packets):
+                for datagram in packets:
+                    sock.sendto(datagram, address)
+            send.tcp = False
+            session = self._new_session(send)
+            with self.lock:
+                self._sessions[address] = session
+
+        replies = self.handle(session, command, packet[8:])
+        if replies:
+            self._send(session, replies, reply_id)
+        if session.closed:
+            with self.lock:
+                self._sessions.pop(address, None)
+
+
+class SimulatedFleet:
+    """Many simulated terminals on consecutive ports (or ephemeral ones with base_port=0)"""
+
+    def __init__(self, count: int, host: str = '127.0.0.1', base_port: int = 0, **options):
+        seed = options.pop('seed', None)
+        self.devices = [
+            SimulatedDevice(host=host, port=base_port + i if base_port else 0,
+                            serial_number='SIM%05d' % (i + 1),
+                            seed=None if seed is None else seed + i, **options)
+            for i in range(count)
+        ]
+
+    def start(self) -> 'SimulatedFleet':
+        for device in self.devices:
+            device.start()
+        return self
+
+    def stop(self):
+        for device in self.devices:
+            device.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def devices_config(self) -> List[Dict]:
+        """Device entries for the application's devices config"""
+        return [
+            {
+                'ip': device.host,
+                'port': device.port,
+                'serial_number': device.options['~SerialNumber'],
+                'name': device.options['~DeviceName'],
+                'enabled': True
+            }
+            for device in self.devices
+        ]
@@ -4,20 +4,54 @@ import threading
 import time
 import logging
 from datetime import datetime
-from typing import List, Dict, Optional, Generator
+from queue import Empty
+from typing import Any, List, Dict, Optional, Generator, Callable, Iterable, Union, Tuple
 
+from src.biometric.device_actor import DeviceActor, PRIORITY_CONTROL, PRIORITY_NORMAL, PRIORITY_BULK
 from src.biometric.zk_lib.base import ZK
 from src.biometric.zk_lib.attendance import Attendance
+from src.biometric.zk_lib.user import User
+from src.biometric.zk_lib.finger import Finger
+from src.biometric.zk_lib.rtt import RTTEstimator
+from src.biometric.zk_lib.session_log import SessionRecorder
+from src.biometric.zk_lib.instrument import ProtocolStats
 
 logger = logging.getLogger(__name__)
 
 class ZKDevice:
-    def __init__(self, ip: str, port: int = 4370, serial_number: str = None, timeout: int = 30):
+    def __init__(self, ip: str, port: int = 4370, serial_number: str = None, timeout: int = 30,
+                 read_window: int = 1, adaptive_read_chunk: bool = False,
+                 upload_chunk_size: int = 1024, upload_window: int = 1,
+                 use_actor: bool = True, poll_interval: float = 0.5,
+                 capabilities: Dict = None, heartbeat_interval: float = 30,
+                 dead_peer_timeout: float = 90, metadata_ttl: float = 3600,
+                 record_session: str = None, protocol_stats: bool = False):
         self.ip = ip
         self.port = port
         self.serial_number = serial_number
         self.timeout = timeout
+        self.read_window = read_window
+        self.adaptive_read_chunk = adaptive_read_chunk
+        self.upload_chunk_size = upload_chunk_size
+        self.upload_window = upload_window
+        self.use_actor = use_actor
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.dead_peer_timeout = dead_peer_timeout
+        # protocol, record sizes and firmware learned on earlier connects
+        self.capabilities = capabilities
+        # outlives zk_client so round trip estimates survive reconnects
+        self.rtt = RTTEstimator(max_rto=timeout)
+        # serial, firmware, platform etc. rarely change, keep them for metadata_ttl seconds
+        self.metadata_ttl = metadata_ttl
+        self._metadata = None
+        self._metadata_time = 0.0
+        # every frame of every connection is appended here, for replay with ZK.replay()
+        self.recorder = SessionRecorder(record_session) if record_session else None
+        # per command counts and timings, also kept across reconnects
+        self.protocol_stats = ProtocolStats() if protocol_stats else None
         self.zk_client = None
+        self.actor = None
         self.is_connected_flag = False
         self.lock = threading.RLock()
 
@@ -30,40 +64,106 @@ class ZKDevice:
             try:
                 if self.is_connected():
                     return True
+                if self.zk_client is not None:
+                    # drop the dead session before starting a new one
+                    self.disconnect()
 
                 self.zk_client = ZK(
                     ip=self.ip,
                     port=self.port,
                     timeout=timeout,
-                    ommit_ping=True
+                    # the probe is cheap and tells tcp from udp terminals
+                    ommit_ping=False,
+                    read_window=self.read_window,
+                    adaptive_read_chunk=self.adaptive_read_chunk,
+                    upload_chunk_size=self.upload_chunk_size,
+                    upload_window=self.upload_window,
+                    rtt=self.rtt,
+                    heartbeat_interval=self.heartbeat_interval,
+                    dead_peer_timeout=self.dead_peer_timeout,
+                    record=self.recorder,
+                    stats=self.protocol_stats
                 )
+                if self.capabilities:
+                    self.zk_client.apply_capabilities(self.capabilities)
 
                 if self.zk_client.connect():
+                    self.capabilities = self.zk_client.get_capabilities()
+                    # the address may now answer with other firmware or another unit
+                    self._metadata = None
                     self.is_connected_flag = True
+                    if self.use_actor:
+                        self.actor = DeviceActor(self, poll_interval=self.poll_interval)
+                        self.actor.start()
                     logger.info(f"Connected to device {self.serial_number or self.ip}")
                     return True
 
             except Exception as e:
-                logger.error(f"Connection failed to {self.ip}:{self.port}: {e}")
+                logger.error(f"Connection failed to {self.ip}:{self.port}: {e}",
+                             extra={'rate_key': f"connect:{self.ip}:{self.port}"})
                 self.disconnect()
 
             return False
 
+    @staticmethod
+    def probe(addresses: Iterable[Tuple[str, int]], timeout: float = 5.0) -> Dict[Tuple[str, int], Optional[str]]:
+        """Check many devices concurrently, returning 'tcp', 'udp' or None per (ip, port)"""
+        return ZK.probe_devices(list(addresses), timeout)
+
     def disconnect(self):
-        """Disconnect from the device"""
+        """Disconnect from the device
+
+        The session is detached under the lock but the actor is stopped
+        outside it: stopping waits for the command in flight, and status
+        polls or a reconnect must not queue behind a long transfer.
+        """
         with self.lock:
-            if self.zk_client:
-                try:
-                    self.zk_client.disconnect()
-                except Exception as e:
-                    logger.error(f"Error disconnecting: {e}")
-                finally:
-                    self.zk_client = None
-            self.is_connected_flag = False
+            actor, self.actor = self.actor, None
+            zk_client, self.zk_client = self.zk_client, None
+            was_connected, self.is_connected_flag = self.is_connected_flag, False
+
+        if actor:
+            actor.stop()
+        if zk_client:
+            # keep the upload mode the device settled on for reconnects
+            self.upload_chunk_size = zk_client.upload_chunk_size
+            self.upload_window = zk_client.upload_window
+            if was_connected:
+                # also after the session died, what it learned still holds
+                self.capabilities = zk_client.get_capabilities()
+            try:
+                zk_client.disconnect()
+            except Exception as e:
+                logger.error(f"Error disconnecting: {e}")
 
     def is_connected(self) -> bool:
-        """Check if connected to the device"""
-        return self.is_connected_flag and self.zk_client is not None
+        """Check if connected to the device
+
+        False as soon as the session is known to be dead: the socket failed,
+        live capture hit its dead-peer deadline or commands keep timing out.
+        """
+        zk_client = self.zk_client
+        return (self.is_connected_flag and zk_client is not None
+                and zk_client.is_connect and not self.rtt.dead)
+
+    def get_capabilities(self) -> Optional[Dict]:
+        """Get the device's capability profile (protocol, record sizes, firmware)"""
+        zk_client = self.zk_client
+        if zk_client is not None and zk_client.is_connect:
+            self.capabilities = zk_client.get_capabilities()
+        return self.capabilities
+
+    def get_rtt_stats(self) -> Dict:
+        """Get the smoothed round trip time, timeout and timeout counters for this device"""
+        return self.rtt.snapshot()
+
+    def _call(self, priority: int, func: Callable, *args, **kwargs) -> Any:
+        """Run a ZK call on the device actor, or under the lock without one"""
+        actor = self.actor
+        if actor is not None and actor.is_alive() and not actor.in_actor_thread():
+            return actor.call(func, *args, priority=priority, **kwargs)
+        with self.lock:
+            return func(*args, **kwargs)
 
     def get_live_attendance(self) -> List[Dict]:
         """Get live attendance data using ZK library"""
@@ -72,7 +172,7 @@ class ZKDevice:
 
         try:
             attendance_data = []
-            records = self.zk_client.get_attendance()
+            records = self._call(PRIORITY_BULK, self.zk_client.get_attendance)
 
             for record in records:
                 attendance_data.append({
@@ -87,13 +187,55 @@ class ZKDevice:
             logger.error(f"Error getting attendance from device {self.serial_number}: {e}")
             return []
 
-    def live_capture(self) -> Generator[Dict, None, None]:
-        """Live capture of attendance events using ZK library"""
+    def get_attendance_count(self) -> Optional[int]:
+        """Get the number of attendance records stored on the device"""
+        if not self.is_connected():
+            return None
+
+        try:
+            def count():
+                self.zk_client.read_sizes()
+                return self.zk_client.records
+            return self._call(PRIORITY_NORMAL, count)
+        except Exception as e:
+            logger.error(f"Error reading record count from device {self.serial_number}: {e}")
+            return None
+
+    def get_new_attendance(self, known_records: int) -> Tuple[List[Dict], Optional[int]]:
+        """Get the attendance records logged after the first known_records
+
+        Only the tail of the device log is transferred. Returns the records and
+        the device's record count, or ([], None) if the log can't be read.
+        """
+        if not self.is_connected():
+            return [], None
+
+        try:
+            records, count = self._call(PRIORITY_BULK, self.zk_client.get_attendance_tail, known_records)
+            return [
+                {
+                    'user_id': record.user_id,
+                    'timestamp': record.timestamp,
+                    'status': record.status,
+                    'punch': record.punch
+                }
+                for record in records
+            ], count
+        except Exception as e:
+            logger.error(f"Error reading new attendance from device {self.serial_number}: {e}")
+            return [], None
+
+    def live_capture(self, on_started: Callable[[], None] = None) -> Generator[Dict, None, None]:
+        """Live capture of attendance events using ZK library
+
+        on_started is called once the device streams events; device calls
+        made from it run with capture paused, and events keep queueing.
+        """
         if not self.is_connected():
             return
 
         try:
-            for attendance in self.zk_client.live_capture():
+            for attendance in self._capture_events(on_started):
                 if attendance:
                     yield {
                         'user_id': attendance.user_id,
@@ -102,7 +244,56 @@ class ZKDevice:
                         'punch': attendance.punch
                     }
         except Exception as e:
-            logger.error(f"Error in live capture for device {self.serial_number}: {e}")
+            logger.error(f"Error in live capture for device {self.serial_number}: {e}",
+                         extra={'rate_key': f"live_capture:{self.serial_number or self.ip}"})
+
+    def _capture_events(self, on_started: Callable[[], None] = None) -> Generator[Optional[Attendance], None, None]:
+        """Yield live events, from the actor's stream when one owns the socket"""
+        actor = self.actor
+        if actor is None:
+            zk_client = self.zk_client
+            for event in zk_client.live_capture():
+                if on_started is not None:
+                    zk_client.pause_live_capture()
+                    try:
+                        self._run_hook(on_started)
+                    finally:
+                        zk_client.resume_live_capture()
+                    on_started = None
+                yield event
+            return
+
+        actor.start_capture()
+        try:
+            while actor.capturing or not actor.events.empty():
+                if on_started is not None and actor.capture_started.is_set():
+                    self._run_hook(on_started)
+                    on_started = None
+                try:
+                    event = actor.events.get(timeout=self.poll_interval)
+                except Empty:
+                    yield None
+                    continue
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            actor.stop_capture()
+
+    def stop_live_capture(self):
+        """End a running live_capture; the generator returns once pending events are consumed"""
+        actor = self.actor
+        if actor is not None:
+            actor.stop_capture()
+        elif self.zk_client is not None:
+            self.zk_client.end_live_capture = True
+
+    def _run_hook(self, hook: Callable[[], None]):
+        """Run a capture hook without letting its errors end the capture"""
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Live capture hook failed on device {self.serial_number}: {e}")
 
     def get_device_info(self) -> Optional[Dict]:
         """Get device information"""
@@ -110,57 +301,215 @@ class ZKDevice:
             return None
 
         try:
-            device_time = self.zk_client.get_time()
+            self.get_metadata()
+            device_time = self._call(PRIORITY_NORMAL, self.zk_client.get_time)
 
-            return {
-                'serial_number': self.serial_number or 'Unknown',
-                'ip_address': self.ip,
-                'device_time': device_time.isoformat() if device_time else 'Unknown',
-                'platform': 'ZK Device',
-                'device_name': f'ZK Device {self.ip}'
-            }
+            info = self.get_cached_info()
+            info['device_time'] = device_time.isoformat() if device_time else 'Unknown'
+            return info
         except Exception as e:
             logger.error(f"Error getting device info: {e}")
             return None
 
+    def get_protocol_stats(self) -> Optional[Dict]:
+        """Per command counts, round trip histograms, bytes, retries and timeouts, None if not enabled"""
+        if self.protocol_stats is None:
+            return None
+        return self.protocol_stats.snapshot()
+
+    def get_cached_info(self) -> Dict:
+        """Get device information without touching the network, from cached metadata only"""
+        info = {
+            'serial_number': self.serial_number or 'Unknown',
+            'ip_address': self.ip,
+            'device_time': 'Unknown',
+            'platform': 'Unknown',
+            'device_name': f'ZK Device {self.ip}'
+        }
+        if self._metadata:
+            info.update(self._metadata)
+            info['serial_number'] = info['serial_number'] or self.serial_number or 'Unknown'
+        return info
+
+    def get_metadata(self, refresh: bool = False) -> Optional[Dict]:
+        """Get the device's static metadata, read from the device at most once per metadata_ttl"""
+        if (not refresh and self._metadata is not None
+                and time.monotonic() - self._metadata_time < self.metadata_ttl):
+            return dict(self._metadata)
+        if not self.is_connected():
+            return dict(self._metadata) if self._metadata else None
+
+        try:
+            metadata = self._call(PRIORITY_NORMAL, self._read_metadata)
+        except Exception as e:
+            logger.error(f"Error reading metadata from device {self.serial_number}: {e}")
+            return dict(self._metadata) if self._metadata else None
+
+        self._metadata = metadata
+        self._metadata_time = time.monotonic()
+        return dict(metadata)
+
+    def _read_metadata(self) -> Dict:
+        zk_client = self.zk_client
+        return {
+            'serial_number': zk_client.get_serialnumber(),
+            'firmware_version': zk_client.get_firmware_version(),
+            'platform': zk_client.get_platform(),
+            'mac': zk_client.get_mac(),
+            'device_name': zk_client.get_device_name() or f'ZK Device {self.ip}',
+            'fp_version': zk_client.get_fp_version(),
+            'face_version': zk_client.get_face_version()
+        }
+
     def sync_time(self) -> bool:
         """Synchronize device time with system time"""
         if not self.is_connected():
             return False
 
         try:
-            return self.zk_client.set_time(datetime.now())
+            return self._call(PRIORITY_CONTROL, lambda: self.zk_client.set_time(datetime.now()))
         except Exception as e:
             logger.error(f"Error syncing time with device {self.serial_number}: {e}")
             return False
 
+    def unlock(self, seconds: int = 3) -> bool:
+        """Open the door for the given number of seconds"""
+        if not self.is_connected():
+            return False
+
+        try:
+            return self._call(PRIORITY_CONTROL, self.zk_client.unlock, seconds)
+        except Exception as e:
+            logger.error(f"Error unlocking device {self.serial_number}: {e}")
+            return False
+
     def clear_attendance_log(self) -> bool:
         """Clear attendance log on device"""
         if not self.is_connected():
             return False
 
         try:
-            return self.zk_client.clear_attendance()
+            return self._call(PRIORITY_NORMAL, self.zk_client.clear_attendance)
         except Exception as e:
             logger.error(f"Error clearing attendance log on device {self.serial_number}: {e}")
             return False
 
-    def get_users(self) -> List[Dict]:
-        """Get users from device"""
+    def get_users(self) -> Optional[List[Dict]]:
+        """Get users from device
+
+        Returns None if the users can't be read, so callers comparing
+        against the device never mistake a failed read for an empty one.
+        """
         if not self.is_connected():
-            return []
+            return None
 
         try:
-            users = self.zk_client.get_users()
+            users = self._call(PRIORITY_BULK, self.zk_client.get_users)
             return [
                 {
                     'uid': user.uid,
                     'name': user.name,
                     'privilege': user.privilege,
-                    'user_id': user.user_id
+                    'user_id': user.user_id,
+                    'password': user.password,
+                    'group_id': user.group_id,
+                    'card': user.card
                 }
                 for user in users
             ]
         except Exception as e:
             logger.error(f"Error getting users from device {self.serial_number}: {e}")
-            return []
\ No newline at end of file
+            return None
+
+    def get_templates(self) -> Optional[List[Finger]]:
+        """Get all fingerprint templates from device, None if they can't be read"""
+        if not self.is_connected():
+            return None
+
+        try:
+            return self._call(PRIORITY_BULK, self.zk_client.get_templates)
+        except Exception as e:
+            logger.error(f"Error getting templates from device {self.serial_number}: {e}")
+            return None
+
+    def get_template_hashes(self) -> Optional[Dict[Tuple[int, int], str]]:
+        """Get the content hash of every template on the device keyed by (uid, fid)
+
+        Templates are hashed as they are parsed, so the blobs are never held
+        in memory together. Returns None if the templates can't be read.
+        """
+        if not self.is_connected():
+            return None
+
+        try:
+            return self._call(PRIORITY_BULK, lambda: {
+                (finger.uid, finger.fid): finger.content_hash()
+                for finger in self.zk_client.iter_templates()
+            })
+        except Exception as e:
+            logger.error(f"Error hashing templates on device {self.serial_number}: {e}")
+            return None
+
+    def push_users(self, users: Iterable[Union[Dict, User]], batch_size: int = 500,
+                   progress_callback: Callable[[int, int], None] = None,
+                   templates: Dict[int, List[Finger]] = None) -> int:
+        """Upload users in buffered batches, refreshing the device once per batch
+
+        Users may be dicts shaped like get_users() output or User objects.
+        templates optionally maps a uid to the fingers uploaded with that user.
+        progress_callback is called as (pushed, total) after every batch.
+        Returns the number of users pushed.
+        """
+        if not self.is_connected():
+            return 0
+
+        pending = [self._to_user(user) for user in users]
+        if templates:
+            pending = [(user, templates.get(user.uid, [])) for user in pending]
+        total = len(pending)
+        pushed = 0
+
+        try:
+            # one actor call per batch lets control commands and capture run in between
+            for start in range(0, total, batch_size):
+                batch = pending[start:start + batch_size]
+                pushed += self._call(PRIORITY_BULK, self.zk_client.set_users_bulk, batch)
+                logger.debug(f"Pushed {pushed}/{total} users to device {self.serial_number}")
+                if progress_callback:
+                    progress_callback(pushed, total)
+        except Exception as e:
+            logger.error(f"Error pushing users to device {self.serial_number}: {e}")
+
+        return pushed
+
+    def delete_users(self, user_ids: Iterable[str]) -> int:
+        """Delete users by user_id with a single user table download and refresh
+
+        Returns the number of users deleted.
+        """
+        if not self.is_connected():
+            return 0
+
+        try:
+            deleted = self._call(PRIORITY_BULK, self.zk_client.delete_users,
+                                 user_ids=[str(user_id) for user_id in user_ids])
+            logger.info(f"Deleted {deleted} users from device {self.serial_number}")
+            return deleted
+        except Exception as e:
+            logger.error(f"Error deleting users from device {self.serial_number}: {e}")
+            return 0
+
+    @staticmethod
+    def _to_user(user: Union[Dict, User]) -> User:
+        """Build a User object from a get_users()-style dict"""
+        if isinstance(user, User):
+            return user
+        return User(
+            uid=user['uid'],
+            name=user.get('name', ''),
+            privilege=user.get('privilege', 0),
+            password=user.get('password', ''),
+            group_id=user.get('group_id', ''),
+            user_id=str(user.get('user_id') or user['uid']),
+            card=user.get('card', 0)
+        )
\ No newline at end of file
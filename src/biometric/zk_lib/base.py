@@ -1,9 +1,11 @@
 # src/biometric/zk_lib/base.py
 # -*- coding: utf-8 -*-
 import sys
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
 from socket import AF_INET, SOCK_DGRAM, SOCK_STREAM, socket, timeout
-from struct import pack, unpack
+from struct import iter_unpack, pack, unpack
 import codecs
 import logging
 from typing import List, Optional, Dict, Any, Generator, Union, Tuple
@@ -11,6 +13,11 @@ from typing import List, Optional, Dict, Any, Generator, Union, Tuple
 from . import const
 from .attendance import Attendance
 from .exception import ZKErrorConnection, ZKErrorResponse, ZKNetworkError
+from .framing import TCPFrameBuffer
+from .instrument import InstrumentedSocket
+from .probe import probe_devices
+from .rtt import RTTEstimator
+from .session_log import SessionRecorder, SessionReplay
 from .user import User
 from .finger import Finger
 
@@ -82,6 +89,14 @@ class ZK_helper(object):
         self.client.close()
         return res
 
+    def probe(self, timeout=5.0, udp=True):
+        """
+        in-process reachability check, no subprocess and no blocking connect
+
+        :return: 'tcp', 'udp' or None if the device didn't answer
+        """
+        return probe_devices([self.address], timeout, udp)[self.address]
+
     def test_udp(self):
         """
         test UDP connection
@@ -95,10 +110,55 @@ class ZK(object):
     ZK main class - Complete version with all original functions
     """
 
+    # read chunk size that worked for each firmware version, shared by all
+    # instances so every device on the same firmware skips the probe
+    _read_chunk_sizes = {}
+
+    # protocol each (ip, port) last connected with, so reconnects skip the probe
+    _protocols = {}
+
+    # commands whose reply waits on work inside the terminal (flash writes,
+    # buffer preparation, bulk transfers); they keep the static timeout and
+    # are not used as RTT samples
+    SLOW_COMMANDS = frozenset([
+        const.CMD_DB_RRQ, const.CMD_USERTEMP_RRQ,
+        const.CMD_ATTLOG_RRQ, const.CMD_CLEAR_DATA, const.CMD_CLEAR_ATTLOG,
+        const.CMD_STARTENROLL, const.CMD_REFRESHDATA, const.CMD_PREPARE_DATA,
+        const.CMD_DATA, const.CMD_FREE_DATA, 88, 110, 1503, 1504
+    ])
+
     def __init__(self, ip, port=4370, timeout=60, password=0, force_udp=False,
-                 ommit_ping=False, verbose=False, encoding='UTF-8'):
+                 ommit_ping=False, verbose=False, encoding='UTF-8',
+                 read_window=1, adaptive_read_chunk=False,
+                 upload_chunk_size=1024, upload_window=1, rtt=None,
+                 heartbeat_interval=None, dead_peer_timeout=None,
+                 record=None, socket_factory=None, stats=None):
         """
         Construct a new 'ZK' object.
+
+        read_window > 1 keeps that many chunk requests in flight during
+        buffered reads over TCP; adaptive_read_chunk probes the largest chunk
+        the firmware will serve. upload_chunk_size and upload_window do the
+        same for buffered uploads, falling back to 1024 byte stop-and-wait
+        if the firmware rejects them.
+
+        rtt is an RTTEstimator; pass the same one to every instance created
+        for a device to keep its round trip estimates across reconnects.
+
+        During live capture, heartbeat_interval seconds without traffic
+        re-register for events as a heartbeat, and dead_peer_timeout seconds
+        of silence end the capture with ZKNetworkError.
+
+        ommit_ping skips the reachability probe: unless the protocol is
+        already known for the address, tcp is assumed (force_udp for udp).
+
+        record is a file path (or SessionRecorder) that gets every frame sent
+        and received, for replaying the session later with ZK.replay().
+        socket_factory(tcp) replaces socket creation, e.g. a SessionReplay.
+
+        stats is a ProtocolStats that gets per command counts, round trip
+        times, bytes, retries and timeouts; like rtt, share it across
+        reconnects. Without one nothing is measured.
         """
         User.encoding = encoding
         self.__address = (ip, port)
@@ -134,14 +194,59 @@ class ZK(object):
         self.next_user_id = '1'
         self.user_packet_size = 28
         self.end_live_capture = False
+        self.__user_index = None
+        self.read_window = max(1, int(read_window))
+        self.adaptive_read_chunk = adaptive_read_chunk
+        self.last_read_stats = {}
+        # largest chunk the device served when asked for more, once seen
+        self.__read_chunk_limit = None
+        self.upload_chunk_size = max(1024, int(upload_chunk_size))
+        self.upload_window = max(1, int(upload_window))
+        self.__firmware_version = None
+        self.__record_size = None
+        self.__event_size = None
+        # (size, count) of the sizes picked for ambiguous event payloads in a row
+        self.__event_vote = (None, 0)
+        self.__capabilities = {}
+        self.__frames = TCPFrameBuffer()
+        self.__pending_events = deque()
+        self.__capture_timeout = None
+        self.__last_heard = self.__last_heartbeat = 0
+        self.heartbeat_interval = heartbeat_interval
+        self.dead_peer_timeout = dead_peer_timeout
+        # commands that timed out and whose replies may still arrive
+        self.__stale_replies = 0
+        self.__rtt = rtt if rtt is not None else RTTEstimator(max_rto=timeout)
+        self.__stats = stats
+        if record is not None and not isinstance(record, SessionRecorder):
+            record = SessionRecorder(record)
+        self.__socket_factory = socket_factory or record
         self.__create_socket()
 
+    @classmethod
+    def replay(cls, path, realtime=False, **kwargs):
+        """
+        a ZK that plays back a session recorded with record=, no device needed
+
+        call the same methods in the same order as the recorded session did
+        """
+        session = SessionReplay(path, realtime=realtime)
+        if session.address is None:
+            raise ValueError('%s holds no recorded session' % path)
+        kwargs.setdefault('ommit_ping', True)
+        kwargs.setdefault('force_udp', session.protocol == 'udp')
+        return cls(session.address[0], session.address[1], socket_factory=session, **kwargs)
+
     def __create_socket(self):
         """Create appropriate socket based on connection type"""
-        if self.tcp:
+        if self.__socket_factory is not None:
+            self.__sock = self.__socket_factory(self.tcp)
+        elif self.tcp:
             self.__sock = socket(AF_INET, SOCK_STREAM)
         else:
             self.__sock = socket(AF_INET, SOCK_DGRAM)
+        if self.__stats is not None:
+            self.__sock = InstrumentedSocket(self.__sock, self.__stats)
         self.__sock.settimeout(self.__timeout)
 
     def __create_tcp_top(self, packet):
@@ -157,7 +262,6 @@ class ZK(object):
         Puts a the parts that make up a packet together and packs them into a byte string
         """
         buf = pack('<4H', command, 0, session_id, reply_id) + command_string
-        buf = unpack('8B' + '%sB' % len(command_string), buf)
         checksum = unpack('H', self.__create_checksum(buf))[0]
         reply_id += 1
         if reply_id >= const.USHRT_MAX:
@@ -170,15 +274,13 @@ class ZK(object):
         Calculates the checksum of the packet to be sent to the time clock
         Copied from zkemsdk.c
         """
-        l = len(p)
         checksum = 0
-        while l > 1:
-            checksum += unpack('H', pack('BB', p[0], p[1]))[0]
-            p = p[2:]
+        # one pass over the 16 bit words, no re-slicing per word
+        for word, in iter_unpack('<H', p[:len(p) - len(p) % 2]):
+            checksum += word
             if checksum > const.USHRT_MAX:
                 checksum -= const.USHRT_MAX
-            l -= 2
-        if l:
+        if len(p) % 2:
             checksum = checksum + p[-1]
         while checksum > const.USHRT_MAX:
             checksum -= const.USHRT_MAX
@@ -205,25 +307,70 @@ class ZK(object):
         if command not in (const.CMD_CONNECT, const.CMD_AUTH) and (not self.is_connect):
             raise ZKErrorConnection('instance are not connected.')
 
+        if self.__rtt.dead and command not in (const.CMD_CONNECT, const.CMD_AUTH):
+            raise ZKNetworkError('device not responding (%i consecutive timeouts)' % self.__rtt.consecutive_timeouts)
+
+        if self.__stale_replies:
+            self.__discard_stale_replies()
+
         buf = self.__create_header(command, command_string, self.__session_id, self.__reply_id)
+        reply_id = unpack('<4H', buf[:8])[3]
+        adaptive = command not in self.SLOW_COMMANDS
+        if adaptive:
+            previous_timeout = self.__sock.gettimeout()
+            if command in (const.CMD_CONNECT, const.CMD_AUTH):
+                self.__sock.settimeout(self.__rtt.connect_timeout(previous_timeout))
+            else:
+                self.__sock.settimeout(self.__rtt.timeout(previous_timeout))
+        if self.__stats is not None:
+            self.__stats.sent(command, len(buf) + 8 if self.tcp else len(buf))
+        started = time.time()
 
         try:
             if self.tcp:
                 top = self.__create_tcp_top(buf)
                 self.__sock.send(top)
-                self.__tcp_data_recv = self.__sock.recv(response_size + 8)
+                self.__tcp_data_recv = self.__recv_tcp(response_size + 8)
                 self.__tcp_length = self.__test_tcp_top(self.__tcp_data_recv)
                 if self.__tcp_length == 0:
                     raise ZKNetworkError('TCP packet invalid')
                 self.__header = unpack('<4H', self.__tcp_data_recv[8:16])
+                while self.__stale_replies and self.__header[3] != reply_id:
+                    self.__skip_tcp_reply(response_size)
                 self.__data_recv = self.__tcp_data_recv[8:]
             else:
                 self.__sock.sendto(buf, self.__address)
                 self.__data_recv = self.__sock.recv(response_size)
                 self.__header = unpack('<4H', self.__data_recv[:8])
+                while self.__stale_replies and self.__header[3] != reply_id:
+                    # reply to a command that already timed out
+                    self.__data_recv = self.__sock.recv(response_size)
+                    self.__header = unpack('<4H', self.__data_recv[:8])
+        except timeout as e:
+            self.__rtt.on_timeout()
+            if self.__stats is not None:
+                self.__stats.timeout(command)
+            self.__stale_replies += 1
+            # the retry gets a new reply id, so the late reply can be told apart
+            self.__reply_id = reply_id
+            raise ZKNetworkError(str(e))
+        except OSError as e:
+            self.is_connect = False
+            raise ZKNetworkError(str(e))
         except Exception as e:
             raise ZKNetworkError(str(e))
+        finally:
+            if adaptive:
+                self.__sock.settimeout(previous_timeout)
 
+        if adaptive:
+            self.__rtt.sample(time.time() - started)
+        else:
+            self.__rtt.on_reply()
+        if self.__stats is not None:
+            self.__stats.reply(command, time.time() - started)
+        # replies come in order, everything sent before has been answered
+        self.__stale_replies = 0
         self.__response = self.__header[0]
         self.__reply_id = self.__header[3]
         self.__data = self.__data_recv[8:]
@@ -232,6 +379,45 @@ class ZK(object):
             return {'status': True, 'code': self.__response}
         return {'status': False, 'code': self.__response}
 
+    def __recv_tcp(self, size):
+        data = self.__sock.recv(size)
+        if not data:
+            self.is_connect = False
+            raise ZKNetworkError('connection closed by device')
+        return data
+
+    def __skip_tcp_reply(self, response_size):
+        """
+        drop the reply to a command that already timed out and read the next one
+        """
+        frame_end = 8 + self.__tcp_length
+        while len(self.__tcp_data_recv) < frame_end:
+            self.__tcp_data_recv += self.__recv_tcp(frame_end - len(self.__tcp_data_recv))
+        self.__tcp_data_recv = self.__tcp_data_recv[frame_end:]
+        self.__stale_replies -= 1
+        while len(self.__tcp_data_recv) < 16:
+            self.__tcp_data_recv += self.__recv_tcp(response_size + 8)
+        self.__tcp_length = self.__test_tcp_top(self.__tcp_data_recv)
+        if self.__tcp_length == 0:
+            raise ZKNetworkError('TCP packet invalid')
+        self.__header = unpack('<4H', self.__tcp_data_recv[8:16])
+
+    def __discard_stale_replies(self):
+        """
+        drop late replies to timed out commands that already arrived, so
+        they aren't taken as the reply to the next one
+        """
+        previous_timeout = self.__sock.gettimeout()
+        self.__sock.settimeout(0)
+        try:
+            while self.__sock.recv(1 << 16):
+                pass
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.__sock.settimeout(previous_timeout)
+        self.__frames.clear()
+
     def __ack_ok(self):
         """
         event ack ok
@@ -302,6 +488,21 @@ class ZK(object):
         d = (t.year % 100 * 12 * 31 + (t.month - 1) * 31 + t.day - 1) * 86400 + (t.hour * 60 + t.minute) * 60 + t.second
         return d
 
+    @classmethod
+    def probe_devices(cls, addresses, timeout=5.0):
+        """
+        probe many terminals concurrently and remember which protocol each
+        answered on, so connecting to them skips the probe
+
+        :param addresses: iterable of (ip, port)
+        :return: dict of (ip, port) -> 'tcp', 'udp' or None
+        """
+        results = probe_devices(addresses, timeout)
+        for address, protocol in results.items():
+            if protocol is not None:
+                cls._protocols[address] = protocol
+        return results
+
     def connect(self):
         """
         connect to the device
@@ -309,19 +510,42 @@ class ZK(object):
         :return: bool
         """
         self.end_live_capture = False
-        if not self.ommit_ping and (not self.helper.test_ping()):
-            raise ZKNetworkError("can't reach device (ping %s)" % self.__address[0])
-
-        if not self.force_udp and self.helper.test_tcp() == 0:
-            self.user_packet_size = 72
+        try:
+            return self.__connect()
+        except Exception:
+            # the device may have changed, probe again next time
+            ZK._protocols.pop(self.__address, None)
+            raise
+
+    def __connect(self):
+        if not self.force_udp:
+            protocol = getattr(self.__socket_factory, 'protocol', None) or ZK._protocols.get(self.__address)
+            if protocol is None and not self.ommit_ping:
+                protocol = self.helper.probe(
+                    timeout=self.__rtt.connect_timeout(min(self.__timeout, 10)))
+                if protocol is None:
+                    raise ZKNetworkError("can't reach device %s:%i" % self.__address)
+            if protocol is not None:
+                self.tcp = protocol == 'tcp'
+            # terminals that speak tcp use the 72 byte user record
+            self.user_packet_size = self.__capabilities.get(
+                'user_packet_size', 72 if self.tcp else 28)
 
         self.__create_socket()
+        self.__stale_replies = 0
         self.__session_id = 0
         self.__reply_id = const.USHRT_MAX - 1
 
-        # Connect to the device
+        # Connect to the device, giving up after a few RTOs on a known device
         if self.tcp:
-            self.__sock.connect(self.__address)
+            self.__sock.settimeout(self.__rtt.connect_timeout(self.__timeout))
+            try:
+                self.__sock.connect(self.__address)
+            except timeout:
+                self.__rtt.on_timeout()
+                raise
+            finally:
+                self.__sock.settimeout(self.__timeout)
 
         cmd_response = self.__send_command(const.CMD_CONNECT)
         self.__session_id = self.__header[2]
@@ -334,6 +558,9 @@ class ZK(object):
 
         if cmd_response.get('status'):
             self.is_connect = True
+            ZK._protocols[self.__address] = 'tcp' if self.tcp else 'udp'
+            if self.__capabilities.get('firmware_version'):
+                self.__check_capabilities()
             logger.info(f"Connected to device {self.__address[0]}:{self.__address[1]}")
             return self
 
@@ -344,6 +571,73 @@ class ZK(object):
             logger.debug('connect err response {} '.format(cmd_response['code']))
         raise ZKErrorResponse("Invalid response: Can't connect")
 
+    def get_capabilities(self):
+        """
+        what this instance found out about the terminal, to be handed to
+        apply_capabilities() before a later connect
+
+        :return: dict with protocol, user_packet_size and, once known,
+            attendance_record_size, live_event_size, firmware_version and
+            read_chunk_size
+        """
+        profile = {
+            'protocol': 'tcp' if self.tcp else 'udp',
+            'user_packet_size': int(self.user_packet_size)
+        }
+        if self.__record_size:
+            profile['attendance_record_size'] = self.__record_size
+        if self.__event_size:
+            profile['live_event_size'] = self.__event_size
+        if self.__firmware_version:
+            profile['firmware_version'] = self.__firmware_version
+            read_chunk_size = ZK._read_chunk_sizes.get(self.__firmware_version) or self.__read_chunk_limit
+            if read_chunk_size:
+                profile['read_chunk_size'] = read_chunk_size
+        return profile
+
+    def apply_capabilities(self, profile):
+        """
+        reuse a profile from get_capabilities(), call before connect()
+
+        the protocol skips the reachability probe, the record sizes select
+        the decoders and user packing without guessing; the profile is
+        dropped on connect if the firmware version no longer matches
+        """
+        self.__capabilities = dict(profile or {})
+        protocol = self.__capabilities.get('protocol')
+        if protocol in ('tcp', 'udp') and not self.force_udp:
+            ZK._protocols[self.__address] = protocol
+            self.tcp = protocol == 'tcp'
+        if self.__capabilities.get('user_packet_size') in (28, 72):
+            self.user_packet_size = self.__capabilities['user_packet_size']
+        else:
+            self.__capabilities.pop('user_packet_size', None)
+        self.__record_size = self.__capabilities.get('attendance_record_size')
+        event_size = self.__capabilities.get('live_event_size')
+        self.__event_size = event_size if event_size in dict(self.LIVE_EVENT_FORMATS) else None
+        self.__event_vote = (None, 0)
+        firmware_version = self.__capabilities.get('firmware_version')
+        if firmware_version and self.__capabilities.get('read_chunk_size'):
+            ZK._read_chunk_sizes.setdefault(firmware_version, self.__capabilities['read_chunk_size'])
+
+    def __check_capabilities(self):
+        """
+        drop an applied profile that was recorded for other firmware
+        """
+        expected = self.__capabilities['firmware_version']
+        try:
+            firmware_version = self.get_firmware_version()
+        except ZKErrorResponse:
+            firmware_version = None
+        if firmware_version == expected:
+            return
+        logger.info('firmware changed from %s to %s, rediscovering device capabilities' % (expected, firmware_version))
+        self.__capabilities = {}
+        self.__record_size = None
+        self.__event_size = None
+        self.__event_vote = (None, 0)
+        self.user_packet_size = 72 if self.tcp else 28
+
     def disconnect(self):
         """
         diconnect from the connected device
@@ -400,7 +694,8 @@ class ZK(object):
         cmd_response = self.__send_command(const.CMD_GET_VERSION, b'', 1024)
         if cmd_response.get('status'):
             firmware_version = self.__data.split(b'\x00')[0]
-            return firmware_version.decode()
+            self.__firmware_version = firmware_version.decode()
+            return self.__firmware_version
         raise ZKErrorResponse("Can't read firmware version")
 
     def get_serialnumber(self):
@@ -642,6 +937,14 @@ class ZK(object):
             return True
         raise ZKErrorResponse("Can't open door")
 
+    def rtt_stats(self):
+        """
+        smoothed round trip estimates for this device
+
+        :return: dict with srtt, rttvar, rto (seconds), samples, timeouts, consecutive_timeouts, dead
+        """
+        return self.__rtt.snapshot()
+
     def __str__(self):
         """
         for debug
@@ -729,6 +1032,27 @@ class ZK(object):
                 user_id = self.next_user_id
         if not user_id:
             user_id = str(uid)
+        command_string = self.__pack_user(uid, name, privilege, password, group_id, user_id, card)
+
+        response_size = 1024
+        cmd_response = self.__send_command(command, command_string, response_size)
+
+        if not cmd_response.get('status'):
+            raise ZKErrorResponse("Can't set user")
+
+        self.refresh_data()
+        self.__index_users([User(uid, name, privilege, password, group_id, user_id, card)])
+        if self.next_uid == uid:
+            self.next_uid += 1
+        if self.next_user_id == user_id:
+            self.next_user_id = str(self.next_uid)
+
+        return True
+
+    def __pack_user(self, uid, name, privilege, password, group_id, user_id, card):
+        """
+        pack a CMD_USER_WRQ payload for the current user packet size
+        """
         if privilege not in (const.USER_DEFAULT, const.USER_ADMIN):
             privilege = const.USER_DEFAULT
         privilege = int(privilege)
@@ -737,37 +1061,103 @@ class ZK(object):
             if not group_id:
                 group_id = 0
             try:
-                command_string = pack('HB5s8sIxBHI', uid, privilege, password.encode(self.encoding, errors='ignore'), name.encode(self.encoding, errors='ignore'), card, int(group_id), 0, int(user_id))
+                return pack('HB5s8sIxBHI', uid, privilege, password.encode(self.encoding, errors='ignore'), name.encode(self.encoding, errors='ignore'), card, int(group_id), 0, int(user_id))
             except Exception as e:
                 raise ZKErrorResponse("Can't pack user")
-        else:
-            name_pad = name.encode(self.encoding, errors='ignore').ljust(24, b'\x00')[:24]
-            card_str = pack('<I', int(card))[:4]
-            command_string = pack('HB8s24s4sx7sx24s', uid, privilege, password.encode(self.encoding, errors='ignore'), name_pad, card_str, group_id.encode(), user_id.encode())
 
-        response_size = 1024
-        cmd_response = self.__send_command(command, command_string, response_size)
+        name_pad = name.encode(self.encoding, errors='ignore').ljust(24, b'\x00')[:24]
+        card_str = pack('<I', int(card))[:4]
+        return pack('HB8s24s4sx7sx24s', uid, privilege, password.encode(self.encoding, errors='ignore'), name_pad, card_str, str(group_id).encode(), str(user_id).encode())
 
-        if not cmd_response.get('status'):
-            raise ZKErrorResponse("Can't set user")
+    def set_users_bulk(self, users):
+        """
+        create or update many users with a single buffered upload
+
+        :param users: list of User objects, or (User, [Finger]) pairs to
+            upload templates along with the user
+        :return: number of users written
+        """
+        entries = []
+        for item in users:
+            if isinstance(item, User):
+                entries.append((item, []))
+            else:
+                user, fingers = item
+                if isinstance(fingers, Finger):
+                    fingers = [fingers]
+                entries.append((user, list(fingers or [])))
+
+        if not entries:
+            return 0
+
+        upack = []
+        table = []
+        fpack = []
+        fnum = 16
+        tstart = 0
+
+        for user, fingers in entries:
+            if self.user_packet_size == 28:
+                upack.append(user.repack29())
+            else:
+                upack.append(user.repack73())
+            for finger in fingers:
+                tfp = finger.repack_only()
+                table.append(pack('<bHbI', 2, user.uid, fnum + finger.fid, tstart))
+                tstart += len(tfp)
+                fpack.append(tfp)
+
+        upack = b''.join(upack)
+        table = b''.join(table)
+        fpack = b''.join(fpack)
+
+        try:
+            head = pack('III', len(upack), len(table), len(fpack))
+            self._send_with_buffer(head + upack + table + fpack)
+            command = 110
+            command_string = pack('<IHH', 12, 0, 8)
+            cmd_response = self.__send_command(command, command_string)
+            if not cmd_response.get('status'):
+                raise ZKErrorResponse("Can't save users")
+        except ZKErrorResponse:
+            if table:
+                raise
+            # firmware without buffered user upload: write users back to
+            # back and refresh once at the end
+            if self.verbose:
+                logger.debug('buffered user upload rejected, falling back to CMD_USER_WRQ')
+            for user, _fingers in entries:
+                command_string = self.__pack_user(user.uid, user.name, user.privilege, user.password,
+                                                  user.group_id, user.user_id, user.card)
+                cmd_response = self.__send_command(const.CMD_USER_WRQ, command_string, 1024)
+                if not cmd_response.get('status'):
+                    raise ZKErrorResponse("Can't set user %s" % user.user_id)
 
         self.refresh_data()
-        if self.next_uid == uid:
-            self.next_uid += 1
-        if self.next_user_id == user_id:
+        self.__index_users([user for user, _fingers in entries])
+
+        max_uid = max(user.uid for user, _fingers in entries)
+        if max_uid >= self.next_uid:
+            self.next_uid = max_uid + 1
             self.next_user_id = str(self.next_uid)
 
-        return True
+        return len(entries)
 
     def _send_with_buffer(self, buffer):
         MAX_CHUNK = 1024
         size = len(buffer)
-        self.free_data()
-        command = const.CMD_PREPARE_DATA
-        command_string = pack('I', size)
-        cmd_response = self.__send_command(command, command_string)
-        if not cmd_response.get('status'):
-            raise ZKErrorResponse("Can't prepare data")
+        self.__prepare_upload(size)
+
+        if self.tcp and (self.upload_chunk_size > MAX_CHUNK or self.upload_window > 1):
+            try:
+                self.__send_chunks_windowed(buffer, self.upload_chunk_size, self.upload_window)
+                return
+            except (ZKErrorResponse, ZKNetworkError, timeout) as e:
+                # remember the firmware can't take it and start over
+                logger.info("Windowed upload rejected (%s), falling back to %i byte chunks" % (e, MAX_CHUNK))
+                self.upload_chunk_size = MAX_CHUNK
+                self.upload_window = 1
+                self.__prepare_upload(size)
 
         remain = size % MAX_CHUNK
         packets = (size - remain) // MAX_CHUNK
@@ -780,6 +1170,55 @@ class ZK(object):
         if remain:
             self.__send_chunk(buffer[start:start + remain])
 
+    def __prepare_upload(self, size):
+        self.free_data()
+        command = const.CMD_PREPARE_DATA
+        command_string = pack('I', size)
+        cmd_response = self.__send_command(command, command_string)
+        if not cmd_response.get('status'):
+            raise ZKErrorResponse("Can't prepare data")
+
+    def __send_chunks_windowed(self, buffer, chunk_size, window):
+        """
+        send CMD_DATA chunks of chunk_size with up to window unacknowledged
+        """
+        view = memoryview(buffer)
+        pending = deque(range(0, len(buffer), chunk_size))
+        in_flight = set()
+
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < window:
+                    start = pending.popleft()
+                    in_flight.add(self.__send_packet(const.CMD_DATA, bytes(view[start:start + chunk_size])))
+
+                header, _data = self.__recv_frame()
+                if header[3] not in in_flight:
+                    continue
+                in_flight.discard(header[3])
+                if header[0] != const.CMD_ACK_OK:
+                    raise ZKErrorResponse("chunk rejected (%i)" % header[0])
+        except Exception:
+            self.__drain_replies(in_flight)
+            raise
+
+    def __drain_replies(self, reply_ids, wait=1.0):
+        """
+        swallow late replies to abandoned requests so they don't get read
+        as the answer to the next command
+        """
+        pending = set(reply_ids)
+        self.__sock.settimeout(wait)
+        try:
+            while pending:
+                header, _data = self.__recv_frame()
+                pending.discard(header[3])
+        except Exception:
+            pass
+        finally:
+            self.__sock.settimeout(self.__timeout)
+            self.__frames.clear()
+
     def __send_chunk(self, command_string):
         command = const.CMD_DATA
         cmd_response = self.__send_command(command, command_string)
@@ -792,16 +1231,10 @@ class ZK(object):
         save user and template
         """
         if not isinstance(user, User):
-            users = self.get_users()
-            tusers = list(filter(lambda x: x.uid == user, users))
-            if len(tusers) == 1:
-                user = tusers[0]
-            else:
-                tusers = list(filter(lambda x: x.user_id == str(user, users)))
-                if len(tusers) == 1:
-                    user = tusers[0]
-                else:
-                    raise ZKErrorResponse("Can't find user")
+            tuser = self.__find_user(uid=user) or self.__find_user(user_id=user)
+            if tuser is None:
+                raise ZKErrorResponse("Can't find user")
+            user = tuser
 
         if isinstance(fingers, Finger):
             fingers = [fingers]
@@ -842,18 +1275,16 @@ class ZK(object):
         """
         if self.tcp and user_id:
             command = 134
-            command_string = pack('<24sB', str(user_id), temp_id)
+            command_string = pack('<24sB', str(user_id).encode(), temp_id)
             cmd_response = self.__send_command(command, command_string)
             if cmd_response.get('status'):
                 return True
             return False
 
         if not uid:
-            users = self.get_users()
-            users = list(filter(lambda x: x.user_id == str(user_id), users))
-            if not users:
+            uid = self.__resolve_uid(user_id)
+            if uid is None:
                 return False
-            uid = users[0].uid
 
         command = const.CMD_DELETE_USERTEMP
         command_string = pack('hb', uid, temp_id)
@@ -868,11 +1299,9 @@ class ZK(object):
         delete specific user by uid or user_id
         """
         if not uid:
-            users = self.get_users()
-            users = list(filter(lambda x: x.user_id == str(user_id), users))
-            if not users:
+            uid = self.__resolve_uid(user_id)
+            if uid is None:
                 return False
-            uid = users[0].uid
 
         command = const.CMD_DELETE_USER
         command_string = pack('h', uid)
@@ -882,26 +1311,142 @@ class ZK(object):
             raise ZKErrorResponse("Can't delete user")
 
         self.refresh_data()
+        self.__unindex_uids([uid])
         if uid == self.next_uid - 1:
             self.next_uid = uid
 
         return True
 
+    def delete_users(self, uids=(), user_ids=()):
+        """
+        delete many users by uid and/or user_id, refreshing the device once
+
+        user_ids are resolved through the cached user index, so the user
+        table is downloaded at most once
+
+        :return: number of users deleted
+        """
+        targets = [int(uid) for uid in uids if uid]
+        unresolved = []
+        for user_id in user_ids:
+            uid = self.__resolve_uid(user_id, refresh_on_miss=False)
+            if uid is None:
+                unresolved.append(user_id)
+            else:
+                targets.append(uid)
+
+        if unresolved:
+            # the cache may predate enrolments made on the terminal
+            self.get_users()
+            for user_id in unresolved:
+                uid = self.__resolve_uid(user_id, refresh_on_miss=False)
+                if uid is None:
+                    if self.verbose:
+                        logger.debug('user_id %s not found, skipping delete' % user_id)
+                    continue
+                targets.append(uid)
+
+        deleted = []
+        for uid in dict.fromkeys(targets):
+            cmd_response = self.__send_command(const.CMD_DELETE_USER, pack('h', uid))
+            if cmd_response.get('status'):
+                deleted.append(uid)
+            else:
+                logger.warning("Can't delete user uid %i (response %i)" % (uid, cmd_response['code']))
+
+        if deleted:
+            self.refresh_data()
+            self.__unindex_uids(deleted)
+            if max(deleted) == self.next_uid - 1:
+                self.next_uid = max(deleted)
+
+        return len(deleted)
+
+    def delete_user_templates(self, templates):
+        """
+        delete many templates given as (uid or user_id, temp_id) pairs,
+        refreshing the device once
+
+        :return: number of templates deleted
+        """
+        deleted = 0
+        for user, temp_id in templates:
+            uid = user if isinstance(user, int) else self.__resolve_uid(user)
+            if uid is None:
+                continue
+            command_string = pack('hb', uid, temp_id)
+            cmd_response = self.__send_command(const.CMD_DELETE_USERTEMP, command_string)
+            if cmd_response.get('status'):
+                deleted += 1
+
+        if deleted:
+            self.refresh_data()
+        return deleted
+
+    def __index_users(self, users):
+        """
+        add or update users in the cached user_id -> User index
+        """
+        if self.__user_index is None:
+            return
+        # one pass over the index per batch, the last entry for a uid wins
+        latest = {user.uid: user for user in users}
+        index = {key: indexed for key, indexed in self.__user_index.items() if indexed.uid not in latest}
+        for user in latest.values():
+            index[str(user.user_id)] = user
+        self.__user_index = index
+
+    def __unindex_uids(self, uids):
+        """
+        drop deleted uids from the cached user index
+        """
+        if self.__user_index is None:
+            return
+        uids = set(uids)
+        self.__user_index = {key: user for key, user in self.__user_index.items() if user.uid not in uids}
+
+    def __find_user(self, uid=None, user_id=None, refresh_on_miss=True):
+        """
+        look a user up in the cached index, downloading the user table only
+        on a cold cache or (optionally) a miss
+        """
+        refreshed = False
+        if self.__user_index is None:
+            self.get_users()
+            refreshed = True
+
+        while True:
+            if user_id is not None:
+                user = self.__user_index.get(str(user_id))
+            else:
+                user = next((u for u in self.__user_index.values() if u.uid == uid), None)
+            if user is not None or refreshed or not refresh_on_miss:
+                return user
+            self.get_users()
+            refreshed = True
+
+    def __resolve_uid(self, user_id, refresh_on_miss=True):
+        """
+        return the uid for a user_id, or None if the device doesn't know it
+        """
+        user = self.__find_user(user_id=user_id, refresh_on_miss=refresh_on_miss)
+        return user.uid if user else None
+
     def get_user_template(self, uid, temp_id=0, user_id=''):
         """
         get user template
         """
         if not uid:
-            users = self.get_users()
-            users = list(filter(lambda x: x.user_id == str(user_id), users))
-            if not users:
+            uid = self.__resolve_uid(user_id)
+            if uid is None:
                 return False
-            uid = users[0].uid
 
-        for _retries in range(3):
+        for _retries in range(self.__rtt.retry_budget()):
             command = 88
             command_string = pack('hb', uid, temp_id)
             response_size = 1032
+            if _retries and self.__stats is not None:
+                self.__stats.retry(command)
             cmd_response = self.__send_command(command, command_string, response_size)
             data = self.__recieve_chunk()
             if data is not None:
@@ -916,28 +1461,35 @@ class ZK(object):
         """
         get all templates
         """
+        return list(self.iter_templates())
+
+    def iter_templates(self) -> Generator[Finger, None, None]:
+        """
+        iterate over all templates, yielding Finger objects as they are parsed
+
+        the template dump is walked with offsets over a memoryview, so each
+        template is copied exactly once
+        """
         self.read_sizes()
         if self.fingers == 0:
-            return []
+            return
 
-        templates = []
         templatedata, size = self.read_with_buffer(const.CMD_DB_RRQ, const.FCT_FINGERTMP)
 
         if size < 4:
-            return []
-
-        total_size = unpack('i', templatedata[0:4])[0]
-        templatedata = templatedata[4:]
+            return
 
-        while total_size:
-            size, uid, fid, valid = unpack('HHbb', templatedata[:6])
-            template = unpack('%is' % (size - 6), templatedata[6:size])[0]
-            finger = Finger(uid, fid, valid, template)
-            templates.append(finger)
-            templatedata = templatedata[size:]
-            total_size -= size
+        view = memoryview(templatedata)
+        total_size = unpack('i', view[0:4])[0]
+        end = min(len(view), 4 + total_size)
+        offset = 4
 
-        return templates
+        while offset + 6 <= end:
+            size, uid, fid, valid = unpack('HHbb', view[offset:offset + 6])
+            if size < 6 or offset + size > end:
+                break
+            yield Finger(uid, fid, valid, bytes(view[offset + 6:offset + size]))
+            offset += size
 
     def cancel_capture(self):
         """
@@ -983,12 +1535,10 @@ class ZK(object):
         done = False
 
         if not user_id:
-            users = self.get_users()
-            users = list(filter(lambda x: x.uid == uid, users))
-            if len(users) >= 1:
-                user_id = users[0].user_id
-            else:
+            user = self.__find_user(uid=uid)
+            if user is None:
                 return False
+            user_id = user.user_id
 
         if self.tcp:
             command_string = pack('<24sbb', str(user_id).encode(), temp_id, 1)
@@ -1024,52 +1574,53 @@ class ZK(object):
             return []
 
         users = self.get_users()
-        attendances = []
         attendance_data, size = self.read_with_buffer(const.CMD_ATTLOG_RRQ)
 
         if size < 4:
             return []
 
         total_size = unpack('I', attendance_data[:4])[0]
-        record_size = total_size / self.records
-        attendance_data = attendance_data[4:]
+        self.__record_size = self.__pick_record_size(total_size, self.records, self.__record_size, (8, 16, 40))
+        return list(self.__iter_attendance(memoryview(attendance_data)[4:], self.__record_size, users))
 
-        if record_size == 8:
-            while len(attendance_data) >= 8:
-                uid, status, timestamp, punch = unpack('HB4sB', attendance_data.ljust(8, b'\x00')[:8])
-                attendance_data = attendance_data[8:]
-                tuser = list(filter(lambda x: x.uid == uid, users))
-                if not tuser:
-                    user_id = str(uid)
-                else:
-                    user_id = tuser[0].user_id
-                timestamp = self.__decode_time(timestamp)
-                attendance = Attendance(user_id, timestamp, status, punch, uid)
-                attendances.append(attendance)
+    def get_attendance_tail(self, known_records):
+        """
+        return only the attendance records logged after the first known_records
+
+        the device still prepares the whole log but only the tail is
+        transferred; a log that shrank (cleared) is read from the start
+
+        :return: (list of Attendance, number of records now on the device)
+        """
+        self.read_sizes()
+        records = self.records
+        if records <= known_records:
+            if records < known_records and records:
+                return self.get_attendance(), records
+            return [], records
+        if not self.__record_size:
+            # first download: learn the record size, then keep the tail
+            return self.get_attendance()[known_records:], records
+
+        if self.__record_size == 40:
+            users = []
+        elif self.__user_index is not None:
+            users = list(self.__user_index.values())
         else:
-            while record_size == 16 and len(attendance_data) >= 16:
-                user_id, timestamp, status, punch, reserved, workcode = unpack('<I4sBB2sI', attendance_data.ljust(16, b'\x00')[:16])
-                user_id = str(user_id)
-                attendance_data = attendance_data[16:]
-                tuser = list(filter(lambda x: x.user_id == user_id, users))
-                if not tuser:
-                    uid = str(user_id)
-                else:
-                    uid = tuser[0].uid
-                    user_id = tuser[0].user_id
-                timestamp = self.__decode_time(timestamp)
-                attendance = Attendance(user_id, timestamp, status, punch, uid)
-                attendances.append(attendance)
-            else:
-                while len(attendance_data) >= 40:
-                    uid, user_id, status, timestamp, punch, space = unpack('<H24sB4sB8s', attendance_data.ljust(40, b'\x00')[:40])
-                    user_id = user_id.split(b'\x00')[0].decode(errors='ignore')
-                    timestamp = self.__decode_time(timestamp)
-                    attendance = Attendance(user_id, timestamp, status, punch, uid)
-                    attendances.append(attendance)
-                    attendance_data = attendance_data[40:]
+            users = self.get_users()
 
-        return attendances
+        offset = 4 + known_records * self.__record_size
+        attendance_data, size = self.read_with_buffer(const.CMD_ATTLOG_RRQ, offset=offset)
+        total_size = size - 4
+        if total_size % self.__record_size or total_size // self.__record_size < records:
+            # the record size isn't what the profile said
+            if self.verbose:
+                logger.debug('attendance log is %i bytes for %i records, reading it all' % (total_size, records))
+            self.__record_size = None
+            return self.get_attendance()[known_records:], records
+        # punches logged after read_sizes are part of the buffer too
+        records = total_size // self.__record_size
+        return list(self.__iter_attendance(memoryview(attendance_data), self.__record_size, users)), records
 
     def clear_attendance(self):
         """
@@ -1089,61 +1640,101 @@ class ZK(object):
         if self.users == 0:
             self.next_uid = 1
             self.next_user_id = '1'
+            self.__user_index = {}
             return []
 
-        users = []
-        max_uid = 0
         userdata, size = self.read_with_buffer(const.CMD_USERTEMP_RRQ, const.FCT_USER)
 
         if size <= 4:
+            self.__user_index = {}
             return []
 
         total_size = unpack('I', userdata[:4])[0]
-        self.user_packet_size = total_size / self.users
-        userdata = userdata[4:]
+        self.user_packet_size = self.__pick_record_size(total_size, self.users, self.user_packet_size, (28, 72))
+        users = self.__decode_users(memoryview(userdata)[4:], self.user_packet_size)
+        max_uid = max([user.uid for user in users] + [0])
 
-        if self.user_packet_size == 28:
-            while len(userdata) >= 28:
-                uid, privilege, password, name, card, group_id, timezone, user_id = unpack('<HB5s8sIxBhI', userdata.ljust(28, b'\x00')[:28])
-                if uid > max_uid:
-                    max_uid = uid
+        max_uid += 1
+        self.next_uid = max_uid
+        self.next_user_id = str(max_uid)
+
+        while True:
+            if any((u for u in users if u.user_id == self.next_user_id)):
+                max_uid += 1
+                self.next_user_id = str(max_uid)
+            else:
+                break
+
+        self.__user_index = {user.user_id: user for user in users}
+        return users
+
+    def __pick_record_size(self, total_size, count, known, sizes):
+        """
+        record size of a buffered dump: total_size / count when that is a
+        valid size, else the known size if the dump fits it (counts read
+        before a punch or enrolment arrived), else the first that divides it
+        """
+        if count and total_size % count == 0 and total_size // count in sizes:
+            return total_size // count
+        if known in sizes and total_size % known == 0:
+            return known
+        for size in sizes:
+            if total_size % size == 0:
+                return size
+        return sizes[-1]
+
+    def __decode_users(self, userdata, packet_size):
+        """
+        parse a user table dump made of packet_size (28 or 72) byte records
+        """
+        users = []
+        userdata = userdata[:len(userdata) - len(userdata) % packet_size]
+        if packet_size == 28:
+            for uid, privilege, password, name, card, group_id, timezone, user_id in iter_unpack('<HB5s8sIxBhI', userdata):
                 password = password.split(b'\x00')[0].decode(self.encoding, errors='ignore')
                 name = name.split(b'\x00')[0].decode(self.encoding, errors='ignore').strip()
                 group_id = str(group_id)
                 user_id = str(user_id)
                 if not name:
                     name = 'NN-%s' % user_id
-                user = User(uid, name, privilege, password, group_id, user_id, card)
-                users.append(user)
-                userdata = userdata[28:]
+                users.append(User(uid, name, privilege, password, group_id, user_id, card))
         else:
-            while len(userdata) >= 72:
-                uid, privilege, password, name, card, group_id, user_id = unpack('<HB8s24sIx7sx24s', userdata.ljust(72, b'\x00')[:72])
+            for uid, privilege, password, name, card, group_id, user_id in iter_unpack('<HB8s24sIx7sx24s', userdata):
                 password = password.split(b'\x00')[0].decode(self.encoding, errors='ignore')
                 name = name.split(b'\x00')[0].decode(self.encoding, errors='ignore').strip()
                 group_id = group_id.split(b'\x00')[0].decode(self.encoding, errors='ignore').strip()
                 user_id = user_id.split(b'\x00')[0].decode(self.encoding, errors='ignore')
-                if uid > max_uid:
-                    max_uid = uid
                 if not name:
                     name = 'NN-%s' % user_id
-                user = User(uid, name, privilege, password, group_id, user_id, card)
-                users.append(user)
-                userdata = userdata[72:]
-
-        max_uid += 1
-        self.next_uid = max_uid
-        self.next_user_id = str(max_uid)
-
-        while True:
-            if any((u for u in users if u.user_id == self.next_user_id)):
-                max_uid += 1
-                self.next_user_id = str(max_uid)
-            else:
-                break
-
+                users.append(User(uid, name, privilege, password, group_id, user_id, card))
         return users
 
+    def __iter_attendance(self, attendance_data, record_size, users):
+        """
+        parse an attendance log dump made of record_size (8, 16 or 40) byte
+        records, yielding each record as it is decoded
+        """
+        attendance_data = attendance_data[:len(attendance_data) - len(attendance_data) % record_size]
+        if record_size == 8:
+            user_ids = {user.uid: user.user_id for user in users}
+            for uid, status, timestamp, punch in iter_unpack('HB4sB', attendance_data):
+                user_id = user_ids.get(uid, str(uid))
+                timestamp = self.__decode_time(timestamp)
+                yield Attendance(user_id, timestamp, status, punch, uid)
+        elif record_size == 16:
+            by_user_id = {user.user_id: user for user in users}
+            for user_id, timestamp, status, punch, reserved, workcode in iter_unpack('<I4sBB2sI', attendance_data):
+                user_id = str(user_id)
+                user = by_user_id.get(user_id)
+                uid = user.uid if user else str(user_id)
+                timestamp = self.__decode_time(timestamp)
+                yield Attendance(user_id, timestamp, status, punch, uid)
+        else:
+            for uid, user_id, status, timestamp, punch, space in iter_unpack('<H24sB4sB8s', attendance_data):
+                user_id = user_id.split(b'\x00')[0].decode(errors='ignore')
+                timestamp = self.__decode_time(timestamp)
+                yield Attendance(user_id, timestamp, status, punch, uid)
+
     def live_capture(self, new_timeout=2) -> Generator[Optional[Attendance], None, None]:
         """
         try live capture of events
@@ -1158,64 +1749,55 @@ class ZK(object):
 
         logger.info('Starting live capture')
         self.reg_event(const.EF_ATTLOG)
+        self.__capture_timeout = new_timeout
         self.__sock.settimeout(new_timeout)
         self.end_live_capture = False
+        self.__last_heard = self.__last_heartbeat = time.time()
+
+        user_uids = {user.user_id: user.uid for user in users}
 
         while not self.end_live_capture:
             try:
-                data_recv = self.__sock.recv(1032)
-                self.__ack_ok()
-
-                if self.tcp:
-                    size = unpack('<HHI', data_recv[:8])[2]
-                    header = unpack('HHHH', data_recv[8:16])
-                    data = data_recv[16:]
+                if self.__pending_events:
+                    # events that arrived while capture was paused
+                    data = self.__pending_events.popleft()
                 else:
-                    size = len(data_recv)
-                    header = unpack('<4H', data_recv[:8])
-                    data = data_recv[8:]
-
-                if not header[0] == const.CMD_REG_EVENT:
-                    continue
-
-                if not len(data):
-                    continue
-
-                while len(data) >= 12:
-                    if len(data) == 12:
-                        user_id, status, punch, timehex = unpack('<IBB6s', data)
-                        data = data[12:]
-                    elif len(data) == 32:
-                        user_id, status, punch, timehex = unpack('<24sBB6s', data[:32])
-                        data = data[32:]
-                    elif len(data) == 36:
-                        user_id, status, punch, timehex, _other = unpack('<24sBB6s4s', data[:36])
-                        data = data[36:]
-                    elif len(data) >= 52:
-                        user_id, status, punch, timehex, _other = unpack('<24sBB6s20s', data[:52])
-                        data = data[52:]
-
+                    # whole frames only, however tcp split or merged them
+                    header, data = self.__recv_frame()
+                    self.__last_heard = time.time()
+                    if not header[0] == const.CMD_REG_EVENT:
+                        continue
+                    self.__ack_ok()
+
+                for user_id, status, punch, timehex in self.__iter_live_events(data):
                     if isinstance(user_id, int):
                         user_id = str(user_id)
                     else:
                         user_id = user_id.split(b'\x00')[0].decode(errors='ignore')
 
-                    timestamp = self.__decode_timehex(timehex)
-                    tuser = list(filter(lambda x: x.user_id == user_id, users))
-
-                    if not tuser:
-                        uid = int(user_id)
-                    else:
-                        uid = tuser[0].uid
+                    try:
+                        timestamp = self.__decode_timehex(timehex)
+                    except ValueError:
+                        logger.warning('skipping live event for user %s with invalid time %s' % (user_id, codecs.encode(timehex, 'hex')))
+                        continue
+                    uid = user_uids.get(user_id)
+                    if uid is None:
+                        uid = int(user_id) if user_id.isdigit() else 0
 
                     yield Attendance(user_id, timestamp, status, punch, uid)
 
             except timeout:
+                self.__heartbeat()
                 yield None
             except (KeyboardInterrupt, SystemExit):
                 break
+            except OSError as e:
+                self.is_connect = False
+                raise ZKNetworkError(str(e))
 
+        self.__capture_timeout = None
         self.__sock.settimeout(self.__timeout)
+        self.__frames.clear()
         self.reg_event(0)
 
         if not was_enabled:
@@ -1223,6 +1805,117 @@ class ZK(object):
 
         logger.info('Live capture ended')
 
+    # live event record layouts by size, largest first
+    LIVE_EVENT_FORMATS = ((52, '<24sBB6s20s'), (36, '<24sBB6s4s'), (32, '<24sBB6s'), (12, '<IBB6s'))
+    # ambiguous payloads that must agree before their event size is learned
+    EVENT_SIZE_VOTES = 3
+
+    def __iter_live_events(self, data):
+        """
+        split a CMD_REG_EVENT payload into (user_id, status, punch, timehex)
+
+        a payload holds one or more records of the firmware's event size;
+        that size is learned once, from the first payload only one size
+        fits (or the capability profile), and then used for every payload
+        """
+        formats = dict(self.LIVE_EVENT_FORMATS)
+        size = self.__event_size
+        if size is None or len(data) % size:
+            size = self.__guess_event_size(data)
+            if size is None:
+                if self.verbose:
+                    logger.debug('dropping %i bytes of unknown live event data' % len(data))
+                return
+        for fields in iter_unpack(formats[size], data):
+            yield fields[:4]
+
+    def __guess_event_size(self, data):
+        """
+        event size for a payload while the firmware's is not known
+
+        a length only one size divides tells the size for good. Other
+        lengths (36 is one 36 byte or three 12 byte events, 13 * 12 is
+        also 3 * 52) are read with the largest size whose records all carry
+        a valid time, and that size is only learned once EVENT_SIZE_VOTES
+        ambiguous payloads in a row picked it
+        """
+        formats = dict(self.LIVE_EVENT_FORMATS)
+        candidates = [size for size, _fmt in self.LIVE_EVENT_FORMATS if len(data) % size == 0]
+        if len(candidates) == 1:
+            self.__learn_event_size(candidates[0])
+            return candidates[0]
+        for size in candidates:
+            try:
+                for fields in iter_unpack(formats[size], data):
+                    self.__decode_timehex(fields[3])
+            except ValueError:
+                continue
+            voted, count = self.__event_vote
+            count = count + 1 if voted == size else 1
+            self.__event_vote = (size, count)
+            if count >= self.EVENT_SIZE_VOTES:
+                self.__learn_event_size(size)
+            return size
+        return None
+
+    def __learn_event_size(self, size):
+        if self.__event_size != size:
+            self.__event_size = size
+            if self.verbose:
+                logger.debug('live events are %i bytes' % size)
+
+    def __heartbeat(self):
+        """
+        called on idle gaps in live capture: re-register for events once
+        heartbeat_interval has passed quietly (the ACK proves the session is
+        alive) and give up after dead_peer_timeout without any traffic
+        """
+        now = time.time()
+        silent = now - self.__last_heard
+        if self.dead_peer_timeout and silent >= self.dead_peer_timeout:
+            self.is_connect = False
+            raise ZKNetworkError('no traffic from device for %.0fs' % silent)
+        if self.heartbeat_interval and now - max(self.__last_heard, self.__last_heartbeat) >= self.heartbeat_interval:
+            self.__last_heartbeat = now
+            if self.verbose:
+                logger.debug('live capture heartbeat after %.0fs idle' % silent)
+            self.__send_packet(const.CMD_REG_EVENT, pack('I', const.EF_ATTLOG))
+
+    def pause_live_capture(self):
+        """
+        stop event delivery so regular commands can use the socket while
+        live_capture is suspended between yields
+
+        events already on the wire are acknowledged and handed to
+        live_capture after resume_live_capture
+        """
+        reply_id = self.__send_packet(const.CMD_REG_EVENT, pack('I', 0))
+        self.__sock.settimeout(self.__timeout)
+        try:
+            while True:
+                header, data = self.__recv_frame()
+                if header[0] != const.CMD_REG_EVENT:
+                    if header[3] == reply_id:
+                        break
+                    # late reply to a heartbeat
+                    continue
+                self.__ack_ok()
+                if data:
+                    self.__pending_events.append(data)
+        finally:
+            self.__frames.clear()
+
+        if header[0] != const.CMD_ACK_OK:
+            raise ZKErrorResponse("can't pause live capture")
+
+    def resume_live_capture(self):
+        """
+        re-register for events after pause_live_capture
+        """
+        self.reg_event(const.EF_ATTLOG)
+        if self.__capture_timeout is not None:
+            self.__sock.settimeout(self.__capture_timeout)
+
     def clear_data(self):
         """
         clear all data
@@ -1232,6 +1925,7 @@ class ZK(object):
         cmd_response = self.__send_command(command, command_string)
         if cmd_response.get('status'):
             self.next_uid = 1
+            self.__user_index = {}
             return True
         raise ZKErrorResponse("can't clear data")
 
@@ -1336,13 +2030,15 @@ class ZK(object):
         """
         read a chunk from buffer
         """
-        for _retries in range(3):
+        for _retries in range(self.__rtt.retry_budget()):
             command = 1504
             command_string = pack('<ii', start, size)
             if self.tcp:
                 response_size = size + 32
             else:
                 response_size = 1032
+            if _retries and self.__stats is not None:
+                self.__stats.retry(command)
             cmd_response = self.__send_command(command, command_string, response_size)
             data = self.__recieve_chunk()
             if data is not None:
@@ -1350,9 +2046,12 @@ class ZK(object):
         else:
             raise ZKErrorResponse("can't read chunk %i:[%i]" % (start, size))
 
-    def read_with_buffer(self, command, fct=0, ext=0):
+    def read_with_buffer(self, command, fct=0, ext=0, offset=0):
         """
         Test read info with buffered command
+
+        with offset only the bytes from offset on are transferred; the
+        returned size is still the end of the buffer
         """
         if self.tcp:
             MAX_CHUNK = 65472
@@ -1363,6 +2062,7 @@ class ZK(object):
         response_size = 1024
         data = []
         start = 0
+        started = time.time()
         cmd_response = self.__send_command(1503, command_string, response_size)
 
         if not cmd_response.get('status'):
@@ -1373,26 +2073,285 @@ class ZK(object):
                 if len(self.__data) < self.__tcp_length - 8:
                     need = self.__tcp_length - 8 - len(self.__data)
                     more_data = self.__recieve_raw_data(need)
-                    return (b''.join([self.__data, more_data]), len(self.__data) + len(more_data))
+                    return (b''.join([self.__data, more_data])[offset:], len(self.__data) + len(more_data))
                 size = len(self.__data)
-                return (self.__data, size)
+                return (self.__data[offset:], size)
             size = len(self.__data)
-            return (self.__data, size)
+            return (self.__data[offset:], size)
 
         size = unpack('I', self.__data[1:5])[0]
-        remain = size % MAX_CHUNK
-        packets = (size - remain) // MAX_CHUNK
-
-        for _wlk in range(packets):
-            data.append(self.__read_chunk(start, MAX_CHUNK))
-            start += MAX_CHUNK
+        start = min(offset, size)
 
-        if remain:
-            data.append(self.__read_chunk(start, remain))
-            start += remain
+        if self.tcp and self.read_window > 1:
+            data, start = self.__read_pipelined(size, MAX_CHUNK, start), size
+        else:
+            first = start
+            chunk_size = self.__read_chunk_size(MAX_CHUNK)
+
+            while start < size:
+                length = min(chunk_size, size - start)
+                chunk = self.__read_chunk(start, length)
+                if not chunk:
+                    raise ZKErrorResponse("can't read chunk %i:[%i]" % (start, length))
+                if len(chunk) < length:
+                    # the device serves less than asked, ask for that much from now on
+                    chunk_size = self.__learn_read_chunk(len(chunk))
+                data.append(chunk[:length])
+                start += min(len(chunk), length)
+
+            data = b''.join(data)
+            self.__record_read_stats(start - first, started, chunk_size, 1, 0)
 
         self.free_data()
-        return (b''.join(data), start)
+        return (data, start)
+
+    def __record_read_stats(self, size, started, chunk_size, window, retries):
+        """
+        remember throughput of the last buffered read
+        """
+        seconds = time.time() - started
+        self.last_read_stats = {
+            'bytes': size,
+            'seconds': seconds,
+            'bytes_per_sec': size / seconds if seconds > 0 else 0.0,
+            'chunk_size': chunk_size,
+            'window': window,
+            'retries': retries
+        }
+        if self.verbose:
+            logger.debug('read %i bytes in %.3fs (%.0f B/s, chunk %i, window %i)' % (
+                size, seconds, self.last_read_stats['bytes_per_sec'], chunk_size, window))
+
+    def __read_pipelined(self, size, max_chunk, offset=0):
+        """
+        read a prepared buffer from offset keeping read_window chunk requests
+        in flight
+
+        chunks are reassembled by offset, short or failed chunks are
+        re-requested, and the chunk size is probed once per firmware when
+        adaptive_read_chunk is set
+        """
+        started = time.time()
+        results = {}
+        retries = 0
+        chunk_size = self.__read_chunk_size(max_chunk)
+        first = offset
+
+        if self.adaptive_read_chunk and size - offset > max_chunk:
+            chunk_size, probed = self.__probe_read_chunk(size, max_chunk, offset)
+            if probed:
+                results[offset] = probed
+                first = offset + len(probed)
+
+        chunks = self.__split_chunks([(first, size - first)], chunk_size)
+        failures = 0
+        budget = self.__rtt.retry_budget()
+
+        while chunks:
+            done, chunks, limit = self.__pipeline_chunks(chunks, self.read_window if not failures else 1)
+            results.update(done)
+            if limit is not None and limit < chunk_size:
+                # short replies are the device's chunk limit, not failures:
+                # split what is left to that size, the retry budget is untouched
+                chunk_size = self.__learn_read_chunk(limit)
+                chunks = self.__split_chunks(chunks, chunk_size)
+                continue
+            if not chunks:
+                break
+            failures += 1
+            if failures > budget:
+                raise ZKErrorResponse("can't read chunk %i:[%i]" % chunks[0])
+            retries += len(chunks)
+            if self.__stats is not None:
+                self.__stats.retry(const.CMD_READ_BUFFER, len(chunks))
+            if self.verbose:
+                logger.debug('retrying %i chunks' % len(chunks))
+
+        data = b''.join(results[start] for start in sorted(results))
+        if len(data) != size - offset:
+            raise ZKErrorResponse("short buffered read %i of %i bytes" % (len(data), size - offset))
+
+        self.__record_read_stats(size - offset, started, chunk_size, self.read_window, retries)
+        return data
+
+    def __probe_read_chunk(self, size, max_chunk, offset=0):
+        """
+        find the largest chunk the firmware serves, starting from a request
+        for 4 * max_chunk; the answer is cached per firmware version
+
+        :return: (chunk_size, data read from offset while probing)
+        """
+        if self.__firmware_version is None:
+            try:
+                self.__firmware_version = self.get_firmware_version()
+            except ZKErrorResponse:
+                self.__firmware_version = ''
+
+        cached = self.__read_chunk_limit or ZK._read_chunk_sizes.get(self.__firmware_version)
+        if cached:
+            return cached, b''
+
+        for candidate in (4 * max_chunk, 2 * max_chunk, max_chunk):
+            length = min(candidate, size - offset)
+            done, _failed, _limit = self.__pipeline_chunks([(offset, length)], 1)
+            data = done.get(offset, b'')
+            if data:
+                if len(data) < length:
+                    # served less than asked: that is the limit, however small
+                    return self.__learn_read_chunk(len(data)), data
+                ZK._read_chunk_sizes[self.__firmware_version] = candidate
+                if self.verbose:
+                    logger.debug('firmware %s read chunk size %i' % (self.__firmware_version, candidate))
+                return candidate, data
+        ZK._read_chunk_sizes[self.__firmware_version] = max_chunk
+        return max_chunk, b''
+
+    def __read_chunk_size(self, max_chunk):
+        """
+        chunk size for a buffered read: max_chunk, or less once the device
+        (or its firmware, from an earlier connection) is known to serve less
+        """
+        limit = self.__read_chunk_limit or ZK._read_chunk_sizes.get(self.__firmware_version)
+        return min(max_chunk, limit) if limit else max_chunk
+
+    def __learn_read_chunk(self, limit):
+        """
+        remember that the device answered a chunk request with limit bytes
+        """
+        self.__read_chunk_limit = limit
+        if self.__firmware_version:
+            ZK._read_chunk_sizes[self.__firmware_version] = limit
+        if self.verbose:
+            logger.debug('device serves read chunks of at most %i bytes' % limit)
+        return limit
+
+    @staticmethod
+    def __split_chunks(chunks, chunk_size):
+        """
+        [(start, size)] split into requests of at most chunk_size
+        """
+        return [(start, min(chunk_size, end - start))
+                for first, length in chunks
+                for end in (first + length,)
+                for start in range(first, end, chunk_size)]
+
+    def __pipeline_chunks(self, chunks, window):
+        """
+        request chunks with up to window requests outstanding
+
+        :return: ({start: data}, [(start, size) still missing], the
+            shortest non empty short reply or None)
+        """
+        pending = deque(chunks)
+        in_flight = OrderedDict()
+        results = {}
+        failed = []
+        short = []
+        current = None
+        parts = []
+        stats = self.__stats
+        sent_at = {}
+
+        def complete(reply_id, data):
+            start, length = in_flight.pop(reply_id)
+            if stats is not None:
+                stats.reply(const.CMD_READ_BUFFER, time.time() - sent_at.pop(reply_id))
+            if data:
+                results[start] = data[:length]
+            if len(data) < length:
+                failed.append((start + len(data), length - len(data)))
+                if data:
+                    short.append(len(data))
+
+        while pending or in_flight:
+            while pending and len(in_flight) < window:
+                start, length = pending.popleft()
+                reply_id = self.__send_packet(1504, pack('<ii', start, length))
+                in_flight[reply_id] = (start, length)
+                if stats is not None:
+                    sent_at[reply_id] = time.time()
+
+            try:
+                header, data = self.__recv_frame()
+            except timeout:
+                self.__rtt.on_timeout()
+                if stats is not None:
+                    stats.timeout(const.CMD_READ_BUFFER, len(in_flight))
+                if self.__rtt.dead:
+                    self.__frames.clear()
+                    raise ZKNetworkError('device not responding (%i consecutive timeouts)' % self.__rtt.consecutive_timeouts)
+                failed.extend(in_flight.values())
+                in_flight.clear()
+                current = None
+                continue
+            self.__rtt.on_reply()
+
+            response, reply_id = header[0], header[3]
+            if reply_id in in_flight and reply_id != current:
+                if response == const.CMD_DATA:
+                    complete(reply_id, data)
+                elif response == const.CMD_PREPARE_DATA:
+                    current = reply_id
+                    parts = []
+                else:
+                    complete(reply_id, b'')
+            elif current is not None:
+                if response == const.CMD_DATA:
+                    parts.append(data)
+                elif response == const.CMD_ACK_OK:
+                    complete(current, b''.join(parts))
+                    current = None
+                else:
+                    complete(current, b'')
+                    current = None
+            # anything else is a late reply to a request already given up on
+
+        if len(self.__frames):
+            if self.verbose:
+                logger.debug('discarding %i unexpected bytes after pipelined read' % len(self.__frames))
+            self.__frames.clear()
+        return results, failed, min(short) if short else None
+
+    def __send_packet(self, command, command_string=b''):
+        """
+        send a command without waiting for its reply
+
+        :return: the reply id the device will answer with
+        """
+        if not self.is_connect:
+            raise ZKErrorConnection('instance are not connected.')
+        buf = self.__create_header(command, command_string, self.__session_id, self.__reply_id)
+        self.__reply_id = unpack('<4H', buf[:8])[3]
+        if self.__stats is not None:
+            self.__stats.sent(command, len(buf) + 8 if self.tcp else len(buf))
+        try:
+            if self.tcp:
+                self.__sock.sendall(self.__create_tcp_top(buf))
+            else:
+                self.__sock.sendto(buf, self.__address)
+        except Exception as e:
+            raise ZKNetworkError(str(e))
+        return self.__reply_id
+
+    def __recv_frame(self):
+        """
+        read the next complete packet (one datagram over udp)
+
+        :return: (header tuple, data)
+        """
+        if not self.tcp:
+            data_recv = self.__sock.recv(65535)
+            return unpack('<4H', data_recv[:8]), data_recv[8:]
+
+        while True:
+            frame = self.__frames.next_frame()
+            if frame is not None:
+                return unpack('<4H', frame[:8]), frame[8:]
+            data_recv = self.__sock.recv(1 << 17)
+            if not data_recv:
+                self.is_connect = False
+                raise ZKNetworkError('connection closed by device')
+            self.__frames.feed(data_recv)
 
     def __enter__(self):
         self.connect()
@@ -70,6 +70,8 @@ CMD_AUTH            = 1102  # Connections authorizations
 CMD_PREPARE_DATA    = 1500  # Prepares to transmit the data
 CMD_DATA            = 1501  # Transmit a data packet
 CMD_FREE_DATA       = 1502  # Clear machines opened buffer
+CMD_PREPARE_BUFFER  = 1503  # Prepare a dump in the machine's buffer
+CMD_READ_BUFFER     = 1504  # Read a chunk of the prepared buffer
 
 CMD_ACK_OK          = 2000  # Return value for order perform successfully
 CMD_ACK_ERROR       = 2001  # Return value for order perform failed
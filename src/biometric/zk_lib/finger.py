@@ -1,6 +1,7 @@
 # Finger Print Scanner
 from struct import pack #, unpack
 import codecs
+import hashlib
 
 
 class Finger(object):
@@ -20,6 +21,9 @@ class Finger(object):
     def repack_only(self): #only template
         return pack("H%is" % (self.size), self.size, self.template)
 
+    def content_hash(self): #sha1 over uid, fid, valid and template
+        return hashlib.sha1(self.repack()).hexdigest()
+
     @staticmethod
     def json_unpack(json):
         return Finger(
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+from struct import pack, unpack
+
+from . import const
+
+MAGIC = pack('<HH', const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2)
+
+
+class TCPFrameBuffer(object):
+    """
+    reassemble MACHINE_PREPARE_DATA framed packets from a TCP byte stream
+
+    feed() takes whatever recv() returned; next_frame() hands back complete
+    packets (8 byte header + data, without the tcp top) one at a time, no
+    matter how the stream was split or coalesced
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+
+    def next_frame(self):
+        """
+        :return: the next complete packet, or None if more data is needed
+        """
+        while True:
+            if len(self.buffer) < 8:
+                return None
+            if self.buffer[:4] != MAGIC:
+                # out of sync: skip to the next frame marker
+                index = self.buffer.find(MAGIC, 1)
+                if index < 0:
+                    del self.buffer[:max(0, len(self.buffer) - 3)]
+                    return None
+                del self.buffer[:index]
+                continue
+            length = unpack('<I', self.buffer[4:8])[0]
+            if len(self.buffer) < 8 + length:
+                return None
+            frame = bytes(self.buffer[8:8 + length])
+            del self.buffer[:8 + length]
+            return frame
+
+    def frames(self):
+        """
+        iterate over every complete packet currently buffered
+        """
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def clear(self):
+        self.buffer = bytearray()
+
+    def __len__(self):
+        return len(self.buffer)
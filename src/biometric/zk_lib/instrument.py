@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from src.utils.histogram import Histogram
+from . import const
+
+COMMAND_NAMES = {}
+for _name in dir(const):
+    if _name.startswith('CMD_') and not _name.startswith('CMD_ACK_'):
+        COMMAND_NAMES.setdefault(getattr(const, _name), _name)
+
+
+def command_name(command):
+    return COMMAND_NAMES.get(command, 'CMD_%i' % command)
+
+
+class CommandStats(object):
+    __slots__ = ('count', 'latency', 'bytes_out', 'bytes_in', 'timeouts', 'retries')
+
+    def __init__(self):
+        self.count = 0
+        self.latency = Histogram()
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.timeouts = 0
+        self.retries = 0
+
+
+class ProtocolStats(object):
+    """
+    per command code counts, round trip histograms, bytes in/out, retries
+    and timeouts of one device, kept across reconnects
+
+    ZK only calls into this when it was given one (stats=), so the cost
+    when disabled is a None check per command. Bytes are counted by an
+    InstrumentedSocket and charged to the command last sent, so the data
+    chunks of a buffered read add up under CMD_READ_BUFFER.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commands = {}
+        self.current = None
+
+    def __get(self, command):
+        stats = self.commands.get(command)
+        if stats is None:
+            stats = self.commands[command] = CommandStats()
+        return stats
+
+    def sent(self, command, size):
+        with self.lock:
+            self.current = self.__get(command)
+            self.current.bytes_out += size
+
+    def received(self, size):
+        with self.lock:
+            if self.current is not None:
+                self.current.bytes_in += size
+
+    def reply(self, command, seconds):
+        """
+        a reply arrived seconds after the command was sent
+        """
+        with self.lock:
+            stats = self.__get(command)
+            stats.count += 1
+            stats.latency.observe(seconds)
+
+    def timeout(self, command, count=1):
+        with self.lock:
+            self.__get(command).timeouts += count
+
+    def retry(self, command, count=1):
+        with self.lock:
+            self.__get(command).retries += count
+
+    def reset(self):
+        with self.lock:
+            self.commands = {}
+            self.current = None
+
+    def snapshot(self):
+        """
+        :return: dict with totals and per command name counts, latency
+            histogram (seconds), bytes, timeouts and retries
+        """
+        with self.lock:
+            commands = {
+                command_name(command): {
+                    'command': command,
+                    'count': stats.count,
+                    'latency': stats.latency.snapshot(),
+                    'bytes_out': stats.bytes_out,
+                    'bytes_in': stats.bytes_in,
+                    'timeouts': stats.timeouts,
+                    'retries': stats.retries
+                }
+                for command, stats in self.commands.items()
+            }
+        totals = {key: sum(c[key] for c in commands.values())
+                  for key in ('count', 'bytes_out', 'bytes_in', 'timeouts', 'retries')}
+        totals['commands'] = commands
+        return totals
+
+
+class InstrumentedSocket(object):
+    """
+    the subset of the socket API ZK uses, counting the bytes received;
+    ZK charges what it sends itself, as it knows the command
+    """
+
+    def __init__(self, sock, stats):
+        self.sock = sock
+        self.stats = stats
+
+    def connect(self, address):
+        self.sock.connect(address)
+
+    def send(self, data):
+        return self.sock.send(data)
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def sendto(self, data, address):
+        return self.sock.sendto(data, address)
+
+    def recv(self, size):
+        data = self.sock.recv(size)
+        self.stats.received(len(data))
+        return data
+
+    def settimeout(self, value):
+        self.sock.settimeout(value)
+
+    def gettimeout(self):
+        return self.sock.gettimeout()
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import errno
+import selectors
+import time
+from socket import AF_INET, SOCK_DGRAM, SOCK_STREAM, SOL_SOCKET, SO_ERROR, socket
+from struct import pack, unpack
+
+from . import const
+
+# connect_ex results meaning "connection in progress" (10035 is WSAEWOULDBLOCK)
+_IN_PROGRESS = (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, 10035)
+
+
+def _checksum(p):
+    """
+    same checksum as ZK.__create_checksum, over a packed header
+    """
+    checksum = 0
+    for i in range(0, len(p) - 1, 2):
+        checksum += p[i] | (p[i + 1] << 8)
+        if checksum > const.USHRT_MAX:
+            checksum -= const.USHRT_MAX
+    if len(p) % 2:
+        checksum += p[-1]
+    while checksum > const.USHRT_MAX:
+        checksum -= const.USHRT_MAX
+    checksum = ~checksum
+    while checksum < 0:
+        checksum += const.USHRT_MAX
+    return checksum
+
+
+def _packet(command, session_id=0, reply_id=const.USHRT_MAX - 1):
+    """
+    header built the way ZK.__create_header does it
+    """
+    checksum = _checksum(pack('<4H', command, 0, session_id, reply_id))
+    reply_id += 1
+    if reply_id >= const.USHRT_MAX:
+        reply_id -= const.USHRT_MAX
+    return pack('<4H', command, checksum, session_id, reply_id)
+
+
+def probe_devices(addresses, timeout=5.0, udp=True):
+    """
+    check many terminals at once without blocking on any of them
+
+    every address first gets a non-blocking TCP connect; the ones that
+    don't accept within timeout are then sent a UDP CMD_CONNECT (and a
+    CMD_EXIT to close the session it opens). A host that answers neither
+    costs at most 2 * timeout, shared by all addresses.
+
+    :param addresses: iterable of (ip, port)
+    :return: dict of (ip, port) -> 'tcp', 'udp' or None if unreachable
+    """
+    results = dict.fromkeys(addresses)
+    if not results:
+        return results
+
+    _probe_tcp(results, timeout)
+    if udp and None in results.values():
+        _probe_udp(results, timeout)
+    return results
+
+
+def _probe_tcp(results, timeout):
+    selector = selectors.DefaultSelector()
+    try:
+        for address in results:
+            sock = socket(AF_INET, SOCK_STREAM)
+            sock.setblocking(False)
+            if sock.connect_ex(address) in _IN_PROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, address)
+            else:
+                sock.close()
+
+        deadline = time.time() + timeout
+        while selector.get_map():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            for key, _events in selector.select(remaining):
+                sock = key.fileobj
+                selector.unregister(sock)
+                if sock.getsockopt(SOL_SOCKET, SO_ERROR) == 0:
+                    results[key.data] = 'tcp'
+                sock.close()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
+
+
+def _probe_udp(results, timeout):
+    selector = selectors.DefaultSelector()
+    try:
+        for address, protocol in results.items():
+            if protocol is not None:
+                continue
+            sock = socket(AF_INET, SOCK_DGRAM)
+            sock.setblocking(False)
+            try:
+                sock.sendto(_packet(const.CMD_CONNECT), address)
+            except OSError:
+                sock.close()
+                continue
+            selector.register(sock, selectors.EVENT_READ, address)
+
+        deadline = time.time() + timeout
+        while selector.get_map():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            for key, _events in selector.select(remaining):
+                sock = key.fileobj
+                try:
+                    data = sock.recv(1024)
+                except OSError:
+                    # e.g. ICMP port unreachable, nothing listens there
+                    selector.unregister(sock)
+                    sock.close()
+                    continue
+                if len(data) < 8:
+                    continue
+                command, _sum, session_id, reply_id = unpack('<4H', data[:8])
+                if command not in (const.CMD_ACK_OK, const.CMD_ACK_UNAUTH):
+                    continue
+                results[key.data] = 'udp'
+                try:
+                    sock.sendto(_packet(const.CMD_EXIT, session_id, reply_id), key.data)
+                except OSError:
+                    pass
+                selector.unregister(sock)
+                sock.close()
+    finally:
+        for key in list(selector.get_map().values()):
+            key.fileobj.close()
+        selector.close()
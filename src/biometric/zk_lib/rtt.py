@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+class RTTEstimator(object):
+    """
+    smoothed round trip time and retransmission timeout, as in RFC 6298
+
+    until the first sample the caller's static timeout is used; after that
+    timeouts follow the measured RTT, back off exponentially on loss, and
+    the peer is considered dead after max_timeouts consecutive timeouts
+    """
+    ALPHA = 0.125
+    BETA = 0.25
+    K = 4
+
+    def __init__(self, min_rto=1.0, max_rto=60.0, max_timeouts=3):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.max_timeouts = max_timeouts
+        self.srtt = None
+        self.rttvar = None
+        self.rto = None
+        self.base_rto = None
+        self.samples = 0
+        self.timeouts = 0
+        self.consecutive_timeouts = 0
+
+    def sample(self, rtt):
+        """
+        feed one measured round trip (seconds)
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.base_rto = self.__clamp(self.srtt + self.K * self.rttvar)
+        self.rto = self.base_rto
+        self.samples += 1
+        self.consecutive_timeouts = 0
+
+    def on_reply(self):
+        """
+        record a reply that can't be timed (slow or pipelined commands)
+        """
+        self.consecutive_timeouts = 0
+
+    def on_timeout(self):
+        """
+        record a timeout and back the timeout off
+        """
+        self.timeouts += 1
+        self.consecutive_timeouts += 1
+        if self.rto is not None:
+            self.rto = self.__clamp(self.rto * 2)
+
+    def timeout(self, default):
+        """
+        :return: timeout for one command round trip
+        """
+        if self.rto is None:
+            return default
+        return min(self.rto, default) if default else self.rto
+
+    def connect_timeout(self, default):
+        """
+        :return: timeout for connection setup, a few RTOs ignoring backoff
+        """
+        if self.base_rto is None:
+            return default
+        return min(default, 3 * self.base_rto) if default else 3 * self.base_rto
+
+    def retry_budget(self, default=3):
+        """
+        :return: how many attempts a retrying operation should make
+        """
+        if self.dead:
+            return 1
+        if self.consecutive_timeouts:
+            return max(1, default - self.consecutive_timeouts)
+        return default
+
+    @property
+    def dead(self):
+        return self.consecutive_timeouts >= self.max_timeouts
+
+    def snapshot(self):
+        return {
+            'srtt': self.srtt,
+            'rttvar': self.rttvar,
+            'rto': self.rto,
+            'samples': self.samples,
+            'timeouts': self.timeouts,
+            'consecutive_timeouts': self.consecutive_timeouts,
+            'dead': self.dead
+        }
+
+    def __clamp(self, value):
+        return max(self.min_rto, min(self.max_rto, value))
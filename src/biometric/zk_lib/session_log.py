@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+import errno
+import os
+import threading
+import time
+from socket import AF_INET, SOCK_DGRAM, SOCK_STREAM, socket, timeout
+from struct import Struct, pack, unpack_from
+
+from . import const
+from .exception import ZKNetworkError
+
+MAGIC = b'ZKSL\x01'
+
+# record kinds
+OPEN = 0        # a connection started, data is b'tcp ip:port' or b'udp ip:port'
+SENT = 1
+RECEIVED = 2
+TIMEOUT = 3     # recv() timed out
+ERROR = 4       # recv() raised OSError, data is the errno as text
+
+KIND_NAMES = {OPEN: 'open', SENT: 'sent', RECEIVED: 'received', TIMEOUT: 'timeout', ERROR: 'error'}
+
+# kind, seconds since the log was opened, data length
+RECORD = Struct('<BdI')
+
+TCP_TOP = pack('<HH', const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2)
+
+
+def _command(packet):
+    """
+    command code of a sent packet, with or without the tcp top
+    """
+    offset = 8 if packet[:4] == TCP_TOP else 0
+    if len(packet) < offset + 2:
+        return None
+    return unpack_from('<H', packet, offset)[0]
+
+
+def read_session_log(path):
+    """
+    iterate over a log written by SessionRecorder
+
+    :return: generator of (kind, seconds, data)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('%s is not a ZK session log' % path)
+        while True:
+            head = f.read(RECORD.size)
+            if len(head) < RECORD.size:
+                return
+            kind, seconds, size = RECORD.unpack(head)
+            data = f.read(size)
+            if len(data) < size:
+                # cut short by a crash while recording
+                return
+            yield kind, seconds, data
+
+
+class SessionRecorder(object):
+    """
+    socket factory for ZK that writes every frame sent and received to a
+    compact binary log: a magic header, then per record kind, time since
+    the log was opened and length (13 bytes) followed by the raw bytes
+
+    every record is written straight through, so the log survives the
+    process dying mid session; sessions from later connects are appended
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'ab', buffering=0)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.started = time.monotonic()
+
+    def __call__(self, tcp):
+        sock = socket(AF_INET, SOCK_STREAM if tcp else SOCK_DGRAM)
+        return RecordingSocket(sock, self, tcp)
+
+    def write(self, kind, data=b''):
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(RECORD.pack(kind, time.monotonic() - self.started, len(data)) + data)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class RecordingSocket(object):
+    """
+    the subset of the socket API ZK uses, passed through to a real socket
+    """
+
+    def __init__(self, sock, recorder, tcp):
+        self.sock = sock
+        self.recorder = recorder
+        self.tcp = tcp
+        self.opened = False
+
+    def __open(self, address):
+        if not self.opened:
+            self.opened = True
+            self.recorder.write(OPEN, ('%s %s:%i' % ('tcp' if self.tcp else 'udp', address[0], address[1])).encode())
+
+    def connect(self, address):
+        self.sock.connect(address)
+        self.__open(address)
+
+    def send(self, data):
+        sent = self.sock.send(data)
+        self.recorder.write(SENT, bytes(data[:sent]))
+        return sent
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+        self.recorder.write(SENT, bytes(data))
+
+    def sendto(self, data, address):
+        self.__open(address)
+        sent = self.sock.sendto(data, address)
+        self.recorder.write(SENT, bytes(data))
+        return sent
+
+    def recv(self, size):
+        try:
+            data = self.sock.recv(size)
+        except timeout:
+            self.recorder.write(TIMEOUT)
+            raise
+        except OSError as e:
+            self.recorder.write(ERROR, str(e.errno or errno.EIO).encode())
+            raise
+        self.recorder.write(RECEIVED, data)
+        return data
+
+    def settimeout(self, value):
+        self.sock.settimeout(value)
+
+    def gettimeout(self):
+        return self.sock.gettimeout()
+
+    def close(self):
+        self.sock.close()
+
+
+class SessionReplay(object):
+    """
+    socket factory for ZK that plays a recorded session back without a
+    network: each connection picks up the next recorded one and recv()
+    returns exactly the chunks, timeouts and errors the device produced
+
+    only the command codes ZK sends are checked against the recording, so
+    a session can be replayed through changed decoders but calling other
+    methods than the recorded ones fails at once; realtime=True keeps the
+    recorded pacing, by default replies come back as fast as they are read
+    """
+
+    def __init__(self, path, realtime=False):
+        self.path = path
+        self.realtime = realtime
+        self.records = list(read_session_log(path))
+        self.position = 0
+        self.sent_position = 0
+        self.sent = 0
+        self.protocol = None
+        self.address = None
+        for kind, seconds, data in self.records:
+            if kind == OPEN:
+                protocol, address = data.decode().split(' ', 1)
+                ip, port = address.rsplit(':', 1)
+                self.protocol = protocol
+                self.address = (ip, int(port))
+                break
+        self.__clock = None
+
+    def __call__(self, tcp):
+        return ReplaySocket(self, tcp)
+
+    def open_next(self):
+        """
+        move on to the next recorded connection, skipping whatever the
+        previous one left unread
+
+        :return: False once the recording holds no more connections
+        """
+        while self.position < len(self.records):
+            kind = self.records[self.position][0]
+            self.position += 1
+            if kind == OPEN:
+                self.sent_position = self.position
+                return True
+        return False
+
+    def check_sent(self, packet):
+        """
+        match what ZK sends against the next packet sent in the recording
+        """
+        while self.sent_position < len(self.records):
+            kind, seconds, data = self.records[self.sent_position]
+            if kind == OPEN:
+                break
+            self.sent_position += 1
+            if kind == SENT:
+                if _command(data) != _command(packet):
+                    raise ZKNetworkError('replay of %s diverged: sent command %s where the recording has %s'
+                                         % (self.path, _command(packet), _command(data)))
+                self.sent += 1
+                return
+        raise ZKNetworkError('replay of %s diverged: sent command %s after the recorded session ended'
+                             % (self.path, _command(packet)))
+
+    def next_reply(self):
+        """
+        :return: the next (kind, data) the device produced on the current
+            connection, or None once it ended
+        """
+        while self.position < len(self.records):
+            kind, seconds, data = self.records[self.position]
+            if kind == OPEN:
+                return None
+            self.position += 1
+            if kind == SENT:
+                continue
+            if self.realtime:
+                self.__wait_until(seconds)
+            return kind, data
+        return None
+
+    def __wait_until(self, seconds):
+        now = time.monotonic()
+        if self.__clock is None:
+            self.__clock = now - seconds
+        delay = self.__clock + seconds - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ReplaySocket(object):
+    """
+    stands in for the socket of one recorded connection
+    """
+
+    def __init__(self, replay, tcp):
+        self.replay = replay
+        self.tcp = tcp
+        self.opened = False
+        self.pending = b''
+        self.timeout = None
+
+    def __open(self):
+        if not self.opened:
+            self.opened = True
+            if not self.replay.open_next():
+                raise ZKNetworkError('replay of %s has no more sessions' % self.replay.path)
+
+    def connect(self, address):
+        self.__open()
+
+    def send(self, data):
+        self.__open()
+        self.replay.check_sent(data)
+        return len(data)
+
+    def sendall(self, data):
+        self.send(data)
+
+    def sendto(self, data, address):
+        return self.send(data)
+
+    def recv(self, size):
+        self.__open()
+        if not self.pending:
+            reply = self.replay.next_reply()
+            if reply is None:
+                raise ZKNetworkError('replay of %s exhausted' % self.replay.path)
+            kind, data = reply
+            if kind == TIMEOUT:
+                raise timeout('timed out')
+            if kind == ERROR:
+                code = int(data or errno.EIO)
+                raise OSError(code, os.strerror(code))
+            if not self.tcp:
+                # a datagram longer than the buffer is truncated, as recv() does
+                return data[:size]
+            self.pending = data
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+    def settimeout(self, value):
+        self.timeout = value
+
+    def gettimeout(self):
+        return self.timeout
+
+    def close(self):
+        pass
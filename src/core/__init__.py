@@ -1,6 +1,11 @@
 # src/core/__init__.py
-from .database import DatabaseManager
-from .device_manager import DeviceManager
-from .attendance_service import AttendanceService
+from src.utils.lazy import lazy_exports
 
-__all__ = ['DatabaseManager', 'DeviceManager', 'AttendanceService']
\ No newline at end of file
+__all__ = ['DatabaseManager', 'DeviceManager', 'AttendanceService']
+
+# imported on first access, so importing one core module does not load the others
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'DatabaseManager': '.database',
+    'DeviceManager': '.device_manager',
+    'AttendanceService': '.attendance_service',
+})
@@ -2,12 +2,12 @@
 import threading
 import time
 import logging
-import requests
 from typing import List, Dict, Optional
 from datetime import datetime
 
 from .database import DatabaseManager
 from .device_manager import DeviceManager
+from .latency import now_ms
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +19,15 @@ class AttendanceService:
         self.is_running = False
         self.sync_thread = None
         self.sync_interval = int(self.config.get('sync', {}).get('interval_seconds', 300))
+        # running totals for the metrics endpoint
+        self.sync_stats = {
+            'runs': 0,
+            'synced': 0,
+            'rejected': 0,
+            'errors': 0,
+            'last_sync': None,
+            'last_duration': None
+        }
         
     def start(self, sync_config: Dict = None):
         """Start the attendance synchronization service"""
@@ -69,48 +78,74 @@ class AttendanceService:
         unsynced_records = self.db.get_unsynced_attendance()
         if not unsynced_records:
             return
+
+        # imported on first use, the HTTP stack is a large share of startup time
+        import requests
             
         successful_syncs = []
+        synced_at_ms = {}
+        started = time.time()
+        rejected = errors = 0
         
         for record in unsynced_records:
             try:
-                # Prepare data for server
-                json_data = {
-                    'uid': record['UserID'],
-                    'user_id': record['UserID'],
-                    't': record['PunchDateTime'],
-                    'ip': record['IPAddr'],
-                    'serial_number': record['SrNo']
-                }
-                
                 # Send to server
                 response = requests.post(
                     f"{site_url}biometric",
-                    json=json_data,
+                    json=self._sync_payload(record),
                     timeout=10
                 )
                 
                 if response.status_code == 200:
-                    successful_syncs.append(record['ID'])
-                    logger.info(f"Synced attendance record {record['ID']} for user {record['UserID']}")
+                    successful_syncs.append(record['id'])
+                    synced_at_ms[record['id']] = now_ms()
+                    logger.info(f"Synced attendance record {record['id']} for user {record['user_id']}")
                 else:
-                    logger.warning(f"Server rejected attendance record {record['ID']}: {response.status_code}")
+                    rejected += 1
+                    logger.warning(f"Server rejected attendance record {record['id']}: {response.status_code}",
+                                   extra={'rate_key': 'sync_rejected'})
                     
             except requests.RequestException as e:
-                logger.error(f"Network error syncing record {record['ID']}: {e}")
+                errors += 1
+                logger.error(f"Network error syncing record {record['id']}: {e}",
+                             extra={'rate_key': 'sync_network_error'})
             except Exception as e:
-                logger.error(f"Error syncing record {record['ID']}: {e}")
+                errors += 1
+                logger.error(f"Error syncing record {record['id']}: {e}",
+                             extra={'rate_key': 'sync_error'})
         
         # Mark successfully synced records
         if successful_syncs:
-            self.db.mark_attendance_synced(successful_syncs)
+            if self.db.mark_attendance_synced(successful_syncs, synced_at_ms):
+                for record in unsynced_records:
+                    if record['id'] in synced_at_ms:
+                        self.device_manager.latency.synced(record, synced_at_ms[record['id']])
             logger.info(f"Marked {len(successful_syncs)} records as synced")
+
+        self.sync_stats['runs'] += 1
+        self.sync_stats['synced'] += len(successful_syncs)
+        self.sync_stats['rejected'] += rejected
+        self.sync_stats['errors'] += errors
+        self.sync_stats['last_sync'] = time.time()
+        self.sync_stats['last_duration'] = time.time() - started
     
+    @staticmethod
+    def _sync_payload(record: Dict) -> Dict:
+        """Request body the server expects for one attendance row"""
+        return {
+            'uid': record['user_id'],
+            'user_id': record['user_id'],
+            't': record['punch_time'],
+            'ip': record['device_ip'],
+            'serial_number': record['device_sn']
+        }
+
     def get_sync_status(self) -> Dict:
         """Get synchronization status"""
         unsynced = self.db.get_unsynced_attendance()
         return {
             'unsynced_count': len(unsynced),
             'sync_interval': self.sync_interval,
-            'last_sync': datetime.now().isoformat()  # Would be stored in DB in real implementation
+            'last_sync': (datetime.fromtimestamp(self.sync_stats['last_sync']).isoformat()
+                          if self.sync_stats['last_sync'] else None)
         }
\ No newline at end of file
@@ -2,15 +2,22 @@
 import sqlite3
 import json
 import logging
-from typing import Optional, List, Tuple, Any, Dict
+import threading
+import time
+from typing import Optional, List, Tuple, Any, Dict, Iterable
 from pathlib import Path
 
+from src.utils.histogram import Histogram
+
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
     def __init__(self, db_path: str = "data/att.db", config: Dict = None):
         self.db_path = db_path
         self.config = config or {}  # Add this line
+        # seconds per committed write, for the metrics endpoint
+        self.write_latency = Histogram()
+        self._write_latency_lock = threading.Lock()
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._init_database()
 
@@ -55,12 +62,23 @@ class DatabaseManager:
             """,
             "users": """
                 CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
+                    user_id TEXT PRIMARY KEY,
                     name TEXT,
                     privilege INTEGER,
                     password TEXT,
                     last_updated TIMESTAMP
                 )
+            """,
+            "templates": """
+                CREATE TABLE IF NOT EXISTS templates (
+                    hash TEXT PRIMARY KEY,
+                    uid INTEGER NOT NULL,
+                    fid INTEGER NOT NULL,
+                    valid INTEGER DEFAULT 1,
+                    template BLOB NOT NULL,
+                    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (uid, fid)
+                )
             """
         }
 
@@ -71,6 +89,25 @@ class DatabaseManager:
                 except sqlite3.Error as e:
                     logger.error(f"Error creating table {table_name}: {e}")
 
+            # Columns added after the first release
+            self._ensure_columns(conn, "users", {
+                "uid": "INTEGER",
+                "group_id": "TEXT",
+                "card": "INTEGER DEFAULT 0"
+            })
+            self._ensure_users_text_key(conn)
+            self._ensure_columns(conn, "devices", {
+                "firmware_version": "TEXT",
+                "capabilities": "TEXT"
+            })
+            # epoch ms a punch was received from the device, stored here and acknowledged by the server
+            self._ensure_columns(conn, "attendance", {
+                "captured_at_ms": "INTEGER",
+                "stored_at_ms": "INTEGER",
+                "synced_at_ms": "INTEGER"
+            })
+            self._ensure_attendance_key(conn)
+
             # Insert default configuration if not exists
             #""" ENVIRONMENT """
             default_config = {
@@ -88,18 +125,107 @@ class DatabaseManager:
 
             conn.commit()
 
+    def _ensure_columns(self, conn: sqlite3.Connection, table_name: str, columns: Dict[str, str]):
+        """Add any missing columns to an existing table"""
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+        for column, column_type in columns.items():
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {column_type}")
+                except sqlite3.Error as e:
+                    logger.error(f"Error adding column {table_name}.{column}: {e}")
+
+    def _ensure_users_text_key(self, conn: sqlite3.Connection):
+        """Migrate users.user_id from INTEGER to TEXT, device user ids are strings like 'A-17'"""
+        columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(users)")}
+        if columns.get("user_id", "").upper() != "INTEGER":
+            return
+        try:
+            # one unit, so a failure leaves the old table as it was
+            conn.execute("SAVEPOINT users_text_key")
+            conn.execute("ALTER TABLE users RENAME TO users_integer_key")
+            conn.execute("""
+                CREATE TABLE users (
+                    user_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    privilege INTEGER,
+                    password TEXT,
+                    last_updated TIMESTAMP,
+                    uid INTEGER,
+                    group_id TEXT,
+                    card INTEGER DEFAULT 0
+                )
+            """)
+            copied = conn.execute(
+                """INSERT INTO users (user_id, name, privilege, password, last_updated, uid, group_id, card)
+                   SELECT CAST(user_id AS TEXT), name, privilege, password, last_updated, uid, group_id, card
+                   FROM users_integer_key"""
+            ).rowcount
+            conn.execute("DROP TABLE users_integer_key")
+            conn.execute("RELEASE users_text_key")
+            logger.info(f"Migrated users.user_id to TEXT ({copied} users)")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO users_text_key")
+            conn.execute("RELEASE users_text_key")
+            logger.error(f"Error migrating users.user_id to TEXT: {e}")
+
+    def _ensure_attendance_key(self, conn: sqlite3.Connection):
+        """Make (user_id, punch_time, device_sn) unique so re-read punches are ignored
+
+        Runs once, when the index is missing. Databases from before the key
+        may hold duplicate punches; the oldest row of each stays and the
+        others are moved to attendance_duplicates, not deleted.
+        """
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_attendance_punch'"
+        ).fetchone()
+        if exists:
+            return
+        duplicates = """FROM attendance WHERE id NOT IN (
+                            SELECT MIN(id) FROM attendance GROUP BY user_id, punch_time, device_sn)"""
+        try:
+            conn.execute("SAVEPOINT attendance_key")
+            count = conn.execute(f"SELECT COUNT(*) {duplicates}").fetchone()[0]
+            if count:
+                logger.warning(f"Attendance punch key migration: moving {count} duplicate records "
+                               f"to attendance_duplicates")
+                conn.execute("CREATE TABLE IF NOT EXISTS attendance_duplicates AS SELECT * FROM attendance WHERE 0")
+                conn.execute(f"INSERT INTO attendance_duplicates SELECT * {duplicates}")
+                conn.execute(f"DELETE {duplicates}")
+            conn.execute(
+                "CREATE UNIQUE INDEX idx_attendance_punch ON attendance (user_id, punch_time, device_sn)"
+            )
+            conn.execute("RELEASE attendance_key")
+            if count:
+                logger.info(f"Attendance punch key added, {count} duplicates kept in attendance_duplicates")
+        except sqlite3.Error as e:
+            conn.execute("ROLLBACK TO attendance_key")
+            conn.execute("RELEASE attendance_key")
+            logger.error(f"Error creating attendance key, attendance left unchanged: {e}")
+
     def execute_query(self, query: str, params: tuple = None, commit: bool = False) -> Optional[sqlite3.Cursor]:
         """Execute a SQL query with error handling"""
+        started = time.perf_counter()
         try:
             with self._get_connection() as conn:
                 cursor = conn.execute(query, params or ())
                 if commit:
                     conn.commit()
+                    self._record_write(started)
                 return cursor
         except sqlite3.Error as e:
             logger.error(f"Database error: {e}")
             return None
 
+    def _record_write(self, started: float):
+        with self._write_latency_lock:
+            self.write_latency.observe(time.perf_counter() - started)
+
+    def get_write_latency(self) -> Dict:
+        """Histogram snapshot of committed write times in seconds"""
+        with self._write_latency_lock:
+            return self.write_latency.snapshot()
+
     def get_config_value(self, key: str, default: Any = None) -> Any:
         """Get a configuration value"""
         cursor = self.execute_query("SELECT value FROM configuration WHERE key = ?", (key,))
@@ -144,17 +270,130 @@ class DatabaseManager:
         )
         return cursor is not None and cursor.rowcount > 0
 
+    def get_device_capabilities(self, serial_number: str) -> Optional[Dict]:
+        """Get the stored capability profile of a device, including its firmware version"""
+        cursor = self.execute_query(
+            "SELECT firmware_version, capabilities FROM devices WHERE serial_number = ?",
+            (serial_number,)
+        )
+        row = cursor.fetchone() if cursor else None
+        if not row or not row[1]:
+            return None
+        try:
+            capabilities = json.loads(row[1])
+        except ValueError as e:
+            logger.error(f"Invalid capability profile for device {serial_number}: {e}")
+            return None
+        if row[0]:
+            capabilities['firmware_version'] = row[0]
+        return capabilities
+
+    def save_device_capabilities(self, serial_number: str, ip: str, port: int, capabilities: Dict) -> bool:
+        """Store a device's capability profile, adding the device if it isn't known yet"""
+        profile = dict(capabilities)
+        firmware_version = profile.pop('firmware_version', None)
+        cursor = self.execute_query(
+            """INSERT INTO devices (ip, port, serial_number, firmware_version, capabilities)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(serial_number) DO UPDATE SET
+                   ip = excluded.ip,
+                   port = excluded.port,
+                   firmware_version = COALESCE(excluded.firmware_version, devices.firmware_version),
+                   capabilities = excluded.capabilities""",
+            (ip, port, serial_number, firmware_version, json.dumps(profile, sort_keys=True)),
+            commit=True
+        )
+        return cursor is not None
+
+    # User methods
+    def upsert_users(self, users: Iterable[Dict]) -> int:
+        """Insert or update users shaped like ZKDevice.get_users() output"""
+        rows = [
+            (
+                str(user['user_id']),
+                user.get('uid'),
+                user.get('name'),
+                user.get('privilege', 0),
+                user.get('password', ''),
+                str(user.get('group_id', '')),
+                user.get('card', 0)
+            )
+            for user in users
+        ]
+        if not rows:
+            return 0
+
+        try:
+            with self._get_connection() as conn:
+                conn.executemany(
+                    """INSERT OR REPLACE INTO users
+                       (user_id, uid, name, privilege, password, group_id, card, last_updated)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                    rows
+                )
+                conn.commit()
+            return len(rows)
+        except sqlite3.Error as e:
+            logger.error(f"Database error storing users: {e}")
+            return 0
+
+    def get_users(self) -> List[Dict]:
+        """Get stored users that have a device uid"""
+        cursor = self.execute_query(
+            "SELECT uid, user_id, name, privilege, password, group_id, card FROM users WHERE uid IS NOT NULL ORDER BY uid"
+        )
+        if cursor:
+            columns = [desc[0] for desc in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return []
+
     # Attendance methods
-    def insert_attendance(self, user_id: int, punch_time: str, device_ip: str, device_sn: str) -> bool:
-        """Insert attendance record"""
+    def insert_attendance(self, user_id: int, punch_time: str, device_ip: str, device_sn: str,
+                          captured_at_ms: int = None, stored_at_ms: int = None) -> bool:
+        """Insert attendance record, ignoring a punch that is already stored"""
         cursor = self.execute_query(
-            """INSERT INTO attendance (user_id, punch_time, device_ip, device_sn)
-               VALUES (?, ?, ?, ?)""",
-            (user_id, punch_time, device_ip, device_sn),
+            """INSERT OR IGNORE INTO attendance
+                   (user_id, punch_time, device_ip, device_sn, captured_at_ms, stored_at_ms)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (user_id, punch_time, device_ip, device_sn, captured_at_ms, stored_at_ms or int(time.time() * 1000)),
             commit=True
         )
         return cursor is not None and cursor.rowcount > 0
 
+    def insert_attendance_batch(self, records: Iterable[Dict]) -> int:
+        """Insert many attendance records in one transaction
+
+        Records are dicts with user_id, punch_time, device_ip and device_sn,
+        and optionally captured_at_ms. Punches already stored are skipped.
+        Returns the number of new rows.
+        """
+        stored_at_ms = int(time.time() * 1000)
+        rows = [
+            (record['user_id'], record['punch_time'], record['device_ip'], record['device_sn'],
+             record.get('captured_at_ms'), stored_at_ms)
+            for record in records
+        ]
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            with self._get_connection() as conn:
+                before = conn.total_changes
+                conn.executemany(
+                    """INSERT OR IGNORE INTO attendance
+                           (user_id, punch_time, device_ip, device_sn, captured_at_ms, stored_at_ms)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    rows
+                )
+                inserted = conn.total_changes - before
+                conn.commit()
+            self._record_write(started)
+            return inserted
+        except sqlite3.Error as e:
+            logger.error(f"Database error storing attendance: {e}")
+            return 0
+
     def get_unsynced_attendance(self, limit: int = 100) -> List[Dict]:
         """Get unsynced attendance records"""
         cursor = self.execute_query(
@@ -166,15 +405,148 @@ class DatabaseManager:
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
         return []
 
-    def mark_attendance_synced(self, attendance_ids: List[int]) -> bool:
-        """Mark attendance records as synced"""
+    def get_attendance_counts(self) -> Dict[str, Dict]:
+        """Row count and oldest created_at (UTC) per attendance status"""
+        cursor = self.execute_query("SELECT status, COUNT(*), MIN(created_at) FROM attendance GROUP BY status")
+        if cursor:
+            return {status: {'count': count, 'oldest': oldest} for status, count, oldest in cursor.fetchall()}
+        return {}
+
+    def mark_attendance_synced(self, attendance_ids: List[int], synced_at_ms: Dict[int, int] = None) -> bool:
+        """Mark attendance records as synced
+
+        synced_at_ms maps ids to the epoch ms the server acknowledged them;
+        ids without an entry are stamped with the current time.
+        """
         if not attendance_ids:
             return True
 
-        placeholders = ','.join('?' * len(attendance_ids))
-        cursor = self.execute_query(
-            f"UPDATE attendance SET status = 'synced', sync_time = CURRENT_TIMESTAMP WHERE id IN ({placeholders})",
-            attendance_ids,
-            commit=True
-        )
-        return cursor is not None
\ No newline at end of file
+        now = int(time.time() * 1000)
+        synced_at_ms = synced_at_ms or {}
+        started = time.perf_counter()
+        try:
+            with self._get_connection() as conn:
+                conn.executemany(
+                    """UPDATE attendance SET status = 'synced', sync_time = CURRENT_TIMESTAMP, synced_at_ms = ?
+                       WHERE id = ?""",
+                    [(synced_at_ms.get(attendance_id, now), attendance_id) for attendance_id in attendance_ids]
+                )
+                conn.commit()
+            self._record_write(started)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Database error marking attendance synced: {e}")
+            return False
+
+    # Fingerprint template methods
+    def upsert_templates(self, fingers: Iterable, batch_size: int = 500) -> int:
+        """Store fingerprint templates keyed by content hash
+
+        Accepts any iterable of Finger objects (e.g. ZK.iter_templates()) and
+        consumes it in batches. Templates whose hash is already stored are
+        skipped; a new hash for an existing (uid, fid) replaces the old row.
+        Returns the number of templates written.
+        """
+        written = 0
+        batch = []
+
+        try:
+            with self._get_connection() as conn:
+                for finger in fingers:
+                    batch.append(finger)
+                    if len(batch) >= batch_size:
+                        written += self._upsert_template_batch(conn, batch)
+                        batch = []
+                if batch:
+                    written += self._upsert_template_batch(conn, batch)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Database error storing templates: {e}")
+
+        return written
+
+    def _upsert_template_batch(self, conn: sqlite3.Connection, fingers: List) -> int:
+        """Insert the templates of one batch that are not stored yet"""
+        rows = {finger.content_hash(): finger for finger in fingers}
+        placeholders = ','.join('?' * len(rows))
+        existing = {
+            row[0] for row in conn.execute(
+                f"SELECT hash FROM templates WHERE hash IN ({placeholders})",
+                list(rows.keys())
+            )
+        }
+
+        new_rows = [
+            (template_hash, finger.uid, finger.fid, finger.valid, bytes(finger.template))
+            for template_hash, finger in rows.items()
+            if template_hash not in existing
+        ]
+        if new_rows:
+            conn.executemany(
+                """INSERT OR REPLACE INTO templates (hash, uid, fid, valid, template, last_updated)
+                   VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
+                new_rows
+            )
+        return len(new_rows)
+
+    def get_templates(self, uid: int = None) -> List[Dict]:
+        """Get stored templates, optionally for a single uid"""
+        if uid is None:
+            cursor = self.execute_query("SELECT hash, uid, fid, valid, template FROM templates ORDER BY uid, fid")
+        else:
+            cursor = self.execute_query(
+                "SELECT hash, uid, fid, valid, template FROM templates WHERE uid = ? ORDER BY fid",
+                (uid,)
+            )
+        if cursor:
+            columns = [desc[0] for desc in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return []
+
+    def get_templates_by_hash(self, hashes: Iterable[str]) -> List[Dict]:
+        """Get stored templates for the given content hashes"""
+        hashes = list(hashes)
+        templates = []
+
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            cursor = self.execute_query(
+                f"SELECT hash, uid, fid, valid, template FROM templates WHERE hash IN ({placeholders})",
+                batch
+            )
+            if cursor:
+                columns = [desc[0] for desc in cursor.description]
+                templates.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+
+        return templates
+
+    def get_template_hashes(self) -> Dict[Tuple[int, int], str]:
+        """Get the content hash of every stored template keyed by (uid, fid)"""
+        cursor = self.execute_query("SELECT uid, fid, hash FROM templates")
+        if cursor:
+            return {(uid, fid): template_hash for uid, fid, template_hash in cursor.fetchall()}
+        return {}
+
+    def diff_templates(self, hashes: Dict[Tuple[int, int], str]) -> Dict[str, List]:
+        """Compare a (uid, fid) -> hash map against the local store
+
+        Returns the keys whose template is new or changed relative to the
+        store ('changed'), and the keys only present in the store ('missing').
+        """
+        stored = self.get_template_hashes()
+        changed = [key for key, template_hash in hashes.items() if stored.get(key) != template_hash]
+        missing = [key for key in stored if key not in hashes]
+        return {'changed': changed, 'missing': missing}
+
+    def delete_templates(self, uid: int, fid: int = None) -> bool:
+        """Delete stored templates for a uid, or a single finger of it"""
+        if fid is None:
+            cursor = self.execute_query("DELETE FROM templates WHERE uid = ?", (uid,), commit=True)
+        else:
+            cursor = self.execute_query(
+                "DELETE FROM templates WHERE uid = ? AND fid = ?",
+                (uid, fid),
+                commit=True
+            )
+        return cursor is not None
@@ -2,11 +2,15 @@
 import threading
 import time
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
 from typing import Dict, List, Optional
 from queue import Queue
 
 from src.biometric.zk_device import ZKDevice
 from src.core.database import DatabaseManager
+from src.core.latency import PunchLatency, now_ms
+from src.core.replication import FleetReplicator
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +23,21 @@ class DeviceManager:
         self.is_running = False
         self.thread = None
         self.live_capture_threads = {}
+        self._saved_capabilities: Dict[str, Dict] = {}
+        # device log record count at the last backfill, per device
+        self._record_counts: Dict[str, int] = {}
+        self.recovery_stats: Dict[str, Dict] = {}
+        # epoch seconds of the last live punch, per device
+        self.last_event_times: Dict[str, float] = {}
+        # capture -> store -> server ack latency, fed from the per-record stamps
+        self.latency = PunchLatency(
+            window=self.config.get('application', {}).get('latency_window', 300),
+            sla_seconds=self.config.get('application', {}).get('latency_sla_seconds', 10)
+        )
+        self._status_executor = None
+        # status queries still running, so a slow device is never queried twice at once
+        self._status_futures: Dict[str, Future] = {}
+        self._status_lock = threading.Lock()
 
     # Update initialize_devices method:
     def initialize_devices(self, devices_config=None):
@@ -26,16 +45,50 @@ class DeviceManager:
         if devices_config is None:
             devices_config = self.config.get('devices', [])
 
+        # Devices with a stored profile already know their protocol; probe the
+        # rest all at once so unreachable ones don't stall the others
+        profiles = {
+            device_info.get('serial_number', device_info['ip']):
+                self.db.get_device_capabilities(device_info.get('serial_number', device_info['ip']))
+            for device_info in devices_config
+        }
+        probe_timeout = self.config.get('application', {}).get('probe_timeout', 5)
+        reachable = ZKDevice.probe(
+            [
+                (device_info['ip'], device_info.get('port', 4370)) for device_info in devices_config
+                if not (profiles[device_info.get('serial_number', device_info['ip'])] or {}).get('protocol')
+            ],
+            timeout=probe_timeout
+        )
+
         for device_info in devices_config:
+            if reachable.get((device_info['ip'], device_info.get('port', 4370)), True) is None:
+                logger.error(f"Device {device_info.get('serial_number', device_info['ip'])} at {device_info['ip']} is not reachable")
+                continue
             try:
                 device = ZKDevice(
                     ip=device_info['ip'],
                     port=device_info.get('port', 4370),
                     serial_number=device_info.get('serial_number'),
-                    timeout=device_info.get('timeout', 30)
+                    timeout=device_info.get('timeout', 30),
+                    read_window=device_info.get('read_window', 1),
+                    adaptive_read_chunk=device_info.get('adaptive_read_chunk', False),
+                    upload_chunk_size=device_info.get('upload_chunk_size', 1024),
+                    upload_window=device_info.get('upload_window', 1),
+                    use_actor=device_info.get('use_actor', True),
+                    poll_interval=device_info.get('poll_interval', 0.5),
+                    capabilities=profiles[device_info.get('serial_number', device_info['ip'])],
+                    heartbeat_interval=device_info.get('heartbeat_interval', 30),
+                    dead_peer_timeout=device_info.get('dead_peer_timeout', 90),
+                    metadata_ttl=device_info.get('metadata_ttl', 3600),
+                    record_session=device_info.get('record_session'),
+                    protocol_stats=device_info.get(
+                        'protocol_stats', self.config.get('application', {}).get('protocol_stats', False))
                 )
+                self._saved_capabilities[device_info.get('serial_number', device_info['ip'])] = device.capabilities
                 if device.connect():
                     self.devices[device_info.get('serial_number', device_info['ip'])] = device
+                    self._save_capabilities(device_info.get('serial_number', device_info['ip']), device)
                     logger.info(f"Connected to device {device_info.get('serial_number', device_info['ip'])} at {device_info['ip']}")
 
                     # Sync device time if enabled
@@ -68,6 +121,8 @@ class DeviceManager:
     def stop_live_capture(self):
         """Stop live capture on all devices"""
         self.is_running = False
+        for device in self.devices.values():
+            device.stop_live_capture()
 
         for thread in self.live_capture_threads.values():
             thread.join(timeout=5.0)
@@ -76,28 +131,134 @@ class DeviceManager:
         logger.info("Stopped live capture on all devices")
 
     def _live_capture_loop(self, device: ZKDevice):
-        """Live capture loop for a single device"""
+        """Live capture loop for a single device
+
+        A dead session (socket error or heartbeat deadline) is reconnected
+        right away; only repeated connect failures back off, up to 30s.
+        Once each capture session is streaming, the punches logged since
+        the previous session started are read from the tail of the device
+        log, so nothing missed while disconnected is lost.
+        """
+        key = device.serial_number or device.ip
+        retry_delay = 1
+
         while self.is_running:
             try:
                 if not device.is_connected():
-                    device.connect()
+                    if not device.connect():
+                        time.sleep(retry_delay)
+                        retry_delay = min(retry_delay * 2, 30)
+                        continue
+                    retry_delay = 1
+                    self._save_capabilities(key, device)
 
                 # Use the ZK library's live capture functionality
-                for attendance in device.live_capture():
+                for attendance in device.live_capture(on_started=lambda: self._backfill(device)):
                     if attendance:
-                        # Add to processing queue
-                        self.attendance_queue.put({
-                            'user_id': attendance['user_id'],
-                            'punch_time': attendance['timestamp'].isoformat(),
-                            'device_ip': device.ip,
-                            'device_sn': device.serial_number,
-                            'status': attendance['status'],
-                            'punch': attendance['punch']
-                        })
+                        self._queue_attendance(device, attendance)
+
+                if not self.is_running:
+                    break
+                if device.is_connected():
+                    # capture ended without the session dying, don't spin on it
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, 30)
+                else:
+                    logger.warning(f"Live capture session to device {device.serial_number} died, reconnecting",
+                                   extra={'rate_key': f"capture_died:{key}"})
 
             except Exception as e:
-                logger.error(f"Error in live capture for device {device.serial_number}: {e}")
-                time.sleep(5)  # Wait before retrying
+                logger.error(f"Error in live capture for device {device.serial_number}: {e}",
+                             extra={'rate_key': f"capture_loop:{key}"})
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+
+    def _queue_attendance(self, device: ZKDevice, attendance: Dict):
+        """Add a device punch to the processing queue"""
+        self.last_event_times[device.serial_number or device.ip] = time.time()
+        self.attendance_queue.put(self._attendance_record(device, attendance, now_ms()))
+
+    @staticmethod
+    def _attendance_record(device: ZKDevice, attendance: Dict, captured_at_ms: int = None) -> Dict:
+        """captured_at_ms is left out for punches not seen live, so latency skips them"""
+        return {
+            'user_id': attendance['user_id'],
+            'punch_time': attendance['timestamp'].isoformat(),
+            'device_ip': device.ip,
+            'device_sn': device.serial_number,
+            'status': attendance['status'],
+            'punch': attendance['punch'],
+            'captured_at_ms': captured_at_ms
+        }
+
+    def _backfill(self, device: ZKDevice):
+        """Store the punches logged on the device since the last backfill
+
+        Called when a capture session starts streaming. The first call only
+        records the device's record count; later calls read the log tail
+        past that count, which covers the previous session, the outage and
+        the registration window. Punches already captured live are dropped
+        by the attendance key. Recovered punches carry no capture stamp:
+        they were logged during the outage, not when they were read.
+        Queued live punches are stored first, so they keep their stamps
+        and aren't counted as recovered.
+        """
+        key = device.serial_number or device.ip
+        known = self._record_counts.get(key)
+        if known is None:
+            count = device.get_attendance_count()
+            if count is not None:
+                self._record_counts[key] = count
+            return
+
+        self.process_attendance_queue()
+        records, count = device.get_new_attendance(known)
+        if count is None:
+            # keep the old position and try again after the next reconnect
+            return
+
+        recovered = self.db.insert_attendance_batch(
+            self._attendance_record(device, record) for record in records
+        )
+        self._record_counts[key] = count
+
+        stats = self.recovery_stats.setdefault(key, {
+            'backfills': 0,
+            'records_read': 0,
+            'recovered': 0,
+            'last_backfill': None
+        })
+        stats['backfills'] += 1
+        stats['records_read'] += len(records)
+        stats['recovered'] += recovered
+        stats['last_backfill'] = datetime.now().isoformat()
+        if recovered:
+            logger.info(f"Recovered {recovered} punches missed by live capture on device {device.serial_number}")
+
+    def get_recovery_stats(self) -> Dict[str, Dict]:
+        """Get per-device counts of backfills, tail records read and punches recovered"""
+        return {key: dict(stats) for key, stats in self.recovery_stats.items()}
+
+    def get_latency_report(self) -> Dict:
+        """Capture, store and sync latency over the recent window, and the share within the SLA"""
+        return self.latency.get_report()
+
+    def get_protocol_stats(self) -> Dict[str, Dict]:
+        """Protocol stats snapshot of every device that has them enabled"""
+        snapshots = {}
+        for serial_number, device in list(self.devices.items()):
+            stats = device.get_protocol_stats()
+            if stats is not None:
+                snapshots[serial_number] = stats
+        return snapshots
+
+    def _save_capabilities(self, serial_number: str, device: ZKDevice):
+        """Persist the device's capability profile if it changed since it was loaded or saved"""
+        capabilities = device.get_capabilities()
+        if not capabilities or capabilities == self._saved_capabilities.get(serial_number):
+            return
+        if self.db.save_device_capabilities(serial_number, device.ip, device.port, capabilities):
+            self._saved_capabilities[serial_number] = dict(capabilities)
 
     def process_attendance_queue(self):
         """Process attendance records from the queue"""
@@ -106,14 +267,18 @@ class DeviceManager:
         while not self.attendance_queue.empty():
             try:
                 record = self.attendance_queue.get_nowait()
+                stored_at_ms = now_ms()
                 success = self.db.insert_attendance(
                     user_id=record['user_id'],
                     punch_time=record['punch_time'],
                     device_ip=record['device_ip'],
-                    device_sn=record['device_sn']
+                    device_sn=record['device_sn'],
+                    captured_at_ms=record.get('captured_at_ms'),
+                    stored_at_ms=stored_at_ms
                 )
 
                 if success:
+                    self.latency.stored(record.get('captured_at_ms'), stored_at_ms)
                     processed_records.append(record)
                     logger.info(f"Recorded attendance for user {record['user_id']} from device {record['device_sn']}")
 
@@ -131,33 +296,95 @@ class DeviceManager:
 
         try:
             info = device.get_device_info()
+            self._save_capabilities(serial_number, device)
             return {
                 'connected': device.is_connected(),
                 'info': info,
-                'serial_number': serial_number
+                'serial_number': serial_number,
+                'recovery': self.recovery_stats.get(serial_number)
             }
         except Exception as e:
             logger.error(f"Error getting status for device {serial_number}: {e}")
             return None
 
-    def get_all_devices_status(self) -> List[Dict]:
-        """Get status of all devices"""
+    def get_all_devices_status(self, deadline: float = None) -> List[Dict]:
+        """Get status of all devices, querying them concurrently
+
+        Devices that haven't answered within deadline seconds are reported
+        from cached metadata with 'timed_out' set; their query keeps running
+        and is reused by the next call instead of being queued again.
+        """
+        if deadline is None:
+            deadline = self.config.get('application', {}).get('status_deadline', 0.8)
+
+        serial_numbers = list(self.devices.keys())
+        futures = {serial_number: self._submit_status(serial_number) for serial_number in serial_numbers}
+        wait(futures.values(), timeout=deadline)
+
         status_list = []
-        for serial_number in self.devices.keys():
-            status = self.get_device_status(serial_number)
+        for serial_number in serial_numbers:
+            future = futures[serial_number]
+            if future.done():
+                status = future.result()
+            else:
+                status = self._cached_status(serial_number)
             if status:
                 status_list.append(status)
         return status_list
 
+    def _submit_status(self, serial_number: str) -> Future:
+        with self._status_lock:
+            future = self._status_futures.get(serial_number)
+            if future is not None and not future.done():
+                return future
+            if self._status_executor is None:
+                self._status_executor = ThreadPoolExecutor(
+                    max_workers=self.config.get('application', {}).get('status_workers', 32),
+                    thread_name_prefix="DeviceStatus"
+                )
+            future = self._status_executor.submit(self.get_device_status, serial_number)
+            self._status_futures[serial_number] = future
+            return future
+
+    def _cached_status(self, serial_number: str) -> Optional[Dict]:
+        device = self.devices.get(serial_number)
+        if not device:
+            return None
+        return {
+            'connected': device.is_connected(),
+            'info': device.get_cached_info(),
+            'serial_number': serial_number,
+            'recovery': self.recovery_stats.get(serial_number),
+            'timed_out': True
+        }
+
+    def replicate(self, source_serial: str = None, targets: List[str] = None,
+                  include_templates: bool = True, max_workers: int = None) -> Dict[str, Dict]:
+        """Copy users and templates from a source device (or the local store) to other devices"""
+        replication_config = self.config.get('replication', {})
+        replicator = FleetReplicator(
+            self,
+            self.db,
+            max_workers=max_workers or replication_config.get('max_workers', 4),
+            batch_size=replication_config.get('batch_size', 200)
+        )
+        return replicator.replicate(source_serial, targets, include_templates)
+
     def disconnect_all(self):
         """Disconnect all devices"""
         self.stop_live_capture()
 
-        for device in self.devices.values():
+        for serial_number, device in self.devices.items():
             try:
                 device.disconnect()
+                self._save_capabilities(serial_number, device)
             except Exception as e:
                 logger.error(f"Error disconnecting device: {e}")
         
         self.devices.clear()
+        with self._status_lock:
+            if self._status_executor is not None:
+                self._status_executor.shutdown(wait=False)
+                self._status_executor = None
+            self._status_futures.clear()
         logger.info("Disconnected all devices")
\ No newline at end of file
@@ -0,0 +1,67 @@
+# src/core/latency.py
+import threading
+import time
+from typing import Dict, Optional
+
+from src.utils.histogram import Histogram, RollingHistogram
+
+# store: captured -> persisted, sync: persisted -> server ack, total: captured -> server ack
+STAGES = ('store', 'sync', 'total')
+
+
+def now_ms() -> int:
+    """Wall clock as integer epoch milliseconds, the unit of the attendance stamps"""
+    return int(time.time() * 1000)
+
+
+class PunchLatency:
+    """Latency of each stage a punch goes through, from the per-record stamps
+
+    Every stage keeps an all-time histogram (what the metrics endpoint
+    exports, so Prometheus can take rates) and one over the last window
+    seconds, which is what get_report() judges the SLA against.
+    """
+
+    def __init__(self, window: float = 300.0, sla_seconds: float = 10.0):
+        self.window = window
+        self.sla_seconds = sla_seconds
+        self.lock = threading.Lock()
+        self.totals = {stage: Histogram() for stage in STAGES}
+        self.recent = {stage: RollingHistogram(window) for stage in STAGES}
+
+    def observe(self, stage: str, seconds: float):
+        seconds = max(0.0, seconds)
+        with self.lock:
+            self.totals[stage].observe(seconds)
+            self.recent[stage].observe(seconds)
+
+    def stored(self, captured_at_ms: Optional[int], stored_at_ms: int):
+        if captured_at_ms:
+            self.observe('store', (stored_at_ms - captured_at_ms) / 1000.0)
+
+    def synced(self, record: Dict, synced_at_ms: int):
+        """record is an attendance row, with the stamps taken when it was captured and stored"""
+        if record.get('stored_at_ms'):
+            self.observe('sync', (synced_at_ms - record['stored_at_ms']) / 1000.0)
+        if record.get('captured_at_ms'):
+            self.observe('total', (synced_at_ms - record['captured_at_ms']) / 1000.0)
+
+    def get_totals(self) -> Dict[str, Dict]:
+        """All-time histogram snapshot per stage"""
+        with self.lock:
+            return {stage: self.totals[stage].snapshot() for stage in STAGES}
+
+    def get_report(self) -> Dict:
+        """p50/p99/max per stage over the window, and the share within the SLA"""
+        with self.lock:
+            recent = {stage: self.recent[stage].merged() for stage in STAGES}
+        stages = {}
+        for stage, histogram in recent.items():
+            stages[stage] = {
+                'count': histogram.count,
+                'p50': histogram.quantile(0.5),
+                'p99': histogram.quantile(0.99),
+                'max': histogram.max if histogram.count else None,
+                'within_sla': histogram.share_within(self.sla_seconds)
+            }
+        return {'window_seconds': self.window, 'sla_seconds': self.sla_seconds, 'stages': stages}
@@ -0,0 +1,210 @@
+# src/core/metrics.py
+import threading
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return 'NaN'
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(int(value))
+
+
+class MetricsWriter:
+    """Collects samples per metric family and renders the Prometheus text format"""
+
+    def __init__(self):
+        self.families: Dict[str, Tuple[str, str, List[str]]] = OrderedDict()
+
+    def _family(self, name: str, kind: str, help_text: str) -> List[str]:
+        if name not in self.families:
+            self.families[name] = (kind, help_text, [])
+        return self.families[name][2]
+
+    @staticmethod
+    def _labels(labels: Optional[Dict]) -> str:
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+    def gauge(self, name: str, help_text: str, value, labels: Dict = None):
+        self._family(name, 'gauge', help_text).append(f"{name}{self._labels(labels)} {_format_value(value)}")
+
+    def counter(self, name: str, help_text: str, value, labels: Dict = None):
+        self._family(name, 'counter', help_text).append(f"{name}{self._labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name: str, help_text: str, snapshot: Dict, labels: Dict = None):
+        """snapshot as returned by Histogram.snapshot(), with cumulative buckets"""
+        samples = self._family(name, 'histogram', help_text)
+        labels = dict(labels or {})
+        for bound, count in snapshot['buckets']:
+            bucket_labels = dict(labels, le=bound if isinstance(bound, str) else repr(float(bound)))
+            samples.append(f"{name}_bucket{self._labels(bucket_labels)} {count}")
+        samples.append(f"{name}_sum{self._labels(labels)} {_format_value(float(snapshot['sum']))}")
+        samples.append(f"{name}_count{self._labels(labels)} {snapshot['count']}")
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text, samples) in self.families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """Gathers pipeline, device and storage metrics on every scrape
+
+    Everything is read from state the services already keep in memory,
+    plus one grouped count over the attendance table, so a scrape never
+    talks to a device.
+    """
+
+    def __init__(self, db_manager, device_manager, attendance_service=None):
+        self.db = db_manager
+        self.device_manager = device_manager
+        self.attendance_service = attendance_service
+
+    def collect(self) -> str:
+        writer = MetricsWriter()
+        for section in (self._collect_pipeline, self._collect_latency, self._collect_devices,
+                        self._collect_sync, self._collect_storage):
+            try:
+                section(writer)
+            except Exception as e:
+                logger.error(f"Error collecting metrics in {section.__name__}: {e}")
+        return writer.render()
+
+    def _collect_pipeline(self, writer: MetricsWriter):
+        writer.gauge('biometric_attendance_queue_depth',
+                     'Punches captured from devices and not yet stored',
+                     self.device_manager.attendance_queue.qsize())
+
+        counts = self.db.get_attendance_counts()
+        for status in sorted(set(counts) | {'pending', 'synced'}):
+            writer.gauge('biometric_attendance_records', 'Stored attendance records by sync status',
+                         counts.get(status, {}).get('count', 0), {'status': status})
+
+        oldest = counts.get('pending', {}).get('oldest')
+        age = 0.0
+        if oldest:
+            # created_at is SQLite's CURRENT_TIMESTAMP, in UTC
+            created = datetime.strptime(oldest, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            age = max(0.0, time.time() - created.timestamp())
+        writer.gauge('biometric_attendance_oldest_pending_age_seconds',
+                     'Age of the oldest record still waiting to be synced', age)
+
+    def _collect_latency(self, writer: MetricsWriter):
+        latency = self.device_manager.latency
+        for stage, snapshot in latency.get_totals().items():
+            writer.histogram('biometric_punch_latency_seconds',
+                             'Per record latency: store is capture to database, sync is database to '
+                             'server ack, total is capture to server ack', snapshot, {'stage': stage})
+        report = latency.get_report()
+        for stage, stats in report['stages'].items():
+            writer.gauge('biometric_punch_within_sla_ratio',
+                         f"Share of records within {report['sla_seconds']}s over the last "
+                         f"{report['window_seconds']}s", stats['within_sla'], {'stage': stage})
+
+    def _collect_devices(self, writer: MetricsWriter):
+        devices = list(self.device_manager.devices.items())
+        for key, device in devices:
+            writer.gauge('biometric_device_connected', 'Whether the device session is alive',
+                         1 if device.is_connected() else 0, {'device': key})
+
+        for key, last_event in list(self.device_manager.last_event_times.items()):
+            writer.gauge('biometric_device_last_event_timestamp_seconds',
+                         'Unix time of the last live punch from the device', float(last_event), {'device': key})
+
+        for key, stats in list(self.device_manager.recovery_stats.items()):
+            writer.counter('biometric_device_recovered_punches_total',
+                           'Punches missed by live capture and read back from the device log',
+                           stats.get('recovered', 0), {'device': key})
+
+        for key, device in devices:
+            stats = device.get_protocol_stats()
+            if not stats:
+                continue
+            for command, command_stats in sorted(stats['commands'].items()):
+                labels = {'device': key, 'command': command}
+                writer.histogram('biometric_device_command_seconds',
+                                 'Round trip time of device commands', command_stats['latency'], labels)
+                writer.counter('biometric_device_command_bytes_total', 'Bytes exchanged with the device',
+                               command_stats['bytes_out'], dict(labels, direction='out'))
+                writer.counter('biometric_device_command_bytes_total', 'Bytes exchanged with the device',
+                               command_stats['bytes_in'], dict(labels, direction='in'))
+                writer.counter('biometric_device_command_timeouts_total', 'Device commands that timed out',
+                               command_stats['timeouts'], labels)
+                writer.counter('biometric_device_command_retries_total', 'Device commands sent again',
+                               command_stats['retries'], labels)
+
+    def _collect_sync(self, writer: MetricsWriter):
+        if self.attendance_service is None:
+            return
+        stats = dict(self.attendance_service.sync_stats)
+        writer.counter('biometric_sync_runs_total', 'Sync passes that had records to upload', stats['runs'])
+        for result in ('synced', 'rejected', 'errors'):
+            writer.counter('biometric_sync_records_total', 'Attendance records sent to the server by outcome',
+                           stats[result], {'result': result})
+        if stats['last_sync'] is not None:
+            writer.gauge('biometric_sync_last_run_timestamp_seconds', 'Unix time the last sync pass ended',
+                         float(stats['last_sync']))
+            writer.gauge('biometric_sync_last_duration_seconds', 'Duration of the last sync pass',
+                         float(stats['last_duration']))
+
+    def _collect_storage(self, writer: MetricsWriter):
+        writer.histogram('biometric_sqlite_write_seconds', 'Time to execute and commit a database write',
+                         self.db.get_write_latency())
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.server.exporter.collect().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics %s - %s" % (self.address_string(), format % args))
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves GET /metrics in the Prometheus text format from a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, exporter: MetricsExporter, host: str = '127.0.0.1', port: int = 9464):
+        super().__init__((host, port), MetricsHandler)
+        self.exporter = exporter
+        self.thread = None
+
+    def start(self) -> 'MetricsServer':
+        self.thread = threading.Thread(target=self.serve_forever, name="MetricsServer", daemon=True)
+        self.thread.start()
+        logger.info(f"Serving metrics on http://{self.server_address[0]}:{self.server_address[1]}/metrics")
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,217 @@
+# src/core/replication.py
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.biometric.zk_lib.finger import Finger
+from src.core.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Fields compared to decide whether a user differs between two devices
+USER_FIELDS = ('user_id', 'name', 'privilege', 'password', 'group_id', 'card')
+
+
+class FleetReplicator:
+    """Copy users and fingerprint templates from one source to many devices
+
+    The source is either a connected device or, when no source serial is
+    given, the local template store. Each target only receives the users and
+    templates that differ from the source, and targets are processed in
+    parallel with at most max_workers devices in flight.
+    """
+
+    def __init__(self, device_manager, db_manager: DatabaseManager = None,
+                 max_workers: int = 4, batch_size: int = 200):
+        self.device_manager = device_manager
+        self.db = db_manager
+        self.max_workers = max(1, int(max_workers))
+        self.batch_size = batch_size
+        self._fingers_lock = threading.Lock()
+
+    def replicate(self, source_serial: str = None, targets: List[str] = None,
+                  include_templates: bool = True) -> Dict[str, Dict]:
+        """Replicate the source onto every target and return per-device reports"""
+        snapshot = self._load_source(source_serial, include_templates)
+        if snapshot is None:
+            return {}
+
+        if targets is None:
+            targets = [sn for sn in self.device_manager.devices if sn != source_serial]
+
+        results = {}
+        started = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="Replicate") as executor:
+            futures = {sn: executor.submit(self._replicate_to, sn, snapshot) for sn in targets}
+            for serial_number, future in futures.items():
+                try:
+                    results[serial_number] = future.result()
+                except Exception as e:
+                    logger.error(f"Replication to device {serial_number} failed: {e}")
+                    results[serial_number] = self._report(serial_number, error=str(e))
+
+        failed = [sn for sn, report in results.items() if report['error']]
+        logger.info(
+            f"Replicated from {source_serial or 'local store'} to {len(targets)} devices "
+            f"in {time.time() - started:.1f}s ({len(failed)} failed)"
+        )
+        return results
+
+    def _load_source(self, source_serial: Optional[str], include_templates: bool) -> Optional[Dict]:
+        """Read the users and template hashes that every target should match"""
+        if source_serial is None:
+            if self.db is None:
+                logger.error("Replication from the local store requires a database")
+                return None
+            users = self.db.get_users()
+            hashes = self.db.get_template_hashes() if include_templates else {}
+            fingers = {}
+        else:
+            device = self.device_manager.devices.get(source_serial)
+            if device is None or not (device.is_connected() or device.connect()):
+                logger.error(f"Replication source device {source_serial} is not available")
+                return None
+            users = device.get_users()
+            if users is None:
+                logger.error(f"Can't read users from replication source device {source_serial}")
+                return None
+            fingers = {}
+            if include_templates:
+                templates = device.get_templates()
+                if templates is None:
+                    logger.error(f"Can't read templates from replication source device {source_serial}")
+                    return None
+                fingers = {finger.content_hash(): finger for finger in templates}
+            hashes = {(finger.uid, finger.fid): template_hash for template_hash, finger in fingers.items()}
+
+            # Keep the local store current with the enrolment source
+            if self.db is not None:
+                self.db.upsert_users(users)
+                self.db.upsert_templates(fingers.values())
+
+        return {
+            'users': {user['uid']: user for user in users},
+            'hashes': hashes,
+            'fingers': fingers,
+            'include_templates': include_templates
+        }
+
+    def _replicate_to(self, serial_number: str, snapshot: Dict) -> Dict:
+        """Push the users and templates a single target is missing"""
+        device = self.device_manager.devices.get(serial_number)
+        if device is None:
+            return self._report(serial_number, error="unknown device")
+
+        started = time.time()
+        if not device.is_connected() and not device.connect():
+            return self._report(serial_number, error="not connected")
+
+        current_users = device.get_users()
+        if current_users is None:
+            # without the target's users every source user would look missing
+            return self._report(serial_number, error="can't read users", seconds=time.time() - started)
+        target_users = {user['uid']: user for user in current_users}
+        # source uid -> uid of the same user_id on the target
+        uid_map = self._map_uids(snapshot['users'], current_users)
+        push_uids = {
+            uid for uid, user in snapshot['users'].items()
+            if uid_map[uid] not in target_users or self._user_key(user) != self._user_key(target_users[uid_map[uid]])
+        }
+
+        templates: Dict[int, List[Finger]] = {}
+        template_bytes = 0
+        if snapshot['include_templates'] and snapshot['hashes']:
+            target_hashes = device.get_template_hashes()
+            if target_hashes is None:
+                return self._report(serial_number, error="can't read templates", seconds=time.time() - started)
+
+            needed = [
+                template_hash for (uid, fid), template_hash in snapshot['hashes'].items()
+                if uid in snapshot['users'] and target_hashes.get((uid_map[uid], fid)) != template_hash
+            ]
+            for finger in self._get_fingers(snapshot, needed):
+                templates.setdefault(uid_map[finger.uid], []).append(finger)
+                push_uids.add(finger.uid)
+                template_bytes += finger.size
+
+        users = [dict(snapshot['users'][uid], uid=uid_map[uid]) for uid in sorted(push_uids)]
+        pushed = device.push_users(users, batch_size=self.batch_size, templates=templates)
+        seconds = time.time() - started
+
+        error = None
+        if pushed < len(users):
+            error = f"pushed {pushed} of {len(users)} users"
+
+        template_count = sum(len(templates.get(user['uid'], [])) for user in users[:pushed])
+        report = self._report(
+            serial_number,
+            users_pushed=pushed,
+            templates_pushed=template_count,
+            template_bytes=template_bytes,
+            seconds=seconds,
+            error=error
+        )
+        logger.info(
+            f"Replicated {pushed} users / {template_count} templates to device {serial_number} "
+            f"in {seconds:.1f}s ({report['users_per_sec']:.1f} users/s)"
+        )
+        return report
+
+    def _get_fingers(self, snapshot: Dict, hashes: List[str]) -> List[Finger]:
+        """Resolve template hashes to Finger objects, reading store blobs at most once"""
+        fingers = snapshot['fingers']
+        with self._fingers_lock:
+            missing = [template_hash for template_hash in hashes if template_hash not in fingers]
+            if missing and self.db is not None:
+                for row in self.db.get_templates_by_hash(missing):
+                    fingers[row['hash']] = Finger(row['uid'], row['fid'], row['valid'], row['template'])
+        return [fingers[template_hash] for template_hash in hashes if template_hash in fingers]
+
+    @staticmethod
+    def _map_uids(source_users: Dict[int, Dict], target_users: List[Dict]) -> Dict[int, int]:
+        """Map each source uid to the target uid holding the same user_id
+
+        uids are slots on each device, so a user the target doesn't have
+        keeps its source uid only if that slot is free there, otherwise it
+        gets the next free one and nobody on the target is overwritten.
+        """
+        by_user_id = {str(user['user_id']): user['uid'] for user in target_users}
+        uid_map = {}
+        for uid, user in source_users.items():
+            target_uid = by_user_id.get(str(user['user_id']))
+            if target_uid is not None:
+                uid_map[uid] = target_uid
+        taken = {user['uid'] for user in target_users} | set(uid_map.values())
+        next_uid = max(taken | set(source_users), default=0) + 1
+        for uid in sorted(source_users):
+            if uid in uid_map:
+                continue
+            if uid not in taken:
+                uid_map[uid] = uid
+            else:
+                uid_map[uid] = next_uid
+                next_uid += 1
+            taken.add(uid_map[uid])
+        return uid_map
+
+    @staticmethod
+    def _user_key(user: Dict) -> Tuple:
+        return tuple(str(user.get(field, '')) for field in USER_FIELDS)
+
+    @staticmethod
+    def _report(serial_number: str, users_pushed: int = 0, templates_pushed: int = 0,
+                template_bytes: int = 0, seconds: float = 0.0, error: str = None) -> Dict:
+        return {
+            'serial_number': serial_number,
+            'users_pushed': users_pushed,
+            'templates_pushed': templates_pushed,
+            'template_bytes': template_bytes,
+            'seconds': round(seconds, 3),
+            'users_per_sec': users_pushed / seconds if seconds else 0.0,
+            'templates_per_sec': templates_pushed / seconds if seconds else 0.0,
+            'bytes_per_sec': template_bytes / seconds if seconds else 0.0,
+            'error': error
+        }
@@ -1,19 +1,26 @@
 # src/main.py
-import time
 import sys
 import os
+
+# Add src and the project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# installed before the imports below, so --profile-startup times all of them
+from src.utils.startup_profile import StartupProfiler
+startup_profiler = StartupProfiler()
+if '--profile-startup' in sys.argv[1:]:
+    startup_profiler.install()
+
+import time
 import logging
 import argparse
 from pathlib import Path
 
-# Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
-
-from core.database import DatabaseManager
-from core.device_manager import DeviceManager
-from core.attendance_service import AttendanceService
-from utils.logger import setup_logging
-from utils.windows_utils import WindowsStartupManager
+# the services are imported in main(), once the command line is known,
+# so service commands and --profile-startup don't pay for them up front
+from src.utils.logger import setup_logging, stop_logging
+from src.utils.config_manager import ConfigManager
 
 APP_NAME = "Advanced Biometric Application"
 APP_VERSION = "2.0"
@@ -58,17 +65,39 @@ def main():
     parser.add_argument('--enable-autostart', action='store_true', help='Enable auto-start with Windows')
     parser.add_argument('--disable-autostart', action='store_true', help='Disable auto-start with Windows')
     parser.add_argument('--config', help='Path to configuration file')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on this port')
+    parser.add_argument('--metrics-host', default='127.0.0.1', help='Address for the metrics endpoint')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Log import and init time per module once all services are started')
     args = parser.parse_args()
 
     # Setup logging
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    setup_logging(log_dir / "app.log")
+    logging_config = {}
+    if args.config:
+        config_path = Path(args.config)
+        logging_config = ConfigManager(config_path.parent).load_config(config_path.name).get('logging', {})
+    with startup_profiler.stage('setup_logging'):
+        setup_logging(
+            logging_config.get('file', log_dir / "app.log"),
+            level=str(logging_config.get('level', 'INFO')),
+            max_bytes=int(float(logging_config.get('max_size_mb', 10)) * 1024 * 1024),
+            backup_count=int(logging_config.get('backup_count', 5)),
+            compress=str(logging_config.get('compress', False)).lower() in ('1', 'true', 'yes'),
+            json_format=str(logging_config.get('format', 'text')).lower() == 'json',
+            rate_limit_burst=int(logging_config.get('rate_limit_burst', 5)),
+            rate_limit_per_minute=float(logging_config.get('rate_limit_per_minute', 6)),
+            summary_interval=float(logging_config.get('summary_interval', 60))
+        )
 
     logger = logging.getLogger(__name__)
     logger.info(f"Starting {APP_NAME} v{APP_VERSION}")
 
     # Handle service commands
+    if args.install_service or args.uninstall_service or args.enable_autostart or args.disable_autostart:
+        from src.utils.windows_utils import WindowsStartupManager
+
     if args.install_service:
         app_path = sys.executable if getattr(sys, 'frozen', False) else __file__
         success = WindowsStartupManager.install_windows_service(
@@ -90,24 +119,45 @@ def main():
         success = WindowsStartupManager.disable_auto_start("SmartAcademyBiometric")
         sys.exit(0 if success else 1)
 
+    from src.core.database import DatabaseManager
+    from src.core.device_manager import DeviceManager
+    from src.core.attendance_service import AttendanceService
+
     # Initialize database
-    db_manager = DatabaseManager()
+    with startup_profiler.stage('DatabaseManager'):
+        db_manager = DatabaseManager()
 
     # Initialize services
-    device_manager = DeviceManager(db_manager)
-    attendance_service = AttendanceService(db_manager, device_manager)
+    with startup_profiler.stage('DeviceManager'):
+        device_manager = DeviceManager(db_manager)
+    with startup_profiler.stage('AttendanceService'):
+        attendance_service = AttendanceService(db_manager, device_manager)
+    metrics_server = None
 
     try:
         # Initialize devices
-        device_manager.initialize_devices()
+        with startup_profiler.stage('initialize_devices'):
+            device_manager.initialize_devices()
 
         # Start live capture
-        device_manager.start_live_capture()
+        with startup_profiler.stage('start_live_capture'):
+            device_manager.start_live_capture()
 
         # Start attendance service
-        attendance_service.start()
+        with startup_profiler.stage('attendance_service.start'):
+            attendance_service.start()
+
+        if args.metrics_port is not None:
+            with startup_profiler.stage('metrics_server'):
+                from src.core.metrics import MetricsExporter, MetricsServer
+                exporter = MetricsExporter(db_manager, device_manager, attendance_service)
+                metrics_server = MetricsServer(exporter, args.metrics_host, args.metrics_port).start()
 
         logger.info("All services started successfully")
+        if args.profile_startup:
+            startup_profiler.uninstall()
+            for line in startup_profiler.report():
+                logger.info(line)
 
         # Keep the main thread alive
         import time
@@ -120,10 +170,13 @@ def main():
         logger.error(f"Application error: {e}", exc_info=True)
     finally:
         # Cleanup
+        if metrics_server:
+            metrics_server.stop()
         device_manager.stop_live_capture()
         device_manager.disconnect_all()
         attendance_service.stop()
         logger.info("Application shutdown complete")
+        stop_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
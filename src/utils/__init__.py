@@ -1,6 +1,12 @@
 # src/utils/__init__.py
-from .logger import setup_logging
-from .config_manager import ConfigManager
-from .windows_utils import WindowsStartupManager
+from .lazy import lazy_exports
 
-__all__ = ['setup_logging', 'ConfigManager', 'WindowsStartupManager']
\ No newline at end of file
+__all__ = ['setup_logging', 'stop_logging', 'ConfigManager', 'WindowsStartupManager']
+
+# imported on first access; windows_utils pulls in winreg
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'setup_logging': '.logger',
+    'stop_logging': '.logger',
+    'ConfigManager': '.config_manager',
+    'WindowsStartupManager': '.windows_utils',
+})
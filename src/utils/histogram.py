@@ -0,0 +1,111 @@
+# src/utils/histogram.py
+import time
+from bisect import bisect_left
+from collections import deque
+
+# upper bounds (seconds) of the latency histogram buckets, the last one catches the rest
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram(object):
+    """
+    fixed bucket histogram; not locked, the owner serializes access
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        add the observations of a histogram with the same bounds
+        """
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def share_within(self, limit):
+        """
+        :return: share of observations in buckets bounded by limit or less
+        """
+        if not self.count:
+            return None
+        within = sum(count for bound, count in zip(self.bounds, self.counts) if bound <= limit)
+        return within / self.count
+
+    def quantile(self, q):
+        """
+        :return: upper bound of the bucket holding the q quantile (max for the last one)
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            # cumulative, as Prometheus exposes them
+            'buckets': [[bound, sum(self.counts[:i + 1])] for i, bound in enumerate(self.bounds)] +
+                       [['+Inf', self.count]]
+        }
+
+
+class RollingHistogram(object):
+    """
+    histogram of the last window seconds, kept as slots of window / slots
+    seconds that are dropped as they age out; not locked either
+    """
+
+    def __init__(self, window=300.0, slots=10, bounds=LATENCY_BUCKETS, clock=time.monotonic):
+        self.window = window
+        self.slot_count = slots
+        self.slot_seconds = window / slots
+        self.bounds = tuple(bounds)
+        self.clock = clock
+        self.slots = deque()
+
+    def __expire(self, index):
+        while self.slots and self.slots[0][0] <= index - self.slot_count:
+            self.slots.popleft()
+
+    def observe(self, value):
+        index = int(self.clock() // self.slot_seconds)
+        if not self.slots or self.slots[-1][0] != index:
+            self.__expire(index)
+            self.slots.append((index, Histogram(self.bounds)))
+        self.slots[-1][1].observe(value)
+
+    def merged(self):
+        """
+        :return: a Histogram of everything observed within the window
+        """
+        self.__expire(int(self.clock() // self.slot_seconds))
+        histogram = Histogram(self.bounds)
+        for _index, slot in self.slots:
+            histogram.merge(slot)
+        return histogram
+
+    def snapshot(self):
+        return self.merged().snapshot()
@@ -0,0 +1,32 @@
+# src/utils/lazy.py
+import importlib
+import sys
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+def lazy_exports(package: str, mapping: Dict[str, Union[str, Tuple[str, Optional[str]]]]
+                 ) -> Tuple[Callable[[str], object], Callable[[], List[str]]]:
+    """Module __getattr__ and __dir__ that import a package's exports on first access
+
+    mapping is name -> module for the attribute of the same name in that
+    module, or name -> (module, attribute) with attribute None for the
+    module itself. Relative module names resolve against package. Values
+    are cached in the package, so each is imported once:
+
+        __getattr__, __dir__ = lazy_exports(__name__, {'ZKDevice': '.zk_device'})
+    """
+    def __getattr__(name):
+        if name not in mapping:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        target = mapping[name]
+        module_name, attribute = (target, name) if isinstance(target, str) else target
+        value = importlib.import_module(module_name, package)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(mapping))
+
+    return __getattr__, __dir__
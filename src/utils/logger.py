@@ -1,12 +1,294 @@
 # src/utils/logger.py - Updated version
+import atexit
+import copy
+import gzip
+import json
 import logging
 import os
+import shutil
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import Full, Queue
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# formats tracebacks before records are queued
+_exception_formatter = logging.Formatter()
+
+# the pipeline installed by setup_logging, replaced on the next call
+_queue_handler = None
+_listener = None
+_rate_limiter = None
+_atexit_registered = False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue that never blocks the caller for long
+
+    When the queue is full, records below WARNING are dropped without
+    being formatted; warnings and errors wait up to block_timeout for room
+    before they are dropped too. The drop count is logged as a warning as
+    soon as the queue has room again.
+    """
+
+    def __init__(self, queue: Queue, block_timeout: float = 0.05):
+        super().__init__(queue)
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.dropped_total = 0
+        self._drop_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        if record.levelno < logging.WARNING and self.queue.full():
+            self._count_drop()
+            return
+        super().emit(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the args into the message but keep the traceback in exc_text
+
+        QueueHandler.prepare folds the traceback into the message, which
+        would leave the JSON formatter nothing to put in its exception field.
+        """
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            if record.levelno < logging.WARNING:
+                self._count_drop()
+                return
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+            except Full:
+                self._count_drop()
+                return
+        if self.dropped:
+            self._report_drops()
+
+    def _count_drop(self):
+        with self._drop_lock:
+            self.dropped += 1
+            self.dropped_total += 1
+
+    def _report_drops(self):
+        with self._drop_lock:
+            dropped, self.dropped = self.dropped, 0
+        if not dropped:
+            return
+        notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                   f"Dropped {dropped} log records, the log queue was full", None, None)
+        try:
+            self.queue.put_nowait(notice)
+        except Full:
+            with self._drop_lock:
+                self.dropped += dropped
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per key for warnings and errors, with periodic summaries
+
+    The key is the rate_key passed in extra= when there is one, otherwise
+    the call site and the formatted message, so one line logging for many
+    devices limits each device on its own. Statements in a per-record
+    loop pass a rate_key to be limited as a unit. Each key may
+    log burst records at once and per_minute after that. The rest are
+    counted and reported every summary_interval seconds as one "N similar
+    messages suppressed" record per key.
+    """
+
+    def __init__(self, burst: int = 5, per_minute: float = 6.0, summary_interval: float = 60.0,
+                 level: int = logging.WARNING, clock=time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.summary_interval = summary_interval
+        self.level = level
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buckets = {}       # key -> [tokens, last refill]
+        self.suppressed = {}    # key -> [count, last suppressed record]
+        self.target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def key(record: logging.LogRecord):
+        return getattr(record, 'rate_key', None) or (record.name, record.levelno, record.pathname, record.lineno,
+                                                     record.getMessage())
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.level or getattr(record, 'suppressed', None) is not None:
+            return True
+        key = self.key(record)
+        now = self.clock()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [float(self.burst), now]
+            else:
+                bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            entry = self.suppressed.get(key)
+            if entry is None:
+                self.suppressed[key] = [1, record]
+            else:
+                entry[0] += 1
+                entry[1] = record
+        return False
+
+    def summaries(self):
+        """Take what was suppressed since the last call, one record per key"""
+        now = self.clock()
+        with self.lock:
+            suppressed, self.suppressed = self.suppressed, {}
+            # forget keys that have been quiet long enough to refill
+            for key, (tokens, updated) in list(self.buckets.items()):
+                if key not in suppressed and tokens + (now - updated) * self.rate >= self.burst:
+                    del self.buckets[key]
+        records = []
+        for count, last in suppressed.values():
+            record = logging.LogRecord(last.name, last.levelno, last.pathname, last.lineno,
+                                       "%d similar messages suppressed, the last one: %s",
+                                       (count, last.getMessage()), None)
+            record.suppressed = count
+            if getattr(last, 'rate_key', None):
+                record.rate_key = last.rate_key
+            records.append(record)
+        return records
+
+    def flush(self):
+        if self.target is not None:
+            for record in self.summaries():
+                self.target.handle(record)
+
+    def start(self, target: logging.Handler):
+        """Report suppressed counts to target every summary_interval seconds"""
+        self.target = target
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LogSummary", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.summary_interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    # set through extra= or by RateLimitFilter
+    EXTRA_FIELDS = ('rate_key', 'suppressed')
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # the queue may be full, wait for the writer to make room
+        self.queue.put(self._sentinel)
+
+
+class GzipRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler whose backups are gzipped (app.log.1.gz, ...)
+
+    The full file is renamed aside at rollover and compressed on a
+    background thread, so writing resumes right away. A rollover waits
+    for the previous compression before shifting the backups.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self._rotate
+        self._compressor = None
+
+    def doRollover(self):
+        self.wait_for_compression()
+        super().doRollover()
+
+    def _rotate(self, source: str, dest: str):
+        if not os.path.exists(source):
+            return
+        pending = dest[:-len('.gz')] + '.pending'
+        os.replace(source, pending)
+        self._compressor = threading.Thread(target=self._compress, args=(pending, dest),
+                                            name="LogCompressor", daemon=True)
+        self._compressor.start()
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        try:
+            with open(source, 'rb') as f_in, gzip.open(dest + '.tmp', 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.replace(dest + '.tmp', dest)
+            os.remove(source)
+        except OSError:
+            # the uncompressed .pending file is kept
+            pass
+
+    def wait_for_compression(self):
+        compressor = self._compressor
+        if compressor is not None:
+            compressor.join()
+            self._compressor = None
+
+    def close(self):
+        super().close()
+        self.wait_for_compression()
+
 
 def setup_logging(log_file: str = "logs/app.log", level: str = "INFO",
-                 max_bytes: int = 10*1024*1024, backup_count: int = 5):
-    """Setup application logging with configurable parameters"""
+                 max_bytes: int = 10*1024*1024, backup_count: int = 5,
+                 compress: bool = False, queue_size: int = 10000, json_format: bool = False,
+                 rate_limit_burst: int = 5, rate_limit_per_minute: float = 6.0,
+                 summary_interval: float = 60.0):
+    """Setup application logging with configurable parameters
+
+    Loggers only put records on a bounded queue; a background listener
+    does the file and console I/O, rotation and (with compress) gzipping
+    of rotated files. See DroppingQueueHandler for the overload policy and
+    RateLimitFilter for how repeated warnings and errors are condensed
+    (rate_limit_burst=0 turns that off). json_format writes the log file
+    as JSON lines; the console stays plain text.
+    """
+    global _queue_handler, _listener, _rate_limiter, _atexit_registered
 
     # Create logs directory if it doesn't exist
     log_path = Path(log_file)
@@ -15,22 +297,57 @@ def setup_logging(log_file: str = "logs/app.log", level: str = "INFO",
     # Get log level
     log_level = getattr(logging, level.upper(), logging.INFO)
 
+    handler_class = GzipRotatingFileHandler if compress else RotatingFileHandler
+    handlers = [
+        handler_class(
+            log_file,
+            maxBytes=max_bytes,
+            backupCount=backup_count
+        ),
+        logging.StreamHandler()  # Also log to console
+    ]
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    if json_format:
+        handlers[0].setFormatter(JsonFormatter())
+
     # Configure root logger
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            RotatingFileHandler(
-                log_file,
-                maxBytes=max_bytes,
-                backupCount=backup_count
-            ),
-            logging.StreamHandler()  # Also log to console
-        ]
-    )
+    stop_logging()
+    log_queue = Queue(maxsize=queue_size)
+    _queue_handler = DroppingQueueHandler(log_queue)
+    if rate_limit_burst > 0:
+        _rate_limiter = RateLimitFilter(rate_limit_burst, rate_limit_per_minute, summary_interval)
+        _queue_handler.addFilter(_rate_limiter)
+        _rate_limiter.start(_queue_handler)
+    _listener = _Listener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    root = logging.getLogger()
+    root.setLevel(log_level)
+    root.addHandler(_queue_handler)
+    if not _atexit_registered:
+        atexit.register(stop_logging)
+        _atexit_registered = True
 
     # Set specific levels for noisy modules
     logging.getLogger('urllib3').setLevel(logging.WARNING)
     logging.getLogger('requests').setLevel(logging.WARNING)
 
-    return logging.getLogger(__name__)
\ No newline at end of file
+    return logging.getLogger(__name__)
+
+
+def stop_logging():
+    """Write out everything still queued and close the log files"""
+    global _queue_handler, _listener, _rate_limiter
+    if _rate_limiter is not None:
+        # report what is still held back before the queue is closed
+        _rate_limiter.stop()
+        _rate_limiter = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
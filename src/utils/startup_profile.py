@@ -0,0 +1,116 @@
+# src/utils/startup_profile.py
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Tuple
+
+
+class _TimedLoader:
+    """Stands in for a module loader and times exec_module, everything else is passed through"""
+
+    def __init__(self, loader, profiler: 'StartupProfiler', name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._exec_module(self._name, self._loader, module)
+
+
+class _TimingFinder:
+    """Meta path finder that asks the finders after it and wraps the loader they return"""
+
+    def __init__(self, profiler: 'StartupProfiler'):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in list(sys.meta_path):
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self.profiler, fullname)
+        return spec
+
+    def invalidate_caches(self):
+        pass
+
+
+class StartupProfiler:
+    """Import time per module and time per init stage, for --profile-startup
+
+    install() hooks the import system, so only modules imported after it
+    are seen. Every import is timed including the imports it triggers
+    (total) and without them (self). stage() times a block of startup
+    work. Nothing is hooked unless install() is called.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: List[Tuple[str, float, float]] = []   # name, total, self
+        self.import_seconds = 0.0
+        self.stages: List[Tuple[str, float]] = []
+        self._finder = None
+        self._local = threading.local()
+
+    def install(self) -> 'StartupProfiler':
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def uninstall(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def _exec_module(self, name: str, loader, module):
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)   # time spent in the imports this one triggers
+        started = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            else:
+                self.import_seconds += elapsed
+            self.imports.append((name, elapsed, elapsed - nested))
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    def report(self, top: int = 25) -> List[str]:
+        """Summary lines: the slowest imports, then every stage in order"""
+        total = time.perf_counter() - self.started
+        lines = [f"Startup took {total * 1000:.1f} ms: {len(self.imports)} modules imported in "
+                 f"{self.import_seconds * 1000:.1f} ms, init stages "
+                 f"{sum(seconds for _name, seconds in self.stages) * 1000:.1f} ms"]
+        if self.imports:
+            lines.append("Slowest imports (total ms, self ms):")
+            for name, elapsed, own in sorted(self.imports, key=lambda entry: entry[1], reverse=True)[:top]:
+                lines.append(f"  {elapsed * 1000:8.1f} {own * 1000:8.1f}  {name}")
+        if self.stages:
+            lines.append("Init stages (ms):")
+            for name, seconds in self.stages:
+                lines.append(f"  {seconds * 1000:8.1f}  {name}")
+        return lines
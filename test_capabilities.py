@@ -0,0 +1,85 @@
+# test_capabilities.py
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedFleet
+from src.biometric.zk_device import ZKDevice
+from src.biometric.zk_lib.base import ZK
+from src.core.database import DatabaseManager
+from src.core.device_manager import DeviceManager
+
+
+def _start(db, fleet, probed):
+    """Connect the fleet through a fresh DeviceManager, recording what it probes"""
+    probe = ZKDevice.probe
+
+    def recording_probe(addresses, timeout=5.0):
+        probed.extend(addresses)
+        return probe(addresses, timeout)
+
+    ZKDevice.probe = staticmethod(recording_probe)
+    try:
+        for simulated in fleet.devices:
+            ZK._protocols.pop(simulated.address, None)
+        device_manager = DeviceManager(db, {'devices': fleet.devices_config()})
+        device_manager.initialize_devices()
+    finally:
+        ZKDevice.probe = staticmethod(probe)
+    return device_manager
+
+
+def test_profiles_are_learned_saved_and_reused():
+    with tempfile.TemporaryDirectory() as workdir, \
+            SimulatedFleet(2, users=20, records=100, record_size=16, user_packet_size=28,
+                           tcp=False, seed=19) as fleet:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        serials = [device_info['serial_number'] for device_info in fleet.devices_config()]
+
+        probed = []
+        device_manager = _start(db, fleet, probed)
+        try:
+            assert sorted(device_manager.devices) == serials
+            assert len(probed) == 2
+            for device in device_manager.devices.values():
+                records, count = device.get_new_attendance(0)
+                assert len(records) == count == 100
+                # the firmware version comes with the device info
+                assert device.get_device_info()['firmware_version'] == 'Ver 6.60 Apr 28 2020'
+        finally:
+            device_manager.disconnect_all()
+        for serial_number in serials:
+            profile = db.get_device_capabilities(serial_number)
+            assert profile['protocol'] == 'udp' and profile['user_packet_size'] == 28
+            assert profile['attendance_record_size'] == 16
+            assert profile['firmware_version'] == 'Ver 6.60 Apr 28 2020'
+
+        # a known device is connected without a probe and reads with the stored sizes
+        fleet.devices[1].firmware_version = 'Ver 6.70 Jan 05 2024'
+        probed = []
+        device_manager = _start(db, fleet, probed)
+        try:
+            assert probed == [] and sorted(device_manager.devices) == serials
+            for simulated in fleet.devices:
+                simulated.punch()
+            for device in device_manager.devices.values():
+                assert not device.zk_client.tcp
+                records, count = device.get_new_attendance(100)
+                assert count == 101 and len(records) == 1
+        finally:
+            device_manager.disconnect_all()
+        # the device with new firmware was rediscovered and its profile replaced
+        assert db.get_device_capabilities(serials[0])['firmware_version'] == 'Ver 6.60 Apr 28 2020'
+        profile = db.get_device_capabilities(serials[1])
+        assert profile['firmware_version'] == 'Ver 6.70 Jan 05 2024'
+        assert profile['attendance_record_size'] == 16 and profile['protocol'] == 'udp'
+
+
+if __name__ == "__main__":
+    test_profiles_are_learned_saved_and_reused()
+    print("✅ Device profiles learned, saved and reused")
@@ -0,0 +1,50 @@
+# test_database.py
+import sys
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.core.database import DatabaseManager
+
+
+def test_punch_key_migration_keeps_duplicates():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'att.db')
+        # an attendance table from before the punch key, holding a re-read punch
+        conn = sqlite3.connect(path)
+        conn.execute("""CREATE TABLE attendance (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                            punch_time TIMESTAMP NOT NULL, device_ip TEXT, device_sn TEXT,
+                            status TEXT DEFAULT 'pending', sync_time TIMESTAMP,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)""")
+        rows = [(1, '2024-05-01 08:00:00', 'SN1', 'synced'),
+                (1, '2024-05-01 08:00:00', 'SN1', 'pending'),
+                (2, '2024-05-01 08:01:00', 'SN1', 'pending'),
+                (1, '2024-05-01 08:00:00', 'SN2', 'pending')]
+        conn.executemany("INSERT INTO attendance (user_id, punch_time, device_sn, status) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+
+        db = DatabaseManager(path)
+        conn = sqlite3.connect(path)
+        kept = conn.execute("SELECT id, status FROM attendance ORDER BY id").fetchall()
+        moved = conn.execute("SELECT id, user_id, punch_time, device_sn, status FROM attendance_duplicates").fetchall()
+        conn.close()
+        assert kept == [(1, 'synced'), (3, 'pending'), (4, 'pending')]
+        assert moved == [(2, 1, '2024-05-01 08:00:00', 'SN1', 'pending')]
+
+        # new copies of a stored punch are ignored, and a restart moves nothing more
+        assert not db.insert_attendance(1, '2024-05-01 08:00:00', None, 'SN1')
+        assert len(db.execute_query("SELECT id FROM attendance").fetchall()) == 3
+        DatabaseManager(path)
+        assert len(db.execute_query("SELECT id FROM attendance_duplicates").fetchall()) == 1
+
+
+if __name__ == "__main__":
+    test_punch_key_migration_keeps_duplicates()
+    print("✅ Punch key migration keeps duplicates")
@@ -0,0 +1,77 @@
+# test_device_actor.py
+import sys
+import os
+import time
+import threading
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_device import ZKDevice
+from src.biometric.device_actor import PRIORITY_BULK
+
+
+def test_stop_waits_for_the_command_in_flight():
+    with SimulatedDevice(users=50, records=0, seed=12) as simulated:
+        device = ZKDevice(simulated.host, simulated.port, serial_number='SIM1', timeout=5)
+        assert device.connect()
+        started = threading.Event()
+
+        def slow_read():
+            started.set()
+            time.sleep(0.5)
+            return device.zk_client.get_users()
+
+        actor = device.actor
+        future = actor.submit(slow_read, priority=PRIORITY_BULK)
+        assert started.wait(5)
+        actor.stop(timeout=0.05)
+        # the read finished on an open socket before stop returned
+        assert not actor.is_alive()
+        assert len(future.result(timeout=0)) == 50
+        device.disconnect()
+        assert device.zk_client is None
+
+
+def test_a_hung_command_blocks_neither_the_lock_nor_disconnect_forever():
+    with SimulatedDevice(users=5, records=0, seed=27) as simulated:
+        device = ZKDevice(simulated.host, simulated.port, serial_number='SIM1', timeout=5)
+        assert device.connect()
+        started = threading.Event()
+        release = threading.Event()
+
+        def hung_transfer():
+            started.set()
+            release.wait(5)
+
+        actor = device.actor
+        actor.submit(hung_transfer, priority=PRIORITY_BULK)
+        assert started.wait(5)
+        disconnecting = threading.Thread(target=device.disconnect)
+        disconnecting.start()
+        try:
+            # status polls and reconnects can take the lock while disconnect waits
+            time.sleep(0.2)
+            assert disconnecting.is_alive()
+            assert device.lock.acquire(timeout=0.5)
+            device.lock.release()
+            assert not device.is_connected()
+
+            # and the wait itself is bounded
+            begun = time.time()
+            assert actor.stop(timeout=0.05, deadline=0.3) is False
+            assert time.time() - begun < 1.0
+        finally:
+            release.set()
+            disconnecting.join(5)
+        assert not disconnecting.is_alive() and device.zk_client is None
+
+
+if __name__ == "__main__":
+    test_stop_waits_for_the_command_in_flight()
+    print("✅ Actor stop waits for the command in flight")
+    test_a_hung_command_blocks_neither_the_lock_nor_disconnect_forever()
+    print("✅ A hung command blocks neither the lock nor disconnect forever")
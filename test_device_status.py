@@ -0,0 +1,55 @@
+# test_device_status.py
+import sys
+import os
+import time
+import tempfile
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedFleet
+from src.core.database import DatabaseManager
+from src.core.device_manager import DeviceManager
+
+
+def test_slow_device_is_served_from_cache_within_the_deadline():
+    with tempfile.TemporaryDirectory() as workdir, SimulatedFleet(2, users=5, records=0, seed=24) as fleet:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        devices_config = [dict(device_info, sync_time=False, metadata_ttl=2.0) for device_info in fleet.devices_config()]
+        device_manager = DeviceManager(db, {'devices': devices_config})
+        device_manager.initialize_devices()
+        fast, slow = fleet.devices
+        fast_serial, slow_serial = [device_info['serial_number'] for device_info in devices_config]
+        try:
+            statuses = {status['serial_number']: status for status in device_manager.get_all_devices_status(deadline=5)}
+            assert sorted(statuses) == [fast_serial, slow_serial]
+            assert not any(status.get('timed_out') for status in statuses.values())
+            assert statuses[slow_serial]['info']['platform'] == 'ZMM220_TFT'
+
+            # within the TTL only the device time is read
+            commands = fast.stats['commands']
+            slow.latency = 1.5
+            started = time.time()
+            statuses = {status['serial_number']: status for status in device_manager.get_all_devices_status(deadline=0.8)}
+            assert time.time() - started < 1.2
+            assert fast.stats['commands'] - commands == 1
+            assert not statuses[fast_serial].get('timed_out')
+            assert statuses[slow_serial]['timed_out'] and statuses[slow_serial]['info']['platform'] == 'ZMM220_TFT'
+            assert statuses[slow_serial]['info']['device_time'] == 'Unknown'
+
+            # once it expires the metadata is read again
+            slow.latency = 0.0
+            time.sleep(2.0)
+            commands = fast.stats['commands']
+            device_manager.get_all_devices_status(deadline=5)
+            assert fast.stats['commands'] - commands > 1
+        finally:
+            slow.latency = 0.0
+            device_manager.disconnect_all()
+
+
+if __name__ == "__main__":
+    test_slow_device_is_served_from_cache_within_the_deadline()
+    print("✅ Slow device served from cache within the deadline")
@@ -0,0 +1,80 @@
+# test_heartbeat.py
+import sys
+import os
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_device import ZKDevice
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.exception import ZKNetworkError
+
+
+def test_quiet_capture_heartbeats_and_a_silent_peer_ends_it():
+    with SimulatedDevice(users=5, records=0, seed=20) as device:
+        ZK._protocols.pop(device.address, None)
+        zk = ZK(device.host, port=device.port, timeout=5, ommit_ping=True,
+                heartbeat_interval=0.3, dead_peer_timeout=1.5)
+        zk.connect()
+        started = time.time()
+        commands = None
+        try:
+            for attendance in zk.live_capture(new_timeout=0.1):
+                assert attendance is None
+                if commands is None:
+                    # registered, from here on only heartbeats are sent
+                    commands = device.stats['commands']
+                if time.time() - started > 1.5 and device.loss == 0:
+                    # nothing answers from now on, heartbeats included
+                    heartbeats = device.stats['commands'] - commands
+                    device.loss = 1.0
+                    silent_since = time.time()
+                assert time.time() - started < 10, "capture outlived the dead peer timeout"
+        except ZKNetworkError:
+            pass
+        else:
+            assert False, "capture ended without an error"
+        finally:
+            device.loss = 0.0
+            zk.disconnect()
+        # a quiet but healthy session stays up and re-registers as its heartbeat
+        assert heartbeats >= 4
+        assert 1.0 < time.time() - silent_since < 4.0
+        assert not zk.is_connect
+
+
+def test_zk_device_notices_a_dead_capture_session():
+    with SimulatedDevice(users=5, records=0, seed=21) as simulated:
+        device = ZKDevice(simulated.host, simulated.port, serial_number='SIM1', timeout=5,
+                          heartbeat_interval=0.3, dead_peer_timeout=1.0)
+        assert device.connect()
+        started = time.time()
+
+        def go_silent():
+            simulated.loss = 1.0
+
+        try:
+            try:
+                for _attendance in device.live_capture(on_started=go_silent):
+                    assert time.time() - started < 10
+            except ZKNetworkError:
+                pass
+            assert time.time() - started < 5
+            assert not device.is_connected()
+        finally:
+            simulated.loss = 0.0
+            device.disconnect()
+        # the next connect starts a fresh session
+        assert device.connect()
+        device.disconnect()
+
+
+if __name__ == "__main__":
+    test_quiet_capture_heartbeats_and_a_silent_peer_ends_it()
+    print("✅ Quiet capture heartbeats and a silent peer ends it")
+    test_zk_device_notices_a_dead_capture_session()
+    print("✅ ZKDevice notices a dead capture session")
@@ -0,0 +1,151 @@
+# test_latency.py
+import sys
+import os
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.utils.histogram import RollingHistogram
+from src.core.database import DatabaseManager
+from src.core.device_manager import DeviceManager
+from src.core.attendance_service import AttendanceService
+
+
+class AcceptAll(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_records_are_stamped_through_every_stage():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AcceptAll)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as workdir, SimulatedDevice(users=5, records=0, seed=10) as simulated:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        db.set_config_value('site_url', f"http://127.0.0.1:{server.server_address[1]}/")
+        config = {'devices': [{'ip': simulated.host, 'port': simulated.port, 'serial_number': 'SIM1',
+                               'sync_time': False, 'use_actor': False}]}
+        device_manager = DeviceManager(db, config)
+        service = AttendanceService(db, device_manager, config)
+        device_manager.initialize_devices()
+        try:
+            device = device_manager.devices['SIM1']
+            for user_id in ('1', '2', '3'):
+                device_manager._queue_attendance(
+                    device, {'user_id': user_id, 'timestamp': datetime(2024, 5, 1, 8, int(user_id)), 'status': 1, 'punch': 0})
+            device_manager.process_attendance_queue()
+            service.sync_attendance()
+        finally:
+            device_manager.disconnect_all()
+            server.shutdown()
+
+        cursor = db.execute_query("SELECT captured_at_ms, stored_at_ms, synced_at_ms, status FROM attendance")
+        rows = cursor.fetchall()
+        assert len(rows) == 3
+        for captured, stored, synced, status in rows:
+            assert status == 'synced'
+            assert captured <= stored <= synced
+
+        report = device_manager.get_latency_report()
+        for stage in ('store', 'sync', 'total'):
+            assert report['stages'][stage]['count'] == 3
+            assert report['stages'][stage]['within_sla'] == 1.0
+        assert device_manager.latency.get_totals()['total']['count'] == 3
+
+
+def test_backfilled_records_are_left_out_of_capture_latency():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AcceptAll)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as workdir, SimulatedDevice(users=5, records=10, seed=11) as simulated:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        db.set_config_value('site_url', f"http://127.0.0.1:{server.server_address[1]}/")
+        config = {'devices': [{'ip': simulated.host, 'port': simulated.port, 'serial_number': 'SIM1',
+                               'sync_time': False, 'use_actor': False}]}
+        device_manager = DeviceManager(db, config)
+        service = AttendanceService(db, device_manager, config)
+        device_manager.initialize_devices()
+        try:
+            device = device_manager.devices['SIM1']
+            device_manager._backfill(device)
+            # punches logged while nothing was capturing, e.g. an hour ago
+            for minute in (1, 2):
+                simulated.punch(timestamp=datetime(2024, 5, 1, 7, minute))
+            device_manager._backfill(device)
+            service.sync_attendance()
+        finally:
+            device_manager.disconnect_all()
+            server.shutdown()
+
+        rows = db.execute_query("SELECT captured_at_ms, stored_at_ms, status FROM attendance").fetchall()
+        assert len(rows) == 2
+        assert all(captured is None and stored and status == 'synced' for captured, stored, status in rows)
+        assert device_manager.get_recovery_stats()['SIM1']['recovered'] == 2
+
+        stages = device_manager.get_latency_report()['stages']
+        assert stages['store']['count'] == 0 and stages['total']['count'] == 0
+        assert stages['sync']['count'] == 2
+
+
+def test_backfill_stores_queued_live_punches_first():
+    with tempfile.TemporaryDirectory() as workdir, SimulatedDevice(users=5, records=10, seed=23) as simulated:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        config = {'devices': [{'ip': simulated.host, 'port': simulated.port, 'serial_number': 'SIM1',
+                               'sync_time': False, 'use_actor': False}]}
+        device_manager = DeviceManager(db, config)
+        device_manager.initialize_devices()
+        try:
+            device = device_manager.devices['SIM1']
+            device_manager._backfill(device)
+            # captured live before the session died, still waiting for the next flush
+            uid, user_id, status, punch, timestamp = simulated.punch(timestamp=datetime(2024, 5, 1, 8, 0))
+            device_manager._queue_attendance(
+                device, {'user_id': user_id, 'timestamp': timestamp, 'status': status, 'punch': punch})
+            # logged while nothing was capturing
+            simulated.punch(timestamp=datetime(2024, 5, 1, 8, 5))
+            device_manager._backfill(device)
+        finally:
+            device_manager.disconnect_all()
+
+        assert device_manager.attendance_queue.empty()
+        assert device_manager.get_recovery_stats()['SIM1']['recovered'] == 1
+        rows = db.execute_query("SELECT punch_time, captured_at_ms FROM attendance ORDER BY punch_time").fetchall()
+        assert [(punch_time, captured is not None) for punch_time, captured in rows] == [
+            ('2024-05-01T08:00:00', True), ('2024-05-01T08:05:00', False)]
+        assert device_manager.get_latency_report()['stages']['store']['count'] == 1
+
+
+def test_rolling_histogram_forgets_old_slots():
+    now = [1000.0]
+    histogram = RollingHistogram(window=60, slots=6, clock=lambda: now[0])
+    histogram.observe(0.5)
+    now[0] += 30
+    histogram.observe(2.0)
+    assert histogram.merged().count == 2
+    now[0] += 40
+    # the first observation is now more than a window old
+    merged = histogram.merged()
+    assert merged.count == 1 and merged.max == 2.0
+    now[0] += 60
+    assert histogram.merged().count == 0
+
+
+if __name__ == "__main__":
+    test_records_are_stamped_through_every_stage()
+    print("✅ Records stamped through every stage")
+    test_backfilled_records_are_left_out_of_capture_latency()
+    print("✅ Backfilled records left out of capture latency")
+    test_backfill_stores_queued_live_punches_first()
+    print("✅ Backfill stores queued live punches first")
+    test_rolling_histogram_forgets_old_slots()
+    print("✅ Rolling histogram forgets old slots")
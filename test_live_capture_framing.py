@@ -0,0 +1,215 @@
+# test_live_capture_framing.py
+import sys
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from struct import pack, unpack
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.zk_lib import const
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.framing import TCPFrameBuffer
+
+SESSION_ID = 4321
+
+
+def frame(command, reply_id, data=b''):
+    """A TCP framed device packet"""
+    packet = pack('<4H', command, 0, SESSION_ID, reply_id) + data
+    return pack('<HHI', const.MACHINE_PREPARE_DATA_1, const.MACHINE_PREPARE_DATA_2, len(packet)) + packet
+
+
+def event_record(user_id, when, size):
+    """One live attendance event in the 52, 36, 32 or 12 byte layout"""
+    timehex = bytes([when.year - 2000, when.month, when.day, when.hour, when.minute, when.second])
+    if size == 12:
+        return pack('<IBB6s', int(user_id), 1, 0, timehex)
+    record = pack('<24sBB6s', str(user_id).encode(), 1, 0, timehex)
+    return record.ljust(size, b'\x00')
+
+
+def segment(stream, rng, max_size=40):
+    """Cut a byte stream into random sized pieces"""
+    pieces = []
+    offset = 0
+    while offset < len(stream):
+        size = rng.randint(1, max_size)
+        pieces.append(stream[offset:offset + size])
+        offset += size
+    return pieces
+
+
+class BurstDevice:
+    """Minimal terminal that answers the live capture handshake and then
+    streams a burst of events cut into random TCP segments"""
+
+    def __init__(self, stream, rng):
+        self.stream = stream
+        self.rng = rng
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def close(self):
+        self.server.close()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _address = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        frames = TCPFrameBuffer()
+        with client:
+            while True:
+                try:
+                    data = client.recv(4096)
+                except OSError:
+                    return
+                if not data:
+                    return
+                frames.feed(data)
+                for packet in frames.frames():
+                    command, _checksum, _session, reply_id = unpack('<4H', packet[:8])
+                    if command == const.CMD_ACK_OK:
+                        continue
+                    if command == const.CMD_GET_FREE_SIZES:
+                        client.sendall(frame(const.CMD_ACK_OK, reply_id, b'\x00' * 92))
+                        continue
+                    client.sendall(frame(const.CMD_ACK_OK, reply_id))
+                    if command == const.CMD_REG_EVENT and unpack('<I', packet[8:12])[0]:
+                        threading.Thread(target=self._burst, args=(client,), daemon=True).start()
+
+    def _burst(self, client):
+        time.sleep(0.05)
+        for piece in segment(self.stream, self.rng):
+            try:
+                client.sendall(piece)
+            except OSError:
+                return
+            if self.rng.random() < 0.2:
+                time.sleep(0.001)
+
+
+def build_burst(rng, count, size, batch=(1, 1, 2)):
+    """Event frames of size byte records, batch records each, plus frames that must be ignored"""
+    base = datetime(2024, 10, 19, 8, 0, 0)
+    expected = []
+    stream = b''
+    user_id = 1000
+    while len(expected) < count:
+        records = b''
+        for _ in range(min(rng.choice(batch), count - len(expected))):
+            user_id += 1
+            when = base.replace(minute=len(expected) // 60, second=len(expected) % 60)
+            records += event_record(user_id, when, size)
+            expected.append((str(user_id), when))
+        if rng.random() < 0.1:
+            # reply noise and a payload no layout fits
+            stream += frame(const.CMD_ACK_OK, 0)
+            stream += frame(const.CMD_REG_EVENT, 0, b'\x01' * 40)
+        stream += frame(const.CMD_REG_EVENT, 0, records)
+    return stream, expected
+
+
+def capture(port, count, deadline=10.0):
+    zk = ZK('127.0.0.1', port=port, timeout=5, ommit_ping=True)
+    zk.connect()
+    received = []
+    started = time.time()
+    try:
+        for attendance in zk.live_capture(new_timeout=0.2):
+            if attendance is not None:
+                received.append((attendance.user_id, attendance.timestamp))
+            if len(received) >= count or time.time() - started > deadline:
+                zk.end_live_capture = True
+    finally:
+        zk.disconnect()
+    return received
+
+
+def test_frame_buffer_random_segmentation():
+    """Frames come out whole and in order however the stream is cut"""
+    rng = random.Random(7)
+    packets = [pack('<4H', const.CMD_REG_EVENT, 0, SESSION_ID, i) + os.urandom(rng.randint(0, 120)) for i in range(200)]
+    stream = b''.join(frame(unpack('<4H', p[:8])[0], unpack('<4H', p[:8])[3], p[8:]) for p in packets)
+
+    for seed in range(5):
+        buffer = TCPFrameBuffer()
+        out = []
+        for piece in segment(stream, random.Random(seed), max_size=90):
+            buffer.feed(piece)
+            out.extend(buffer.frames())
+        assert out == packets
+        assert len(buffer) == 0
+
+
+def test_live_capture_burst_with_random_segmentation():
+    """A burst of events split and coalesced at random is delivered exactly once, in order"""
+    for seed in range(5):
+        rng = random.Random(seed)
+        # one event layout per device, as firmware has
+        stream, expected = build_burst(rng, 50, rng.choice((52, 36, 32, 12)))
+        device = BurstDevice(stream, rng)
+        try:
+            received = capture(device.port, len(expected))
+        finally:
+            device.close()
+        assert received == expected, f"seed {seed}: got {len(received)} of {len(expected)} events"
+
+
+def test_multi_event_payloads_use_the_learned_size():
+    """13 records of 12, 32 or 36 bytes are also a whole number of 52 byte records"""
+    when = datetime(2024, 10, 19, 8, 0, 0)
+    for size in (12, 32, 36):
+        expected = [(str(1000 + i), when.replace(second=i)) for i in range(14)]
+        records = [event_record(user_id, at, size) for user_id, at in expected]
+        assert (13 * size) % 52 == 0
+        # the first payload holds one event and tells the size, the next holds 13
+        stream = frame(const.CMD_REG_EVENT, 0, records[0]) + frame(const.CMD_REG_EVENT, 0, b''.join(records[1:]))
+        device = BurstDevice(stream, random.Random(size))
+        try:
+            received = capture(device.port, len(expected))
+        finally:
+            device.close()
+        assert received == expected, f"{size} byte events: {received}"
+
+
+def test_batched_12_byte_events_are_not_taken_for_36_byte_ones():
+    """Three 12 byte events fill exactly one 36 byte record, the size is only learned once it is clear"""
+    when = datetime(2024, 10, 19, 9, 0, 0)
+    expected = [(str(2000 + i), when.replace(minute=i // 60, second=i % 60)) for i in range(3 * 5 + 13)]
+    records = [event_record(user_id, at, 12) for user_id, at in expected]
+    # five payloads of three events, then one of 13 events (also 3 * 52 bytes)
+    payloads = [b''.join(records[i:i + 3]) for i in range(0, 15, 3)] + [b''.join(records[15:])]
+    stream = b''.join(frame(const.CMD_REG_EVENT, 0, payload) for payload in payloads)
+    device = BurstDevice(stream, random.Random(12))
+    try:
+        received = capture(device.port, len(expected))
+    finally:
+        device.close()
+    assert received == expected, f"got {received}"
+
+
+if __name__ == "__main__":
+    test_frame_buffer_random_segmentation()
+    print("✅ Frame reassembly survives random segmentation")
+    test_live_capture_burst_with_random_segmentation()
+    print("✅ Live capture delivered every event of each burst")
+    test_multi_event_payloads_use_the_learned_size()
+    print("✅ Multi-event payloads use the learned event size")
+    test_batched_12_byte_events_are_not_taken_for_36_byte_ones()
+    print("✅ Batched 12 byte events not taken for 36 byte ones")
@@ -0,0 +1,149 @@
+# test_logging.py
+import sys
+import os
+import gzip
+import json
+import logging
+import tempfile
+from pathlib import Path
+from queue import Queue
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.utils.logger import DroppingQueueHandler, RateLimitFilter, setup_logging, stop_logging
+
+
+def _record(level, message, lineno=0, rate_key=None):
+    record = logging.LogRecord('test', level, __file__, lineno, message, None, None)
+    if rate_key:
+        record.rate_key = rate_key
+    return record
+
+
+def test_full_queue_drops_and_reports():
+    log_queue = Queue(maxsize=10)
+    handler = DroppingQueueHandler(log_queue, block_timeout=0.01)
+    for i in range(25):
+        handler.handle(_record(logging.INFO, f"info {i}"))
+    handler.handle(_record(logging.ERROR, "error while full"))
+    assert log_queue.qsize() == 10
+    assert handler.dropped == 16 and handler.dropped_total == 16
+
+    # once there is room the drop count goes out with the next record
+    while not log_queue.empty():
+        log_queue.get_nowait()
+    handler.handle(_record(logging.INFO, "after"))
+    messages = [log_queue.get_nowait().getMessage() for _ in range(log_queue.qsize())]
+    assert messages == ["after", "Dropped 16 log records, the log queue was full"]
+    assert handler.dropped == 0 and handler.dropped_total == 16
+
+
+def test_rotated_files_are_gzipped():
+    with tempfile.TemporaryDirectory() as workdir:
+        log_file = os.path.join(workdir, 'app.log')
+        setup_logging(log_file, max_bytes=2000, backup_count=3, compress=True)
+        logger = logging.getLogger('test_logging')
+        for i in range(200):
+            logger.info(f"line {i:04d} " + 'x' * 40)
+        stop_logging()
+
+        names = sorted(os.listdir(workdir))
+        assert names == ['app.log', 'app.log.1.gz', 'app.log.2.gz', 'app.log.3.gz'], names
+        lines = []
+        for name in ('app.log.3.gz', 'app.log.2.gz', 'app.log.1.gz'):
+            with gzip.open(os.path.join(workdir, name), 'rt') as f:
+                lines.extend(f.read().splitlines())
+        with open(log_file) as f:
+            lines.extend(f.read().splitlines())
+        numbers = [int(line.split('line ')[1][:4]) for line in lines if 'line ' in line]
+        # the oldest files were rotated out, everything after is complete and in order
+        assert numbers == list(range(numbers[0], 200))
+
+
+def test_repeated_errors_are_rate_limited_per_key():
+    now = [1000.0]
+    limiter = RateLimitFilter(burst=3, per_minute=60, clock=lambda: now[0])
+    passed = [limiter.filter(_record(logging.ERROR, f"sync failed {i}", lineno=10, rate_key='sync'))
+              for i in range(10)]
+    assert passed == [True] * 3 + [False] * 7
+    # other keys and info records have buckets of their own
+    assert limiter.filter(_record(logging.ERROR, "other", lineno=11))
+    assert limiter.filter(_record(logging.ERROR, "device down", lineno=10, rate_key='connect:A'))
+    assert all(limiter.filter(_record(logging.INFO, "info", lineno=10)) for _ in range(10))
+    # without a rate_key the same line limits each message, e.g. each device, on its own
+    down = [limiter.filter(_record(logging.ERROR, f"device {name} down", lineno=12))
+            for _ in range(5) for name in 'AB']
+    assert down == [True] * 6 + [False] * 4
+
+    summaries = limiter.summaries()
+    assert len(summaries) == 3
+    assert summaries[0].suppressed == 7 and summaries[0].levelno == logging.ERROR
+    assert summaries[0].getMessage() == "7 similar messages suppressed, the last one: sync failed 9"
+    assert [summary.getMessage() for summary in summaries[1:]] == [
+        "2 similar messages suppressed, the last one: device A down",
+        "2 similar messages suppressed, the last one: device B down"]
+    assert limiter.summaries() == []
+
+    # one token per second refills
+    now[0] += 1
+    assert limiter.filter(_record(logging.ERROR, "sync failed", lineno=10, rate_key='sync'))
+    assert not limiter.filter(_record(logging.ERROR, "sync failed", lineno=10, rate_key='sync'))
+
+
+def test_json_log_lines_with_summary():
+    with tempfile.TemporaryDirectory() as workdir:
+        log_file = os.path.join(workdir, 'app.log')
+        setup_logging(log_file, json_format=True, rate_limit_burst=2, summary_interval=3600)
+        logger = logging.getLogger('test_logging')
+        for i in range(5):
+            logger.error(f"Network error syncing record {i}", extra={'rate_key': 'sync_network_error'})
+        logger.warning("device down", extra={'rate_key': 'connect:10.0.0.1'})
+        stop_logging()
+
+        with open(log_file) as f:
+            entries = [json.loads(line) for line in f]
+        assert [entry['message'] for entry in entries] == [
+            "Network error syncing record 0",
+            "Network error syncing record 1",
+            "device down",
+            "3 similar messages suppressed, the last one: Network error syncing record 4"
+        ]
+        assert entries[2]['rate_key'] == 'connect:10.0.0.1' and entries[2]['level'] == 'WARNING'
+        assert entries[3]['suppressed'] == 3 and entries[3]['logger'] == 'test_logging'
+
+
+def test_tracebacks_are_kept_apart_from_the_message():
+    with tempfile.TemporaryDirectory() as workdir:
+        for json_format in (True, False):
+            log_file = os.path.join(workdir, 'app.json' if json_format else 'app.log')
+            setup_logging(log_file, json_format=json_format)
+            logger = logging.getLogger('test_logging')
+            try:
+                1 / 0
+            except ZeroDivisionError:
+                logger.exception("sync %s failed", 'SIM1')
+            stop_logging()
+
+            with open(log_file) as f:
+                text = f.read()
+            if json_format:
+                entry = json.loads(text.splitlines()[0])
+                assert entry['message'] == "sync SIM1 failed"
+                assert entry['exception'].startswith('Traceback') and 'ZeroDivisionError' in entry['exception']
+            else:
+                assert "sync SIM1 failed\nTraceback" in text and 'ZeroDivisionError' in text
+
+
+if __name__ == "__main__":
+    test_full_queue_drops_and_reports()
+    print("✅ Full log queue drops and reports")
+    test_rotated_files_are_gzipped()
+    print("✅ Rotated log files are gzipped")
+    test_repeated_errors_are_rate_limited_per_key()
+    print("✅ Repeated errors rate limited per key")
+    test_json_log_lines_with_summary()
+    print("✅ JSON log lines with suppression summary")
+    test_tracebacks_are_kept_apart_from_the_message()
+    print("✅ Tracebacks kept apart from the message")
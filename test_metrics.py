@@ -0,0 +1,83 @@
+# test_metrics.py
+import sys
+import os
+import re
+import time
+import tempfile
+import urllib.request
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.core.database import DatabaseManager
+from src.core.device_manager import DeviceManager
+from src.core.attendance_service import AttendanceService
+from src.core.metrics import MetricsExporter, MetricsServer
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\]|\\.)*",?)*\})? \S+$')
+
+
+def parse(text):
+    """Sample lines by metric name, checking every line is valid exposition format"""
+    samples = {}
+    families = []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            families.append(line.split()[2])
+            continue
+        if line.startswith('#'):
+            continue
+        assert SAMPLE.match(line), line
+        samples.setdefault(line.split('{')[0].split(' ')[0], []).append(line)
+    # each family is declared once
+    assert len(families) == len(set(families))
+    return samples
+
+
+def test_metrics_endpoint_serves_pipeline_and_device_gauges():
+    with tempfile.TemporaryDirectory() as workdir, SimulatedDevice(users=5, records=10, seed=9) as simulated:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        config = {'devices': [{'ip': simulated.host, 'port': simulated.port, 'serial_number': 'SIM1',
+                               'sync_time': False, 'use_actor': False, 'protocol_stats': True}]}
+        device_manager = DeviceManager(db, config)
+        service = AttendanceService(db, device_manager, config)
+        device_manager.initialize_devices()
+        device = device_manager.devices['SIM1']
+        device.get_device_info()
+
+        punch = {'user_id': '1', 'timestamp': simulated.now(), 'status': 1, 'punch': 0}
+        device_manager._queue_attendance(device, punch)
+        device_manager._queue_attendance(device, dict(punch, user_id='2'))
+        server = MetricsServer(MetricsExporter(db, device_manager, service), port=0).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            samples = parse(urllib.request.urlopen(url, timeout=5).read().decode())
+            assert samples['biometric_attendance_queue_depth'] == ['biometric_attendance_queue_depth 2']
+
+            device_manager.process_attendance_queue()
+            samples = parse(urllib.request.urlopen(url, timeout=5).read().decode())
+        finally:
+            server.stop()
+            device_manager.disconnect_all()
+
+        assert samples['biometric_attendance_queue_depth'] == ['biometric_attendance_queue_depth 0']
+        assert 'biometric_attendance_records{status="pending"} 2' in samples['biometric_attendance_records']
+        assert samples['biometric_device_connected'] == ['biometric_device_connected{device="SIM1"} 1']
+        last_event = float(samples['biometric_device_last_event_timestamp_seconds'][0].split()[-1])
+        assert abs(last_event - time.time()) < 60
+        assert any('command="CMD_CONNECT"' in line for line in samples['biometric_device_command_seconds_count'])
+        # the two punches plus the capability profile saved on connect
+        assert int(samples['biometric_sqlite_write_seconds_count'][0].split()[-1]) >= 2
+        assert samples['biometric_sync_records_total'] == [
+            'biometric_sync_records_total{result="synced"} 0',
+            'biometric_sync_records_total{result="rejected"} 0',
+            'biometric_sync_records_total{result="errors"} 0'
+        ]
+
+
+if __name__ == "__main__":
+    test_metrics_endpoint_serves_pipeline_and_device_gauges()
+    print("✅ Metrics endpoint serves pipeline and device gauges")
@@ -0,0 +1,74 @@
+# test_protocol_stats.py
+import sys
+import os
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.instrument import ProtocolStats
+from src.utils.histogram import Histogram
+from zk_session import download
+
+
+def test_download_is_counted_per_command():
+    with SimulatedDevice(users=300, records=20000, seed=7) as device:
+        for udp in (False, True):
+            stats = ProtocolStats()
+            ZK._protocols.pop(device.address, None)
+            zk = ZK(device.host, port=device.port, timeout=5, ommit_ping=True,
+                    force_udp=udp, read_window=1 if udp else 4, stats=stats)
+            download(zk)
+            snapshot = stats.snapshot()
+            commands = snapshot['commands']
+            assert commands['CMD_CONNECT']['count'] == 1
+            assert commands['CMD_PREPARE_BUFFER']['count'] >= 3
+            assert commands['CMD_READ_BUFFER']['count'] > 1
+            # the dumps arrive as buffer chunks, charged to the chunk reads
+            assert commands['CMD_READ_BUFFER']['bytes_in'] > 20000 * 40
+            assert snapshot['bytes_in'] == sum(c['bytes_in'] for c in commands.values())
+            assert snapshot['timeouts'] == 0 and snapshot['retries'] == 0
+            latency = commands['CMD_READ_BUFFER']['latency']
+            assert latency['count'] == commands['CMD_READ_BUFFER']['count']
+            assert latency['buckets'][-1] == ['+Inf', latency['count']]
+
+
+def test_timeouts_and_retries_are_counted():
+    """Dropped replies show up as timeouts, short chunks as re-requested reads"""
+    stats = ProtocolStats()
+    for seed in (8, 9):
+        with SimulatedDevice(users=50, records=3000, loss=0.1, seed=seed, max_read_chunk=4096) as device:
+            ZK._protocols.pop(device.address, None)
+            zk = ZK(device.host, port=device.port, timeout=1, ommit_ping=True, read_window=4, stats=stats)
+            try:
+                zk.connect()
+                zk.get_attendance()
+            except Exception:
+                pass
+            finally:
+                zk.disconnect()
+    snapshot = stats.snapshot()
+    assert snapshot['timeouts'] > 0
+    assert snapshot['commands']['CMD_READ_BUFFER']['retries'] > 0
+
+
+def test_histogram_quantiles():
+    histogram = Histogram((0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.5] * 9 + [3.0]:
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.95) == 1.0
+    assert histogram.quantile(1.0) == 3.0
+    assert histogram.snapshot()['buckets'] == [[0.01, 90], [0.1, 90], [1.0, 99], ['+Inf', 100]]
+
+
+if __name__ == "__main__":
+    test_download_is_counted_per_command()
+    print("✅ Download counted per command")
+    test_timeouts_and_retries_are_counted()
+    print("✅ Timeouts and retries counted")
+    test_histogram_quantiles()
+    print("✅ Histogram quantiles")
@@ -0,0 +1,128 @@
+# test_replication.py
+import sys
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedFleet
+from src.biometric.zk_lib.exception import ZKNetworkError
+from src.biometric.zk_lib.finger import Finger
+from src.biometric.zk_lib.user import User
+from src.core.database import DatabaseManager
+from src.core.device_manager import DeviceManager
+
+
+def _user(uid, user_id, name):
+    return {'uid': uid, 'user_id': user_id, 'name': name, 'privilege': 0,
+            'password': '', 'group_id': '', 'card': 0}
+
+
+def test_upsert_users_with_alphanumeric_ids():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'att.db')
+        # a store from before user_id was TEXT
+        conn = sqlite3.connect(path)
+        conn.execute("""CREATE TABLE users (user_id INTEGER PRIMARY KEY, name TEXT, privilege INTEGER,
+                        password TEXT, last_updated TIMESTAMP)""")
+        conn.execute("INSERT INTO users (user_id, name, privilege, password) VALUES (17, 'Old', 0, '')")
+        conn.commit()
+        conn.close()
+
+        db = DatabaseManager(path)
+        assert db.upsert_users([_user(3, 'A-17', 'Alpha'), _user(4, 17, 'Numeric'), _user(5, '0042', 'Padded')]) == 3
+        users = {user['user_id']: user for user in db.get_users()}
+        assert sorted(users) == ['0042', '17', 'A-17']
+        assert users['A-17']['uid'] == 3 and users['17']['name'] == 'Numeric'
+
+        # a second start leaves the migrated table alone
+        assert len(DatabaseManager(path).get_users()) == 3
+
+
+def test_replicates_alphanumeric_ids_and_skips_unreadable_targets():
+    with tempfile.TemporaryDirectory() as workdir, \
+            SimulatedFleet(2, users=0, records=0, user_packet_size=72, seed=5) as fleet:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        db.upsert_users([_user(uid, f'B-{uid}', f'User {uid}') for uid in range(1, 21)])
+        device_manager = DeviceManager(db, {'devices': fleet.devices_config()})
+        device_manager.initialize_devices()
+        try:
+            reports = device_manager.replicate(include_templates=False)
+            assert all(report['error'] is None for report in reports.values()), reports
+            for simulated in fleet.devices:
+                assert sorted(user.user_id for user in simulated.users.values()) == sorted(f'B-{uid}' for uid in range(1, 21))
+
+            # a target whose users can't be read is skipped, not sent everything again
+            db.upsert_users([_user(21, 'B-21', 'User 21')])
+            unreadable = fleet.devices[1]
+            unreadable.stop()
+            reports = device_manager.replicate(include_templates=False)
+            assert reports['SIM00001']['users_pushed'] == 1
+            assert reports['SIM00002']['error'] == "can't read users"
+            assert reports['SIM00002']['users_pushed'] == 0
+        finally:
+            device_manager.disconnect_all()
+
+
+def test_unreadable_source_templates_stop_the_replication():
+    with tempfile.TemporaryDirectory() as workdir, \
+            SimulatedFleet(2, users=10, records=0, seed=25) as fleet:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        device_manager = DeviceManager(db, {'devices': fleet.devices_config()})
+        device_manager.initialize_devices()
+        source, target = fleet.devices
+        target.users.clear()
+        target.templates.clear()
+        try:
+            def unreadable():
+                raise ZKNetworkError("timed out")
+
+            device_manager.devices['SIM00001'].zk_client.get_templates = unreadable
+            # not "the source has no templates": nothing is pushed at all
+            assert device_manager.replicate(source_serial='SIM00001') == {}
+        finally:
+            device_manager.disconnect_all()
+        assert target.users == {} and target.templates == {}
+
+
+def test_users_are_matched_by_user_id_not_uid():
+    with tempfile.TemporaryDirectory() as workdir, \
+            SimulatedFleet(2, users=0, records=0, seed=26) as fleet:
+        source, target = fleet.devices
+        for uid in range(1, 6):
+            source.users[uid] = User(uid, f'User {uid}', 0, '', '', f'B-{uid}')
+            source.templates[(uid, 0)] = Finger(uid, 0, 1, os.urandom(300))
+        # another person in uid 3, and B-5 enrolled under another uid
+        target.users[3] = User(3, 'Someone else', 0, '', '', 'X-9')
+        target.users[40] = User(40, 'User 5', 0, '', '', 'B-5')
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        device_manager = DeviceManager(db, {'devices': fleet.devices_config()})
+        device_manager.initialize_devices()
+        try:
+            reports = device_manager.replicate(source_serial='SIM00001')
+        finally:
+            device_manager.disconnect_all()
+        assert reports['SIM00002']['error'] is None, reports
+        by_user_id = {user.user_id: uid for uid, user in target.users.items()}
+        assert by_user_id['X-9'] == 3 and target.users[3].name == 'Someone else'
+        assert by_user_id['B-5'] == 40 and len(target.users) == 6
+        assert by_user_id['B-3'] not in (3, 40)
+        for uid in range(1, 6):
+            target_uid = by_user_id[f'B-{uid}']
+            assert target.templates[(target_uid, 0)].template == source.templates[(uid, 0)].template
+        assert (3, 0) not in target.templates
+
+
+if __name__ == "__main__":
+    test_upsert_users_with_alphanumeric_ids()
+    print("✅ Users with alphanumeric ids stored")
+    test_replicates_alphanumeric_ids_and_skips_unreadable_targets()
+    print("✅ Replication keeps alphanumeric ids and skips unreadable targets")
+    test_unreadable_source_templates_stop_the_replication()
+    print("✅ Unreadable source templates stop the replication")
+    test_users_are_matched_by_user_id_not_uid()
+    print("✅ Users matched by user_id, not uid")
@@ -0,0 +1,76 @@
+# test_rtt.py
+import sys
+import os
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.rtt import RTTEstimator
+
+
+def test_estimator_follows_rfc6298():
+    rtt = RTTEstimator(min_rto=0.01, max_timeouts=3)
+    assert rtt.timeout(30) == 30 and rtt.connect_timeout(10) == 10
+    rtt.sample(0.2)
+    assert (rtt.srtt, rtt.rttvar) == (0.2, 0.1) and abs(rtt.rto - 0.6) < 1e-9
+    rtt.sample(0.4)
+    assert abs(rtt.srtt - 0.225) < 1e-9 and abs(rtt.rttvar - 0.125) < 1e-9
+    assert abs(rtt.rto - 0.725) < 1e-9 and abs(rtt.connect_timeout(10) - 3 * 0.725) < 1e-9
+
+    # timeouts back off, use up the retry budget and finally mark the peer dead
+    rtt.on_timeout()
+    assert abs(rtt.timeout(30) - 1.45) < 1e-9 and rtt.retry_budget() == 2 and not rtt.dead
+    rtt.on_timeout()
+    rtt.on_timeout()
+    assert rtt.dead and rtt.retry_budget() == 1
+    assert abs(rtt.connect_timeout(10) - 3 * 0.725) < 1e-9
+    rtt.sample(0.2)
+    assert not rtt.dead and rtt.retry_budget() == 3
+
+
+def test_lost_replies_time_out_after_the_rto():
+    """A silent device fails commands after the measured RTO, not the static timeout, then fast"""
+    with SimulatedDevice(users=5, records=0, seed=18) as device:
+        rtt = RTTEstimator()
+        ZK._protocols.pop(device.address, None)
+        zk = ZK(device.host, port=device.port, timeout=30, ommit_ping=True, force_udp=True, rtt=rtt)
+        zk.connect()
+        try:
+            for _ in range(5):
+                zk.get_time()
+            assert zk.rtt_stats()['samples'] >= 5 and rtt.rto == rtt.min_rto
+
+            device.loss = 1.0
+            started = time.time()
+            for _ in range(rtt.max_timeouts):
+                try:
+                    zk.get_time()
+                except Exception:
+                    pass
+                else:
+                    assert False, "a lost reply was answered"
+            # 1 + 2 + 4 s of backoff instead of 3 x 30 s
+            assert time.time() - started < 10
+            assert zk.rtt_stats()['dead']
+
+            started = time.time()
+            try:
+                zk.get_time()
+            except Exception:
+                pass
+            assert time.time() - started < 0.5
+        finally:
+            device.loss = 0.0
+            zk.disconnect()
+
+
+if __name__ == "__main__":
+    test_estimator_follows_rfc6298()
+    print("✅ RTT estimator follows RFC 6298")
+    test_lost_replies_time_out_after_the_rto()
+    print("✅ Lost replies time out after the RTO")
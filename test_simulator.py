@@ -0,0 +1,179 @@
+# test_simulator.py
+import sys
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_device import ZKDevice
+from src.biometric.zk_lib import const
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.user import User
+from src.biometric.zk_lib.finger import Finger
+
+
+def connect(device, **kwargs):
+    ZK._protocols.pop(device.address, None)
+    zk = ZK(device.host, port=device.port, timeout=5, ommit_ping=True, **kwargs)
+    zk.connect()
+    return zk
+
+
+def test_dumps_over_tcp_and_udp():
+    """Users, templates and attendance of every record layout come back intact"""
+    for record_size in (8, 16, 40):
+        for user_packet_size in (28, 72):
+            with SimulatedDevice(users=200, records=3000, record_size=record_size,
+                                 user_packet_size=user_packet_size, password=1234, seed=1) as device:
+                for udp in (False, True):
+                    zk = connect(device, password=1234, force_udp=udp, read_window=1 if udp else 4)
+                    try:
+                        users = zk.get_users()
+                        attendance = zk.get_attendance()
+                        templates = zk.get_templates()
+                    finally:
+                        zk.disconnect()
+                    assert [u.user_id for u in users] == [str(uid) for uid in range(1, 201)]
+                    assert len(attendance) == 3000
+                    assert attendance[-1].user_id == device.attendance[-1][1]
+                    assert attendance[-1].timestamp == device.attendance[-1][4]
+                    assert [f.template for f in templates] == [device.templates[(uid, 0)].template for uid in range(1, 201)]
+
+
+def test_wrong_password_is_rejected():
+    with SimulatedDevice(users=1, records=1, password=1234) as device:
+        try:
+            connect(device, password=4321)
+        except Exception:
+            return
+        assert False, "connected with the wrong comm key"
+
+
+def test_uploads_reach_the_device():
+    with SimulatedDevice(users=0, records=0, seed=2) as device:
+        zk = connect(device, upload_chunk_size=16384, upload_window=4)
+        try:
+            users = [(User(uid, 'User %i' % uid, 0, '', '1', str(uid)), [Finger(uid, 0, 1, os.urandom(600))])
+                     for uid in range(1, 301)]
+            assert zk.set_users_bulk(users) == 300
+            zk.set_user(uid=500, name='Single', user_id='500')
+            assert zk.delete_users(user_ids=['1']) == 1
+        finally:
+            zk.disconnect()
+        assert sorted(device.users) == list(range(2, 301)) + [500]
+        assert device.templates[(42, 0)].template == users[41][1][0].template
+        assert device.users[500].name == 'Single'
+
+
+def test_live_events_reach_zk_device():
+    with SimulatedDevice(users=5, records=0, seed=3) as device:
+        zk_device = ZKDevice(device.host, device.port, timeout=5)
+        assert zk_device.connect()
+        received = []
+        started = time.time()
+        try:
+            for attendance in zk_device.live_capture(on_started=lambda: [device.punch() for _ in range(10)]):
+                received.append(attendance['user_id'])
+                if len(received) >= 10 or time.time() - started > 10:
+                    break
+        finally:
+            zk_device.disconnect()
+        assert received == [record[1] for record in device.attendance[:10]]
+
+
+def test_reads_under_a_small_device_chunk_limit():
+    """A device serving less than the default chunk is read completely, serial, pipelined and probed"""
+    for max_read_chunk in (1000, 8192, 16384):
+        for options in ({}, {'read_window': 4}, {'read_window': 4, 'adaptive_read_chunk': True},
+                        {'force_udp': True}):
+            ZK._read_chunk_sizes.clear()
+            with SimulatedDevice(users=50, records=20000, record_size=40, seed=4,
+                                 max_read_chunk=max_read_chunk) as device:
+                zk = connect(device, **options)
+                try:
+                    attendance = zk.get_attendance()
+                    assert zk.last_read_stats['chunk_size'] == max_read_chunk, (max_read_chunk, options)
+                    assert zk.last_read_stats['retries'] == 0
+                    data, size = zk.read_with_buffer(const.CMD_ATTLOG_RRQ, offset=12345)
+                finally:
+                    zk.disconnect()
+                assert len(attendance) == 20000
+                assert [a.timestamp for a in attendance[-3:]] == [r[4] for r in device.attendance[-3:]]
+                assert len(data) == size - 12345 and data == device._dump_attendance()[12345:]
+    ZK._read_chunk_sizes.clear()
+
+
+def test_ommit_ping_skips_the_probe():
+    """ommit_ping connects straight over tcp, without it udp terminals are found by the probe"""
+    def probe(*args, **kwargs):
+        raise AssertionError("probed with ommit_ping")
+
+    with SimulatedDevice(users=5, records=0, seed=13) as device:
+        ZK._protocols.pop(device.address, None)
+        zk = ZK(device.host, port=device.port, timeout=5, ommit_ping=True)
+        zk.helper.probe = probe
+        zk.connect()
+        try:
+            assert zk.tcp and len(zk.get_users()) == 5
+        finally:
+            zk.disconnect()
+
+    with SimulatedDevice(users=5, records=0, tcp=False, seed=13) as device:
+        ZK._protocols.pop(device.address, None)
+        zk_device = ZKDevice(device.host, device.port, serial_number='SIM1', timeout=2)
+        try:
+            assert zk_device.connect()
+            assert not zk_device.zk_client.tcp
+            assert len(zk_device.get_users()) == 5
+        finally:
+            zk_device.disconnect()
+
+
+def test_attendance_tail_for_every_record_size():
+    """Only the records past the known count are transferred, whatever the record layout"""
+    for record_size in (8, 16, 40):
+        for options in ({}, {'read_window': 4}, {'force_udp': True}):
+            with SimulatedDevice(users=30, records=500, record_size=record_size, seed=22) as device:
+                zk = connect(device, **options)
+                try:
+                    # the first read learns the record size from a full download
+                    records, count = zk.get_attendance_tail(480)
+                    assert count == 500 and len(records) == 20
+                    assert zk.get_attendance_tail(500) == ([], 500)
+
+                    for minute in range(7):
+                        device.punch(timestamp=datetime(2024, 5, 2, 9, minute))
+                    records, count = zk.get_attendance_tail(500)
+                    assert count == 507 and zk.last_read_stats['bytes'] == 7 * record_size, (record_size, options)
+                    assert [(a.user_id, a.timestamp) for a in records] == \
+                        [(record[1], record[4]) for record in device.attendance[500:]]
+
+                    # a cleared log is read from the start
+                    zk.clear_attendance()
+                    device.punch(timestamp=datetime(2024, 5, 2, 10, 0))
+                    records, count = zk.get_attendance_tail(507)
+                    assert count == 1 and [a.timestamp for a in records] == [datetime(2024, 5, 2, 10, 0)]
+                finally:
+                    zk.disconnect()
+
+
+if __name__ == "__main__":
+    test_dumps_over_tcp_and_udp()
+    print("✅ Dumps round-trip over TCP and UDP")
+    test_wrong_password_is_rejected()
+    print("✅ Wrong comm key rejected")
+    test_uploads_reach_the_device()
+    print("✅ Uploads reach the device")
+    test_live_events_reach_zk_device()
+    print("✅ Live events reach ZKDevice")
+    test_reads_under_a_small_device_chunk_limit()
+    print("✅ Reads under a small device chunk limit")
+    test_ommit_ping_skips_the_probe()
+    print("✅ ommit_ping skips the probe")
+    test_attendance_tail_for_every_record_size()
+    print("✅ Attendance tail for every record size")
@@ -0,0 +1,67 @@
+# test_startup.py
+import sys
+import os
+import subprocess
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.utils.startup_profile import StartupProfiler
+
+ROOT = str(Path(__file__).parent)
+
+
+def _fresh_python(code):
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+
+
+def test_submodules_import_without_the_rest():
+    result = _fresh_python(
+        "import sys\n"
+        "import src.biometric.zk_lib.base, src.core.attendance_service\n"
+        "print(sorted(m for m in ('requests', 'winreg', 'src.utils.windows_utils', 'http.server') if m in sys.modules))\n"
+        "import src.biometric, src.core\n"
+        "print(src.biometric.ZKDevice.__name__, src.biometric.ZKConstants.CMD_CONNECT, src.core.DeviceManager.__name__)\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ["[]", "ZKDevice 1000 DeviceManager"]
+
+
+def test_profiler_times_imports_and_stages():
+    profiler = StartupProfiler().install()
+    try:
+        sys.modules.pop('src.core.metrics', None)
+        with profiler.stage('import metrics'):
+            import src.core.metrics  # noqa: F401
+    finally:
+        profiler.uninstall()
+    names = [name for name, _elapsed, _own in profiler.imports]
+    assert 'src.core.metrics' in names
+    assert all(own <= elapsed for _name, elapsed, own in profiler.imports)
+    assert [name for name, _seconds in profiler.stages] == ['import metrics']
+    report = profiler.report()
+    assert report[0].startswith('Startup took') and any(line.endswith('src.core.metrics') for line in report)
+
+
+def test_profile_startup_covers_main_imports():
+    result = _fresh_python(
+        "import sys\n"
+        "sys.argv = ['main.py', '--profile-startup']\n"
+        "import src.main\n"
+        "src.main.startup_profiler.uninstall()\n"
+        "print(sorted({name for name, _elapsed, _own in src.main.startup_profiler.imports} & "
+        "{'src.utils.logger', 'src.utils.config_manager', 'argparse'}))\n"
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines() == ["['argparse', 'src.utils.config_manager', 'src.utils.logger']"]
+
+
+if __name__ == "__main__":
+    test_submodules_import_without_the_rest()
+    print("✅ Submodules import without the rest")
+    test_profiler_times_imports_and_stages()
+    print("✅ Profiler times imports and stages")
+    test_profile_startup_covers_main_imports()
+    print("✅ --profile-startup covers the imports of main")
@@ -0,0 +1,85 @@
+# test_templates.py
+import sys
+import os
+import types
+import tempfile
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.user import User
+from src.biometric.zk_lib.finger import Finger
+from src.biometric.zk_device import ZKDevice
+from src.core.database import DatabaseManager
+
+
+def connect(device, **kwargs):
+    ZK._protocols.pop(device.address, None)
+    zk = ZK(device.host, port=device.port, timeout=5, ommit_ping=True, **kwargs)
+    zk.connect()
+    return zk
+
+
+def _fingers(count):
+    """Templates of many sizes, up to three fingers per user, some of them invalid"""
+    return [(User(uid, 'User %i' % uid, 0, '', '1', str(uid)),
+             [Finger(uid, fid, fid % 2 == 0, os.urandom(50 + (uid * 37 + fid * 101) % 1500))
+              for fid in range(uid % 4)])
+            for uid in range(1, count + 1)]
+
+
+def test_iter_templates_streams_every_template():
+    with SimulatedDevice(users=0, records=0, seed=15) as device:
+        zk = connect(device)
+        try:
+            assert list(zk.iter_templates()) == []
+            zk.set_users_bulk(_fingers(300))
+            templates = zk.iter_templates()
+            assert isinstance(templates, types.GeneratorType)
+            received = [(f.uid, f.fid, f.valid, f.template) for f in templates]
+        finally:
+            zk.disconnect()
+        assert sorted(received) == sorted((f.uid, f.fid, f.valid, f.template) for f in device.templates.values())
+        assert len(received) == sum(uid % 4 for uid in range(1, 301))
+
+
+def test_template_store_tracks_the_device():
+    with tempfile.TemporaryDirectory() as workdir, SimulatedDevice(users=0, records=0, seed=16) as simulated:
+        db = DatabaseManager(os.path.join(workdir, 'att.db'))
+        zk = connect(simulated)
+        try:
+            zk.set_users_bulk(_fingers(200))
+            assert db.upsert_templates(zk.iter_templates(), batch_size=64) == len(simulated.templates)
+            # storing the same dump again writes nothing
+            assert db.upsert_templates(zk.iter_templates(), batch_size=64) == 0
+            changed = Finger(5, 0, 1, os.urandom(400))
+            zk.set_users_bulk([(User(5, 'User 5', 0, '', '1', '5'), [changed])])
+        finally:
+            zk.disconnect()
+        del simulated.templates[(7, 2)]
+
+        device = ZKDevice(simulated.host, simulated.port, serial_number='SIM1', timeout=5)
+        assert device.connect()
+        try:
+            hashes = device.get_template_hashes()
+        finally:
+            device.disconnect()
+        assert db.diff_templates(hashes) == {'changed': [(5, 0)], 'missing': [(7, 2)]}
+
+        assert db.upsert_templates([changed]) == 1
+        stored = db.get_templates_by_hash([hashes[(5, 0)]])
+        assert len(stored) == 1 and stored[0]['template'] == changed.template
+        assert db.delete_templates(7, 2)
+        assert db.diff_templates(hashes) == {'changed': [], 'missing': []}
+        assert db.get_template_hashes() == hashes
+
+
+if __name__ == "__main__":
+    test_iter_templates_streams_every_template()
+    print("✅ iter_templates streams every template")
+    test_template_store_tracks_the_device()
+    print("✅ Template store tracks the device")
@@ -0,0 +1,106 @@
+# test_user_bulk.py
+import sys
+import os
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.simulator import SimulatedDevice
+from src.biometric.zk_device import ZKDevice
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.user import User
+from src.biometric.zk_lib.finger import Finger
+
+
+def connect(device, **kwargs):
+    ZK._protocols.pop(device.address, None)
+    zk = ZK(device.host, port=device.port, timeout=5, ommit_ping=True, **kwargs)
+    zk.connect()
+    return zk
+
+
+def test_user_index_follows_bulk_uploads():
+    """Re-uploading users under new user_ids replaces their index entries, whatever the batch size"""
+    with SimulatedDevice(users=0, records=0, user_packet_size=72, seed=6) as device:
+        zk = connect(device)
+        try:
+            zk.set_users_bulk([(User(uid, 'User %i' % uid, 0, '', '1', 'E%i' % uid), []) for uid in range(1, 3001)])
+            # warm the index, then move every uid to a new user_id
+            assert len(zk.get_users()) == 3000
+            zk.set_users_bulk([(User(uid, 'User %i' % uid, 0, '', '1', 'F%i' % uid), []) for uid in range(1, 3001)])
+            # the same uid twice in one batch: the last entry wins
+            zk.set_users_bulk([(User(7, 'Seven', 0, '', '1', 'G7'), []), (User(7, 'Seven', 0, '', '1', 'H7'), [])])
+
+            assert zk.delete_users(user_ids=['E5', 'F5', 'G7', 'H7']) == 2
+        finally:
+            zk.disconnect()
+        assert 5 not in device.users and 7 not in device.users
+        assert len(device.users) == 2998
+        assert device.users[6].user_id == 'F6'
+
+
+def test_bulk_upload_round_trips():
+    """Users and templates uploaded in one go read back the same, for both user layouts, tcp and udp"""
+    for user_packet_size in (28, 72):
+        for udp in (False, True):
+            with SimulatedDevice(users=0, records=0, user_packet_size=user_packet_size, seed=14) as device:
+                entries = [(User(uid, 'User %i' % uid, 14 if uid % 50 == 0 else 0, str(uid % 10000), '1',
+                                 str(uid), card=uid * 7),
+                            [Finger(uid, fid, 1, os.urandom(200 + uid % 300)) for fid in range(uid % 3)])
+                           for uid in range(1, 401)]
+                zk = connect(device, force_udp=udp)
+                try:
+                    assert zk.set_users_bulk(entries) == 400
+                finally:
+                    zk.disconnect()
+
+                zk = connect(device, force_udp=udp)
+                try:
+                    users = zk.get_users()
+                    templates = zk.get_templates()
+                finally:
+                    zk.disconnect()
+                expected = [user for user, _fingers in entries]
+                assert [(u.uid, u.user_id, u.name, u.privilege, u.password, u.card) for u in users] == \
+                    [(u.uid, u.user_id, u.name, u.privilege, u.password, u.card) for u in expected]
+                fingers = [finger for _user, user_fingers in entries for finger in user_fingers]
+                assert sorted((f.uid, f.fid, f.template) for f in templates) == \
+                    sorted((f.uid, f.fid, f.template) for f in fingers)
+
+
+def test_windowed_upload_falls_back_once_per_device():
+    """A device refusing large chunks gets the whole upload in 1 KB chunks, and keeps getting them"""
+    for max_upload_chunk, expected in ((None, 16384), (1024, 1024)):
+        with SimulatedDevice(users=0, records=0, seed=17, max_upload_chunk=max_upload_chunk) as simulated:
+            templates = {uid: [Finger(uid, 0, 1, os.urandom(900))] for uid in range(1, 201)}
+            users = [User(uid, 'User %i' % uid, 0, '', '1', str(uid)) for uid in range(1, 201)]
+            device = ZKDevice(simulated.host, simulated.port, serial_number='SIM1', timeout=5,
+                              upload_chunk_size=16384, upload_window=4)
+            assert device.connect()
+            try:
+                assert device.push_users(users[:100], templates=templates) == 100
+                assert device.zk_client.upload_chunk_size == expected
+            finally:
+                device.disconnect()
+            assert device.upload_chunk_size == expected
+
+            # the next session starts in the mode the device settled on
+            assert device.connect()
+            try:
+                assert device.zk_client.upload_chunk_size == expected
+                assert device.push_users(users[100:], templates=templates) == 100
+            finally:
+                device.disconnect()
+            assert sorted(simulated.users) == list(range(1, 201))
+            assert all(simulated.templates[(uid, 0)].template == templates[uid][0].template for uid in range(1, 201))
+
+
+if __name__ == "__main__":
+    test_user_index_follows_bulk_uploads()
+    print("✅ User index follows bulk uploads")
+    test_bulk_upload_round_trips()
+    print("✅ Bulk upload round-trips")
+    test_windowed_upload_falls_back_once_per_device()
+    print("✅ Windowed upload falls back once per device")
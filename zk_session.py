@@ -0,0 +1,110 @@
+# zk_session.py
+import sys
+import os
+import time
+import argparse
+import logging
+from collections import Counter
+from pathlib import Path
+
+# Add the parent directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.biometric.zk_lib.base import ZK
+from src.biometric.zk_lib.session_log import KIND_NAMES, SENT, RECEIVED, read_session_log
+
+
+def download(zk):
+    """The fixed session recorded and replayed: connect, read everything, disconnect"""
+    zk.connect()
+    try:
+        return {
+            'serial_number': zk.get_serialnumber(),
+            'firmware_version': zk.get_firmware_version(),
+            'users': zk.get_users(),
+            'attendance': zk.get_attendance(),
+            'templates': zk.get_templates()
+        }
+    finally:
+        zk.disconnect()
+
+
+def zk_options(args):
+    return {
+        'timeout': args.timeout,
+        'password': args.password,
+        'force_udp': args.udp,
+        'read_window': args.read_window
+    }
+
+
+def summary(result):
+    return (f"serial {result['serial_number']}, firmware {result['firmware_version']}, "
+            f"{len(result['users'])} users, {len(result['attendance'])} records, "
+            f"{len(result['templates'])} templates")
+
+
+def record(args):
+    """Download everything from a device, writing the session log as it goes"""
+    zk = ZK(args.ip, port=args.port, ommit_ping=True, record=args.log, **zk_options(args))
+    started = time.perf_counter()
+    result = download(zk)
+    print(f"Recorded {summary(result)} in {time.perf_counter() - started:.2f}s to {args.log}")
+
+
+def replay(args):
+    """Run the same download against the log instead of a device"""
+    zk = ZK.replay(args.log, realtime=args.realtime, **zk_options(args))
+    started = time.perf_counter()
+    result = download(zk)
+    print(f"Replayed {summary(result)} in {time.perf_counter() - started:.3f}s")
+
+
+def show(args):
+    """List the records in a session log"""
+    kinds = Counter()
+    sizes = Counter()
+    for kind, seconds, data in read_session_log(args.log):
+        kinds[KIND_NAMES[kind]] += 1
+        sizes[KIND_NAMES[kind]] += len(data)
+        if args.verbose:
+            text = data.decode(errors='replace') if kind not in (SENT, RECEIVED) else data[:32].hex()
+            print(f"{seconds:10.4f} {KIND_NAMES[kind]:<9} {len(data):>7} {text}")
+    for name, count in sorted(kinds.items()):
+        print(f"{name:<9} {count:>7} records {sizes[name]:>10} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record ZK device sessions and replay them offline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='Download from a device and record the session')
+    record_parser.add_argument('ip', help='Device IP address')
+    record_parser.add_argument('log', help='Session log to write (appended if it exists)')
+    record_parser.add_argument('--port', type=int, default=4370, help='Device port')
+    record_parser.set_defaults(func=record)
+
+    replay_parser = subparsers.add_parser('replay', help='Replay a recorded download without a device')
+    replay_parser.add_argument('log', help='Session log to replay')
+    replay_parser.add_argument('--realtime', action='store_true', help='Keep the recorded pacing')
+    replay_parser.set_defaults(func=replay)
+
+    for subparser in (record_parser, replay_parser):
+        subparser.add_argument('--timeout', type=int, default=30, help='Socket timeout (seconds)')
+        subparser.add_argument('--password', type=int, default=0, help='Device comm key')
+        subparser.add_argument('--udp', action='store_true', help='Force UDP')
+        subparser.add_argument('--read-window', type=int, default=1, help='Chunk requests in flight over TCP')
+
+    show_parser = subparsers.add_parser('show', help='Summarize a session log')
+    show_parser.add_argument('log', help='Session log to read')
+    show_parser.add_argument('-v', '--verbose', action='store_true', help='List every record')
+    show_parser.set_defaults(func=show)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()